@@ -1,77 +1,299 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from fastapi import status as http_status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from ..core.admission import Admission, AdmissionConfig, AdmissionController, AdmissionRejected, set_current_client
 from ..core.security import get_api_key
-from ..models.schemas import ChatRequest, ChatResponse
+from ..models.schemas import (
+    BatchItem,
+    BatchRequest,
+    BatchResponse,
+    ChatRequest,
+    ChatResponse,
+    JobRequest,
+    JobResponse,
+    JobResultResponse,
+)
 from ..core.config import settings
-from ..core.query_executor import AIQueryExecutor, AIConfig, DatabaseConfig
-from typing import Dict
+from ..core.conversations import create_conversation_store, history_context
+from ..core.metrics import REQUEST_SECONDS, format_timings, record_error, stage, start_request_timing
+from ..core.data_sources import UnknownDataSourceError
+from ..core.jobs import SUCCEEDED, Job, JobManager, JobQueueFull
+from ..core.registry import ExecutorRegistry, ai_config_from_settings
+from ..core.result_encoding import (
+    ARROW,
+    ARROW_FILE_MEDIA_TYPE,
+    ARROW_STREAM_MEDIA_TYPE,
+    COMPACT_JSON,
+    COMPACT_JSON_MEDIA_TYPE,
+    JSON,
+    encode_arrow_ipc,
+    encode_compact_json,
+    negotiate_format,
+    read_arrow_file,
+)
+from typing import AsyncIterator, Dict, List, Optional
+import json
+import os
+import tempfile
+import time
 import uuid
 from sqlalchemy.exc import SQLAlchemyError
-from ..core.errors import DatabaseError, AIServiceError, QueryError
+from ..core.errors import DatabaseError, AIServiceError, QueryError, RateLimitError
 import traceback
 
 router = APIRouter()
 
-# Store chat histories (in-memory for now, could be moved to Redis/DB)
-chat_histories: Dict[str, list] = {}
+conversations = create_conversation_store(
+    settings.CONVERSATION_STORE,
+    path=settings.CONVERSATION_STORE_PATH,
+    redis_url=settings.SHARED_CACHE_REDIS_URL,
+    max_conversations=settings.CONVERSATION_MAX_CONVERSATIONS,
+    max_messages=settings.CONVERSATION_MAX_MESSAGES,
+    max_chars=settings.CONVERSATION_MAX_CHARS,
+    ttl=settings.CONVERSATION_TTL
+)
+
+admission = AdmissionController(AdmissionConfig(
+    requests_per_second=settings.RATE_LIMIT_PER_SECOND,
+    burst=settings.RATE_LIMIT_BURST,
+    max_in_flight_per_key=settings.MAX_IN_FLIGHT_PER_KEY,
+    max_in_flight=settings.MAX_IN_FLIGHT
+)) if settings.RATE_LIMIT_ENABLED else None
+
+jobs = JobManager(
+    settings.JOB_RESULT_DIR or os.path.join(tempfile.gettempdir(), "nlquery-jobs"),
+    max_workers=settings.JOB_WORKERS,
+    max_pending=settings.JOB_MAX_PENDING,
+    max_pending_per_owner=settings.JOB_MAX_PENDING_PER_KEY,
+    batch_size=settings.STREAM_BATCH_SIZE,
+    timeout=settings.JOB_TIMEOUT,
+    max_rows=settings.JOB_MAX_ROWS,
+    ttl=settings.JOB_RESULT_TTL
+)
+
+
+def _rate_limit_error(e: AdmissionRejected) -> RateLimitError:
+    return RateLimitError(detail=str(e), retry_after=e.retry_after_seconds, context={"reason": e.reason})
+
+
+async def admit_request(api_key: str = Depends(get_api_key)) -> AsyncIterator[Optional[Admission]]:
+    """Admit the request under its API key, or reject it with 429.
+
+    The in-flight slot is freed when the endpoint returns. Streaming
+    endpoints set ``deferred`` and free it once the body has been sent.
+    """
+    set_current_client(api_key)
+    if admission is None:
+        yield None
+        return
+    try:
+        ticket = admission.admit(api_key)
+    except AdmissionRejected as e:
+        raise _rate_limit_error(e)
+    try:
+        yield ticket
+    finally:
+        if not ticket.deferred:
+            ticket.release()
+
+
+def _streaming_response(ticket: Optional[Admission], body: AsyncIterator, **kwargs) -> StreamingResponse:
+    """A StreamingResponse that keeps the request admitted until the body is sent."""
+    if ticket is None:
+        return StreamingResponse(body, **kwargs)
+    ticket.deferred = True
+    # Background tasks run after the body, including when the client disconnects
+    return StreamingResponse(body, background=BackgroundTask(ticket.release), **kwargs)
+
+
+def get_registry(request: Request) -> ExecutorRegistry:
+    """The executor registry created by the application's lifespan hook."""
+    return request.app.state.registry
+
+
+def _get_executor(registry: ExecutorRegistry, data_source: Optional[str]):
+    """The shared executor for a named data source, or the default one."""
+    try:
+        return registry.get_source_executor(ai_config_from_settings(), data_source)
+    except UnknownDataSourceError:
+        raise QueryError(
+            detail=f"Unknown data source: {data_source}",
+            context={"data_sources": sorted(registry.data_sources)}
+        )
+
+
+async def _record_message(conversation_id: str, role: str, content: str, sql: Optional[str] = None) -> None:
+    """Add a message to the conversation, on a thread since the SQLite and Redis stores block."""
+    if conversation_id:
+        await run_in_threadpool(conversations.append, conversation_id, role, content, sql=sql)
+
+
+async def _conversation_context(conversation_id: Optional[str]) -> Optional[str]:
+    """Earlier turns of the conversation, trimmed to HISTORY_TOKEN_BUDGET."""
+    if not conversation_id:
+        return None
+    messages = await run_in_threadpool(conversations.get, conversation_id)
+    return history_context(messages, settings.HISTORY_TOKEN_BUDGET)
+
+
+async def _ndjson_results(executor, sql: str, message: str) -> AsyncIterator[str]:
+    """Stream query results as NDJSON: a meta line, row batches, then an end line.
+
+    Rows are sent as arrays in the column order given by the meta line, so
+    memory stays bounded by STREAM_BATCH_SIZE regardless of result size.
+    """
+    row_count = 0
+    rows = executor.stream_sql(sql, timeout=settings.QUERY_TIMEOUT, batch_size=settings.STREAM_BATCH_SIZE)
+    try:
+        columns = await rows.__anext__()
+        yield json.dumps({"type": "meta", "message": message, "sql": sql, "columns": columns}) + "\n"
+        async for batch in rows:
+            row_count += len(batch)
+            yield json.dumps({"type": "rows", "rows": [list(row) for row in batch]}, default=str) + "\n"
+        yield json.dumps({"type": "end", "row_count": row_count}) + "\n"
+    except Exception as e:
+        # Headers are already sent, so errors are reported in-band
+        print(f"Error streaming query results: {str(e)}")
+        yield json.dumps({"type": "error", "detail": str(e), "row_count": row_count}) + "\n"
+    finally:
+        await rows.aclose()
+
+
+async def _sse_events(executor, request: ChatRequest) -> AsyncIterator[bytes]:
+    """Relay ``stream_query`` events as Server-Sent Events."""
+    context = await _conversation_context(request.conversation_id)
+    await _record_message(request.conversation_id, "user", request.message)
+    events = executor.stream_query(
+        request.message,
+        timeout=settings.QUERY_TIMEOUT,
+        max_rows=settings.MAX_RESULT_ROWS,
+        context=context
+    )
+    try:
+        async for event in events:
+            if event["type"] == "query":
+                sql = event["query"].get("sql")
+                await _record_message(
+                    request.conversation_id,
+                    "assistant",
+                    f"I've executed your query. Here are the results:\n\nSQL Query:\n```sql\n{sql}\n```\n\n",
+                    sql=sql
+                )
+            data = encode_compact_json(event).decode("utf-8")
+            yield f"event: {event['type']}\ndata: {data}\n\n".encode("utf-8")
+    finally:
+        await events.aclose()
+
+
+def _add_timing_header(response: Response, timings: Dict[str, float], start_time: float) -> None:
+    """Attach the per-stage latency breakdown when TIMING_HEADER is enabled."""
+    if settings.TIMING_HEADER:
+        timings = {**timings, "total": time.perf_counter() - start_time}
+        response.headers["X-Timing"] = format_timings(timings)
+
+
+async def _columnar_response(fmt: str, message: str, result: Dict) -> Response:
+    """Encode a successful result as compact JSON or an Arrow IPC stream."""
+    if fmt == ARROW:
+        metadata = {
+            "message": message,
+            "sql": result["sql"],
+            "next_cursor": result.get("next_cursor"),
+            "truncated": "true" if result.get("truncated") else "false",
+            "cached": "true" if result.get("cached") else "false"
+        }
+        with stage("serialize"):
+            body = await run_in_threadpool(encode_arrow_ipc, result["columns"], result["rows"], metadata)
+        return Response(content=body, media_type=ARROW_STREAM_MEDIA_TYPE)
+
+    payload = {
+        "message": message,
+        "sql": result["sql"],
+        "columns": result["columns"],
+        "rows": result["rows"],
+        "next_cursor": result.get("next_cursor"),
+        "truncated": result.get("truncated", False),
+        "cached": result.get("cached", False)
+    }
+    with stage("serialize"):
+        body = await run_in_threadpool(encode_compact_json, payload)
+    return Response(content=body, media_type=COMPACT_JSON_MEDIA_TYPE)
 
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
         request: ChatRequest,
-        api_key: str = Depends(get_api_key)
+        response: Response,
+        ticket: Optional[Admission] = Depends(admit_request),
+        accept: Optional[str] = Header(default=None),
+        registry: ExecutorRegistry = Depends(get_registry)
 ):
+    start_time = time.perf_counter()
+    timings = start_request_timing()
+    # Reuse the long-lived executor for the configured AI provider and data source
+    executor = _get_executor(registry, request.data_source)
     try:
-        # Initialize AI query executor with current settings
-        ai_config = AIConfig(
-            provider=settings.AI_PROVIDER,
-            api_key=settings.AI_API_KEY,
-            model=settings.AI_MODEL,
-            temperature=settings.AI_TEMPERATURE,
-            max_tokens=settings.AI_MAX_TOKENS
-        )
-
-        db_config = DatabaseConfig(
-            type=settings.DB_TYPE,
-            host=settings.DB_HOST,
-            port=settings.DB_PORT,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            database=settings.DB_NAME,
-            ssl=settings.DB_SSL
-        )
-
-        executor = AIQueryExecutor(ai_config, db_config)
+        fmt = negotiate_format(accept)
+
+        if request.stream:
+            # Generate the SQL up front so generation errors still get a status code
+            context = await _conversation_context(request.conversation_id)
+            query_result = await executor.generate_query(request.message, context=context)
+            try:
+                query_result, sql = await executor.verify_query(request.message, query_result, context=context)
+            except ValueError as e:
+                # Same status as a failed non-streamed request
+                raise HTTPException(status_code=400, detail=str(e))
+            response_message = f"I've executed your query. Here are the results:\n\nSQL Query:\n```sql\n{sql}\n```\n\n"
+            await _record_message(request.conversation_id, "user", request.message)
+            await _record_message(request.conversation_id, "assistant", response_message, sql=sql)
+            return _streaming_response(
+                ticket,
+                _ndjson_results(executor, sql, response_message),
+                media_type="application/x-ndjson"
+            )
 
         # Generate and execute query
-        result = await executor.execute_query(request.message)
+        result = await executor.execute_query(
+            request.message,
+            timeout=settings.QUERY_TIMEOUT,
+            page_size=request.page_size,
+            cursor=request.cursor,
+            max_rows=settings.MAX_RESULT_ROWS,
+            as_records=fmt == JSON,
+            # Later pages reuse the stored SQL and need no context
+            context=None if request.cursor else await _conversation_context(request.conversation_id)
+        )
 
         # Store in chat history
-        if request.conversation_id:
-            if request.conversation_id not in chat_histories:
-                chat_histories[request.conversation_id] = []
-            chat_histories[request.conversation_id].append({
-                "role": "user",
-                "content": request.message
-            })
+        await _record_message(request.conversation_id, "user", request.message)
 
         # Prepare response
         if result["success"]:
             response_message = f"I've executed your query. Here are the results:\n\nSQL Query:\n```sql\n{result['sql']}\n```\n\n"
-            if result.get("results"):
+            if result.get("rows"):
                 response_message += f"\nFound {result['row_count']} results."
+            if result.get("truncated"):
+                response_message += f" Only the first {result['row_count']} rows are shown; use pagination or streaming for the rest."
 
             # Store assistant's response in chat history
-            if request.conversation_id:
-                chat_histories[request.conversation_id].append({
-                    "role": "assistant",
-                    "content": response_message
-                })
+            await _record_message(request.conversation_id, "assistant", response_message, sql=result["sql"])
+
+            if fmt in (COMPACT_JSON, ARROW):
+                columnar = await _columnar_response(fmt, response_message, result)
+                _add_timing_header(columnar, timings, start_time)
+                return columnar
 
+            _add_timing_header(response, timings, start_time)
             return ChatResponse(
                 message=response_message,
                 sql=result["sql"],
                 results=result.get("results"),
+                next_cursor=result.get("next_cursor"),
+                truncated=result.get("truncated", False),
+                cached=result.get("cached", False),
             )
         else:
             error_message = result.get("error", "Unknown error occurred")
@@ -79,8 +301,15 @@ async def chat(
 
 
 
+    except HTTPException:
+        raise
+
+    except AdmissionRejected as e:
+        raise _rate_limit_error(e)
+
     except SQLAlchemyError as e:
 
+        record_error("database")
         error_message = str(e.__cause__ or e)
 
         stack_trace = traceback.format_exc()
@@ -124,19 +353,187 @@ async def chat(
 
         )
     finally:
-        if 'executor' in locals():
-            executor.disconnect()
+        REQUEST_SECONDS.labels(endpoint="chat").observe(time.perf_counter() - start_time)
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+        request: ChatRequest,
+        ticket: Optional[Admission] = Depends(admit_request),
+        registry: ExecutorRegistry = Depends(get_registry)
+):
+    """Stream SQL and explanation tokens over SSE, then the query results."""
+    executor = _get_executor(registry, request.data_source)
+    return _streaming_response(
+        ticket,
+        _sse_events(executor, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/batch", response_model=BatchResponse)
+async def batch(
+        request: BatchRequest,
+        ticket: Optional[Admission] = Depends(admit_request),
+        registry: ExecutorRegistry = Depends(get_registry)
+):
+    """Generate and run many questions at once; errors are reported per question."""
+    if len(request.questions) > settings.BATCH_MAX_QUESTIONS:
+        raise QueryError(detail=f"A batch can contain at most {settings.BATCH_MAX_QUESTIONS} questions")
+
+    executor = _get_executor(registry, request.data_source)
+    results = await executor.execute_many(
+        request.questions,
+        timeout=settings.QUERY_TIMEOUT,
+        max_rows=settings.MAX_RESULT_ROWS,
+        llm_concurrency=settings.BATCH_LLM_CONCURRENCY,
+        db_concurrency=settings.BATCH_DB_CONCURRENCY
+    )
+
+    items = []
+    for question, result in zip(request.questions, results):
+        if result["success"]:
+            items.append(BatchItem(
+                question=question,
+                success=True,
+                sql=result["sql"],
+                results=result["results"],
+                row_count=result["row_count"],
+                truncated=result["truncated"],
+                cached=result["cached"]
+            ))
+        else:
+            query = result.get("query") or {}
+            items.append(BatchItem(
+                question=question,
+                success=False,
+                sql=query.get("sql"),
+                error=query.get("message") or result.get("error") or "Unknown error occurred"
+            ))
+    return BatchResponse(results=items)
+
+
+@router.post("/schema/refresh")
+async def refresh_schema(
+        full: bool = False,
+        data_source: Optional[str] = None,
+        api_key: str = Depends(get_api_key),
+        registry: ExecutorRegistry = Depends(get_registry)
+):
+    """Re-check the cached schema now instead of waiting for its TTL."""
+    executor = _get_executor(registry, data_source)
+    try:
+        if not executor.connected:
+            await executor.run_blocking(executor.connect)
+        await executor.run_blocking(executor.fetch_database_schema, force=True, full=full)
+    except Exception as e:
+        raise DatabaseError(detail=f"Schema refresh failed: {str(e)}")
+
+    return {
+        "version": executor.schema_version,
+        "table_count": len(executor.schema["tables"])
+    }
+
+
+@router.get("/cache/stats")
+async def cache_stats(
+        api_key: str = Depends(get_api_key),
+        registry: ExecutorRegistry = Depends(get_registry)
+):
+    return {
+        "translation": registry.translation_cache.stats() if registry.translation_cache else None,
+        "results": registry.result_cache.stats() if registry.result_cache else None,
+        "coalescing": {
+            "generation": registry.generation_flight.stats(),
+            "execution": registry.execution_flight.stats()
+        } if registry.generation_flight else None,
+        "replicas": registry.replica_stats(),
+        "admission": admission.stats() if admission else None,
+        "llm_scheduler": registry.llm_scheduler.stats() if registry.llm_scheduler else None,
+        "few_shot": registry.example_store.stats() if registry.example_store else None,
+        "jobs": jobs.stats()
+    }
+
+
+def _get_job(job_id: str, api_key: str) -> Job:
+    job = jobs.get(job_id, api_key)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=http_status.HTTP_202_ACCEPTED)
+async def create_job(
+        request: JobRequest,
+        ticket: Optional[Admission] = Depends(admit_request),
+        api_key: str = Depends(get_api_key),
+        registry: ExecutorRegistry = Depends(get_registry)
+):
+    """Run a query in the background; poll GET /jobs/{id} for its progress."""
+    executor = _get_executor(registry, request.data_source)
+    try:
+        job = jobs.submit(
+            executor,
+            request.message,
+            api_key,
+            data_source=request.data_source,
+            context=await _conversation_context(request.conversation_id)
+        )
+    except JobQueueFull as e:
+        raise RateLimitError(detail=str(e), retry_after=1, context={"reason": "job_queue_full"})
+    return JobResponse(**job.to_dict())
+
+
+@router.get("/jobs", response_model=List[JobResponse])
+async def list_jobs(api_key: str = Depends(get_api_key)):
+    return [JobResponse(**job.to_dict()) for job in jobs.list(api_key)]
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, api_key: str = Depends(get_api_key)):
+    return JobResponse(**_get_job(job_id, api_key).to_dict())
+
+
+@router.get("/jobs/{job_id}/result", response_model=JobResultResponse)
+async def get_job_result(
+        job_id: str,
+        offset: int = Query(default=0, ge=0),
+        limit: Optional[int] = Query(default=None, ge=1),
+        accept: Optional[str] = Header(default=None),
+        api_key: str = Depends(get_api_key)
+):
+    """A page of a finished job's rows, or the whole Arrow file when it is accepted."""
+    job = _get_job(job_id, api_key)
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if accept and ARROW_FILE_MEDIA_TYPE in accept.lower():
+        return FileResponse(job.path, media_type=ARROW_FILE_MEDIA_TYPE, filename=f"{job.id}.arrow")
+
+    limit = min(limit or settings.JOB_RESULT_PAGE_SIZE, settings.JOB_RESULT_PAGE_SIZE)
+    columns, rows, total_rows = await run_in_threadpool(read_arrow_file, job.path, offset, limit)
+    return JobResultResponse(columns=columns, rows=[list(row) for row in rows], offset=offset, total_rows=total_rows)
+
+
+@router.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str, api_key: str = Depends(get_api_key)):
+    """Cancel a queued or running job, or delete a finished one and its result."""
+    job = await jobs.cancel(job_id, api_key)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**job.to_dict())
 
 
 @router.post("/conversations")
 async def create_conversation():
     conversation_id = str(uuid.uuid4())
-    chat_histories[conversation_id] = []
+    await run_in_threadpool(conversations.create, conversation_id)
     return {"conversation_id": conversation_id}
 
 
 @router.get("/conversations/{conversation_id}")
 async def get_conversation(conversation_id: str):
-    if conversation_id not in chat_histories:
+    messages = await run_in_threadpool(conversations.get, conversation_id)
+    if messages is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return {"messages": chat_histories[conversation_id]}
\ No newline at end of file
+    return {"messages": messages}
\ No newline at end of file
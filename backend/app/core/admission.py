@@ -0,0 +1,379 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from .metrics import record_rejection
+
+# API key of the request being handled; AI calls are queued under it
+_current_client: ContextVar[str] = ContextVar("admission_client", default="anonymous")
+# The scheduler slot held by the running AI call, if any
+_current_grant: ContextVar[Optional["LLMGrant"]] = ContextVar("admission_grant", default=None)
+
+
+class AdmissionRejected(Exception):
+    """A request or AI call was shed; the client should retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: float, reason: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+        record_rejection(reason)
+
+    @property
+    def retry_after_seconds(self) -> int:
+        """``retry_after`` rounded up to whole seconds, as Retry-After wants."""
+        return max(1, math.ceil(self.retry_after))
+
+
+def set_current_client(client: str) -> None:
+    _current_client.set(client)
+
+
+def current_client() -> str:
+    return _current_client.get()
+
+
+def report_llm_tokens(tokens: Optional[int]) -> None:
+    """Tell the scheduler how many tokens the running AI call actually used."""
+    grant = _current_grant.get()
+    if grant is not None and tokens:
+        grant.tokens = tokens
+
+
+class TokenBucket:
+    """Refills at ``rate`` per second up to ``capacity``.
+
+    ``take`` only succeeds when enough is available; ``charge`` always
+    succeeds and may leave the bucket in debt, which later takes must wait
+    out. Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float = 1) -> float:
+        """Seconds until ``amount`` can be taken; 0 if it can be now."""
+        self.refill()
+        # More than the capacity could never be taken; a full bucket is enough
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) / self.rate if self.rate > 0 else (0.0 if missing <= 0 else math.inf)
+
+    def take(self, amount: float = 1) -> float:
+        """Take ``amount`` and return 0, or return the seconds to wait without taking it."""
+        wait = self.wait_time(amount)
+        if wait == 0:
+            self.level -= amount
+        return wait
+
+    def charge(self, amount: float) -> None:
+        self.refill()
+        self.level -= amount
+
+
+@dataclass
+class AdmissionConfig:
+    # Sustained requests per second per API key, and the burst allowed above it
+    requests_per_second: float = 5
+    burst: int = 20
+    # Requests being handled at once, per API key and in total
+    max_in_flight_per_key: int = 8
+    max_in_flight: int = 64
+    # Keys whose rate buckets are remembered; the least recently seen are forgotten
+    max_keys: int = 10000
+
+
+class Admission:
+    """One admitted request; ``release`` frees its in-flight slot (once).
+
+    ``deferred`` marks a request whose slot is freed later than usual, e.g.
+    after a streamed response body.
+    """
+
+    def __init__(self, controller: "AdmissionController", client: str):
+        self.controller = controller
+        self.client = client
+        self.released = False
+        self.deferred = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self.client)
+
+
+class AdmissionController:
+    """Decide whether a request from an API key may start now.
+
+    Each key has a token bucket for its request rate and a cap on requests
+    in flight, and the process has an overall in-flight cap. Requests over
+    any limit are rejected at once, with a retry hint, rather than queued:
+    waiting requests would hold sockets and memory while making everyone's
+    latency worse.
+    """
+
+    def __init__(self, config: Optional[AdmissionConfig] = None):
+        self.config = config or AdmissionConfig()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._in_flight: Dict[str, int] = {}
+        self._total = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"rate": 0, "key_in_flight": 0, "in_flight": 0}
+        self._lock = threading.Lock()
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.config.requests_per_second, self.config.burst)
+            while len(self._buckets) > self.config.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    def admit(self, client: str) -> Admission:
+        """Admit a request or raise AdmissionRejected."""
+        config = self.config
+        with self._lock:
+            if self._total >= config.max_in_flight:
+                self.rejected["in_flight"] += 1
+                raise AdmissionRejected("Server is at capacity", retry_after=1, reason="in_flight")
+            if self._in_flight.get(client, 0) >= config.max_in_flight_per_key:
+                self.rejected["key_in_flight"] += 1
+                raise AdmissionRejected(
+                    f"Too many concurrent requests for this API key (limit {config.max_in_flight_per_key})",
+                    retry_after=1,
+                    reason="key_in_flight"
+                )
+            wait = self._bucket(client).take()
+            if wait:
+                self.rejected["rate"] += 1
+                raise AdmissionRejected(
+                    f"Rate limit of {config.requests_per_second:g} requests per second exceeded",
+                    retry_after=wait,
+                    reason="rate"
+                )
+            self._in_flight[client] = self._in_flight.get(client, 0) + 1
+            self._total += 1
+            self.admitted += 1
+        return Admission(self, client)
+
+    def _release(self, client: str) -> None:
+        with self._lock:
+            remaining = self._in_flight.get(client, 0) - 1
+            if remaining > 0:
+                self._in_flight[client] = remaining
+            else:
+                self._in_flight.pop(client, None)
+            self._total -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": self._total,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected)
+            }
+
+
+@dataclass
+class LLMGrant:
+    client: str
+    estimate: float
+    # Tokens the provider reported; the estimate is charged when it reported none
+    tokens: Optional[int] = None
+
+
+@dataclass(order=True)
+class _Waiter:
+    start: float
+    seq: int
+    client: str = field(compare=False)
+    estimate: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class LLMScheduler:
+    """Weighted fair queue in front of the AI provider.
+
+    Calls beyond ``max_concurrency``, or beyond the provider's
+    ``tokens_per_minute`` budget, wait in a start-time fair queue: each key
+    is served in proportion to its weight (default 1), measured in tokens,
+    so one client with a deep backlog cannot starve the others. Token costs
+    are estimated from a running average of the counts providers report and
+    corrected once the call returns (see ``report_llm_tokens``).
+
+    Calls are rejected instead of queued when the queue is full, when the
+    key already has ``max_queue_per_key`` calls waiting, or when the
+    expected wait exceeds ``max_wait``; calls still waiting after
+    ``max_wait`` are rejected too.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: int = 50,
+            tokens_per_minute: Optional[int] = None,
+            max_queue: int = 256,
+            max_queue_per_key: int = 32,
+            max_wait: float = 30,
+            weights: Optional[Dict[str, float]] = None,
+            initial_estimate: float = 2000
+    ):
+        self.max_concurrency = max_concurrency
+        self.budget = TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute else None
+        self.max_queue = max_queue
+        self.max_queue_per_key = max_queue_per_key
+        self.max_wait = max_wait
+        self.weights = weights or {}
+        self.estimate = initial_estimate
+        self._queue: List[_Waiter] = []
+        self._queued: Dict[str, int] = {}
+        self._finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.granted = 0
+        self.rejected = 0
+        self.tokens = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[LLMGrant]:
+        """Wait for this request's turn to call the provider."""
+        grant = await self.acquire(_current_client.get())
+        token = _current_grant.set(grant)
+        try:
+            yield grant
+        finally:
+            _current_grant.reset(token)
+            self.release(grant)
+
+    def _expected_wait(self, estimate: float) -> float:
+        """Rough seconds before a new call would start, from the token budget alone."""
+        if self.budget is None:
+            return 0.0
+        queued = sum(waiter.estimate for waiter in self._queue if not waiter.future.done())
+        self.budget.refill()
+        return max(queued + estimate - self.budget.level, 0.0) / self.budget.rate
+
+    def _reject(self, message: str, retry_after: float) -> AdmissionRejected:
+        self.rejected += 1
+        return AdmissionRejected(message, retry_after=retry_after, reason="llm_queue")
+
+    async def acquire(self, client: str) -> LLMGrant:
+        estimate = self.estimate
+        if not self._queue and self._in_flight < self.max_concurrency and self._budget_allows(estimate):
+            return self._grant(client, estimate)
+
+        if len(self._queue) >= self.max_queue:
+            raise self._reject("The AI request queue is full", retry_after=max(self._expected_wait(estimate), 1))
+        if self._queued.get(client, 0) >= self.max_queue_per_key:
+            raise self._reject(
+                f"Too many AI requests queued for this API key (limit {self.max_queue_per_key})",
+                retry_after=max(self._expected_wait(estimate), 1)
+            )
+        expected = self._expected_wait(estimate)
+        if expected > self.max_wait:
+            raise self._reject("The AI token budget is exhausted", retry_after=expected)
+
+        start = max(self._virtual_time, self._finish.get(client, 0.0))
+        self._finish[client] = start + estimate / self.weights.get(client, 1.0)
+        waiter = _Waiter(start, next(self._seq), client, estimate, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        self._queued[client] = self._queued.get(client, 0) + 1
+        self._dispatch()
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we gave up: hand the slot back
+                self.release(waiter.future.result())
+            else:
+                waiter.future.cancel()
+                self._unqueue(client)
+                self._dispatch()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject("Timed out waiting for an AI request slot", retry_after=self.max_wait)
+
+    def _budget_allows(self, estimate: float) -> bool:
+        return self.budget is None or self.budget.wait_time(estimate) == 0
+
+    def _grant(self, client: str, estimate: float) -> LLMGrant:
+        self._in_flight += 1
+        self.granted += 1
+        if self.budget is not None:
+            self.budget.charge(estimate)
+        return LLMGrant(client, estimate)
+
+    def _unqueue(self, client: str) -> None:
+        remaining = self._queued.get(client, 0) - 1
+        if remaining > 0:
+            self._queued[client] = remaining
+        else:
+            self._queued.pop(client, None)
+
+    def _dispatch(self) -> None:
+        """Start queued calls, lowest start tag first, while capacity and budget allow."""
+        while self._queue and self._in_flight < self.max_concurrency:
+            waiter = self._queue[0]
+            if waiter.future.done():
+                heapq.heappop(self._queue)
+                continue
+            if self.budget is not None:
+                wait = self.budget.wait_time(waiter.estimate)
+                if wait:
+                    self._schedule_dispatch(wait)
+                    return
+            heapq.heappop(self._queue)
+            self._unqueue(waiter.client)
+            self._virtual_time = waiter.start
+            waiter.future.set_result(self._grant(waiter.client, waiter.estimate))
+        if not self._queue:
+            # Idle keys start over from the current virtual time
+            self._finish = {
+                client: finish for client, finish in self._finish.items() if finish > self._virtual_time
+            }
+
+    def _schedule_dispatch(self, delay: float) -> None:
+        if self._timer is None:
+            def fire():
+                self._timer = None
+                self._dispatch()
+            self._timer = asyncio.get_running_loop().call_later(delay, fire)
+
+    def release(self, grant: LLMGrant) -> None:
+        self._in_flight -= 1
+        if grant.tokens:
+            self.tokens += grant.tokens
+            # Average over recent calls so estimates follow prompt sizes
+            self.estimate = 0.9 * self.estimate + 0.1 * grant.tokens
+            if self.budget is not None:
+                self.budget.charge(grant.tokens - grant.estimate)
+        self._dispatch()
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self._in_flight,
+            "queued": sum(self._queued.values()),
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "tokens": self.tokens,
+            "token_estimate": round(self.estimate),
+            "budget": round(self.budget.level) if self.budget is not None else None
+        }
@@ -0,0 +1,356 @@
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+import pickle
+import re
+import sqlite3
+import threading
+import time
+
+
+# Values shared between processes are pickled (protocol 5): compact, and it
+# round-trips the Decimal, datetime and bytes columns that JSON and msgpack
+# cannot. Only point these backends at cache stores you trust.
+_PICKLE_PROTOCOL = 5
+
+_NAMESPACE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def encode_value(value: Any) -> bytes:
+    return pickle.dumps(value, protocol=_PICKLE_PROTOCOL)
+
+
+def decode_value(payload: bytes) -> Any:
+    return pickle.loads(payload)
+
+
+class MemoryCacheBackend:
+    """Thread-safe in-process LRU cache with per-entry TTLs and tags.
+
+    Tags group entries so they can be invalidated together, e.g. every
+    translation made against one schema version. When ``max_bytes`` is set,
+    entries are also evicted until the sizes passed to ``set`` fit in it.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float], Tuple[str, ...], int]]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, _, _ = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(
+            self,
+            key: str,
+            value: Any,
+            ttl: Optional[float] = None,
+            tags: Iterable[str] = (),
+            size: int = 0
+    ) -> None:
+        tags = tuple(tags)
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, tags, size)
+            self.size_bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self.size_bytes > self.max_bytes and len(self._entries) > 1
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Remove every entry carrying ``tag`` and return how many were removed."""
+        with self._lock:
+            keys = self._tags.pop(tag, set())
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.size_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        _, _, tags, size = self._entries.pop(key)
+        self.size_bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class SQLiteCacheBackend:
+    """LRU cache persisted to a SQLite file, shareable by several processes.
+
+    Values are pickled. WAL mode lets uvicorn workers on the same host read
+    concurrently while one of them writes; a file on a memory filesystem
+    such as /dev/shm makes this a shared-memory cache. Each ``namespace``
+    gets its own tables, so several caches can share one file. With
+    ``max_bytes`` the stored payloads are kept under that total too.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_entries: int = 10000,
+            max_bytes: Optional[int] = None,
+            namespace: str = "cache"
+    ):
+        if not _NAMESPACE.match(namespace):
+            raise ValueError(f"Invalid cache namespace: {namespace}")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = f"{namespace}_entries"
+        self._tags = f"{namespace}_tags"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._entries} ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL,"
+                " expires_at REAL, last_access REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._tags} ("
+                " tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self._tags}_key ON {self._tags} (key)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self._entries}_lru ON {self._entries} (last_access)")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self._entries} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= now:
+                self._remove(key)
+                return None
+            self._conn.execute(f"UPDATE {self._entries} SET last_access = ? WHERE key = ?", (now, key))
+        return decode_value(row[0])
+
+    def set(
+            self,
+            key: str,
+            value: Any,
+            ttl: Optional[float] = None,
+            tags: Iterable[str] = (),
+            size: int = 0
+    ) -> None:
+        # The byte budget counts the stored payload, so ``size`` is not needed
+        payload = encode_value(value)
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._lock, self._conn:
+            self._remove(key)
+            self._conn.execute(
+                f"INSERT INTO {self._entries} (key, value, expires_at, last_access, size) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, expires_at, now, len(payload))
+            )
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO {self._tags} (tag, key) VALUES (?, ?)",
+                [(tag, key) for tag in tags]
+            )
+            overflow = self._count() - self.max_entries
+            if overflow > 0:
+                for (old_key,) in self._conn.execute(
+                        f"SELECT key FROM {self._entries} ORDER BY last_access LIMIT ?", (overflow,)
+                ).fetchall():
+                    self._remove(old_key)
+            if self.max_bytes is not None:
+                excess = self._size() - self.max_bytes
+                # Oldest first, never the entry just written
+                for old_key, size in self._conn.execute(
+                        f"SELECT key, size FROM {self._entries} WHERE key != ? ORDER BY last_access", (key,)
+                ):
+                    if excess <= 0:
+                        break
+                    self._remove(old_key)
+                    excess -= size
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._remove(key)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Remove every entry carrying ``tag`` and return how many were removed."""
+        with self._lock, self._conn:
+            keys = [row[0] for row in self._conn.execute(
+                f"SELECT key FROM {self._tags} WHERE tag = ?", (tag,)
+            ).fetchall()]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self._entries}")
+            self._conn.execute(f"DELETE FROM {self._tags}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count()
+
+    @property
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._size()
+
+    def _count(self) -> int:
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self._entries}").fetchone()[0]
+
+    def _size(self) -> int:
+        return self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self._entries}").fetchone()[0]
+
+    def _remove(self, key: str) -> None:
+        self._conn.execute(f"DELETE FROM {self._entries} WHERE key = ?", (key,))
+        self._conn.execute(f"DELETE FROM {self._tags} WHERE key = ?", (key,))
+
+
+class RedisCacheBackend:
+    """Cache entries in Redis, shared by every worker and host using the server.
+
+    Values are pickled. Each tag is a Redis set of the keys carrying it, and
+    a sorted set of last-access times keeps the namespace to ``max_entries``
+    (least recently used first out). Memory beyond that is governed by the
+    server's maxmemory policy, so ``size_bytes`` is not tracked here.
+
+    ``client`` is a ``redis.Redis``; see ``create_redis_client``.
+    """
+
+    size_bytes = None
+
+    def __init__(self, client, namespace: str = "nlquery", max_entries: int = 100000):
+        self.client = client
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._lru = f"{namespace}:lru"
+
+    def _entry(self, key: str) -> str:
+        return f"{self.namespace}:e:{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.namespace}:t:{tag}"
+
+    def get(self, key: str) -> Optional[Any]:
+        payload = self.client.get(self._entry(key))
+        if payload is None:
+            # Expired or evicted by the server
+            self.client.zrem(self._lru, key)
+            return None
+        self.client.zadd(self._lru, {key: time.time()}, xx=True)
+        return decode_value(payload)
+
+    def set(
+            self,
+            key: str,
+            value: Any,
+            ttl: Optional[float] = None,
+            tags: Iterable[str] = (),
+            size: int = 0
+    ) -> None:
+        pipe = self.client.pipeline()
+        pipe.set(self._entry(key), encode_value(value), px=int(ttl * 1000) if ttl else None)
+        for tag in tags:
+            pipe.sadd(self._tag(tag), key)
+            if ttl:
+                # A tag lives as long as the newest entry carrying it
+                pipe.pexpire(self._tag(tag), int(ttl * 1000))
+        pipe.zadd(self._lru, {key: time.time()})
+        pipe.zcard(self._lru)
+        overflow = pipe.execute()[-1] - self.max_entries
+        if overflow > 0:
+            evicted = [member.decode("utf-8") for member, _ in self.client.zpopmin(self._lru, overflow)]
+            self.client.delete(*(self._entry(old_key) for old_key in evicted))
+
+    def delete(self, key: str) -> None:
+        pipe = self.client.pipeline()
+        pipe.delete(self._entry(key))
+        pipe.zrem(self._lru, key)
+        pipe.execute()
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Remove every entry carrying ``tag`` and return how many were removed."""
+        keys = [key.decode("utf-8") for key in self.client.smembers(self._tag(tag))]
+        pipe = self.client.pipeline()
+        if keys:
+            pipe.delete(*(self._entry(key) for key in keys))
+            pipe.zrem(self._lru, *keys)
+        pipe.delete(self._tag(tag))
+        results = pipe.execute()
+        return results[0] if keys else 0
+
+    def clear(self) -> None:
+        batch = []
+        for name in self.client.scan_iter(match=f"{self.namespace}:*", count=500):
+            batch.append(name)
+            if len(batch) >= 500:
+                self.client.delete(*batch)
+                batch = []
+        if batch:
+            self.client.delete(*batch)
+
+    def __len__(self) -> int:
+        return self.client.zcard(self._lru)
+
+
+def create_redis_client(url: str):
+    """Connect to Redis (or anything speaking its protocol) at ``url``."""
+    # Imported here so deployments without a shared cache never load it
+    import redis
+
+    return redis.Redis.from_url(url, socket_timeout=5, socket_connect_timeout=5, health_check_interval=30)
+
+
+def create_cache_backend(
+        kind: str,
+        path: Optional[str] = None,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+        namespace: str = "cache",
+        redis_url: Optional[str] = None
+):
+    """Build a cache backend from its settings name ('memory', 'sqlite' or 'redis')."""
+    if kind == "memory":
+        return MemoryCacheBackend(max_entries=max_entries, max_bytes=max_bytes)
+    if kind == "sqlite":
+        if not path:
+            raise ValueError("The sqlite cache backend requires a file path")
+        return SQLiteCacheBackend(path, max_entries=max_entries, max_bytes=max_bytes, namespace=namespace)
+    if kind == "redis":
+        if not redis_url:
+            raise ValueError("The redis cache backend requires a server URL")
+        return RedisCacheBackend(create_redis_client(redis_url), namespace=namespace, max_entries=max_entries)
+    raise ValueError(f"Unsupported cache backend: {kind}")
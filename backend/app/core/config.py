@@ -19,6 +19,62 @@ class Settings(BaseSettings):
     DB_PASSWORD: str
     DB_NAME: str
     DB_SSL: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 3600
+    # Read replicas of the DB_* database, as JSON: ["replica1", "replica2:5433", {"host": ...}]
+    DB_REPLICAS: list = []
+    # More named databases, as JSON: {"analytics": {"type": ..., "host": ..., "port": ...,
+    # "user": ..., "password": ..., "database": ..., "replicas": [...]}}
+    DATA_SOURCES: dict = {}
+    # Name the DB_* database is served under, and the one used when a request names none
+    DEFAULT_DATA_SOURCE: str = "default"
+    # Seconds between health probes of each read replica
+    REPLICA_PROBE_INTERVAL: float = 10
+
+    # Blocking database calls run on a bounded thread pool of this size;
+    # keep it at or above DB_POOL_SIZE + DB_MAX_OVERFLOW
+    DB_EXECUTOR_THREADS: int = 15
+    # Server-side statement timeout for generated queries, in seconds (0 disables)
+    QUERY_TIMEOUT: int = 30
+    # Hard cap on rows fetched into memory for one non-streamed response
+    MAX_RESULT_ROWS: int = 100000
+    # Seconds a pagination cursor stays valid
+    PAGE_CURSOR_TTL: int = 3600
+    # Rows fetched per server-side cursor batch when streaming results
+    STREAM_BATCH_SIZE: int = 1000
+
+    # Seconds before a cached schema snapshot is re-checked for changes
+    SCHEMA_CACHE_TTL: int = 300
+
+    # Send only the tables relevant to each question on large schemas
+    SCHEMA_PRUNING_ENABLED: bool = True
+    SCHEMA_PRUNING_TOP_K: int = 8
+    SCHEMA_PRUNING_MIN_TABLES: int = 30
+    SCHEMA_PROMPT_TOKEN_BUDGET: int = 4000
+    # 'verbose' (bulleted) or 'compact' (DDL-style) schema description
+    SCHEMA_PROMPT_FORMAT: str = "verbose"
+
+    # Few-shot examples: questions whose generated SQL returned rows within
+    # FEW_SHOT_MAX_EXECUTION_TIME seconds are remembered, and the most similar
+    # ones are added to new prompts within FEW_SHOT_TOKEN_BUDGET tokens. With
+    # FEW_SHOT_STORE_PATH they persist in a SQLite file shared by the workers
+    # on a host; otherwise each process keeps its own in memory.
+    FEW_SHOT_ENABLED: bool = True
+    FEW_SHOT_STORE_PATH: Optional[str] = None
+    FEW_SHOT_TOP_K: int = 3
+    FEW_SHOT_MAX_EXAMPLES: int = 1000
+    FEW_SHOT_MAX_EXECUTION_TIME: float = 1.0
+    FEW_SHOT_TOKEN_BUDGET: int = 800
+
+    # Connect and reflect the schema at startup instead of on the first request
+    WARM_UP_ON_STARTUP: bool = True
+    # Pooled connections opened per database during warm-up, and seconds
+    # between retries of a warm-up that failed. /readyz reports ready once
+    # every data source is warm.
+    WARM_UP_CONNECTIONS: int = 2
+    WARM_UP_RETRY_INTERVAL: float = 5
 
     # AI Configuration
     AI_PROVIDER: str
@@ -26,6 +82,115 @@ class Settings(BaseSettings):
     AI_MODEL: Optional[str] = None
     AI_TEMPERATURE: float = 0
     AI_MAX_TOKENS: int = 1000
+    AI_BASE_URL: Optional[str] = None
+    # Mark the stable system prompt prefix with Anthropic cache_control, when it
+    # is long enough (1024 tokens) for the provider to cache it
+    AI_PROMPT_CACHING: bool = True
+
+    # AI HTTP client pooling, shared by every request
+    AI_MAX_CONNECTIONS: int = 100
+    AI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    AI_KEEPALIVE_EXPIRY: float = 30.0
+    AI_TIMEOUT: float = 60.0
+    AI_CONNECT_TIMEOUT: float = 5.0
+    AI_HTTP2: bool = True
+    # Maximum AI calls in flight at once across the process
+    AI_MAX_CONCURRENCY: int = 50
+
+    # Admission control per API key, per worker process: a token-bucket
+    # request rate, concurrent requests per key and overall. Requests over a
+    # limit get 429 with Retry-After instead of queueing.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_SECOND: float = 5
+    RATE_LIMIT_BURST: int = 20
+    MAX_IN_FLIGHT_PER_KEY: int = 8
+    MAX_IN_FLIGHT: int = 64
+    # AI calls are queued fairly between API keys, weighted as JSON
+    # {"<api key>": 2.0} (default 1), within the provider's tokens-per-minute
+    # limit (unset: no token budget). Calls that would wait longer than
+    # AI_QUEUE_MAX_WAIT seconds, or overflow the queue, get 429 too.
+    AI_KEY_WEIGHTS: dict = {}
+    AI_TOKENS_PER_MINUTE: Optional[int] = None
+    AI_QUEUE_MAX: int = 256
+    AI_QUEUE_MAX_PER_KEY: int = 32
+    AI_QUEUE_MAX_WAIT: float = 30
+
+    # Cache tier shared by every worker for schema snapshots, translations and
+    # results: 'none' (each process caches alone), 'sqlite' (one host; a path
+    # on /dev/shm keeps it in memory) or 'redis' (any number of hosts)
+    SHARED_CACHE_BACKEND: str = "none"
+    SHARED_CACHE_PATH: Optional[str] = None
+    SHARED_CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    SHARED_CACHE_NAMESPACE: str = "nlquery"
+
+    # Natural language -> SQL translation cache; SQL_CACHE_BACKEND is
+    # ignored when SHARED_CACHE_BACKEND is set
+    SQL_CACHE_ENABLED: bool = True
+    SQL_CACHE_BACKEND: str = "memory"  # 'memory', 'sqlite' or 'redis'
+    SQL_CACHE_PATH: Optional[str] = None  # Required for the sqlite backend
+    SQL_CACHE_MAX_ENTRIES: int = 1000
+    SQL_CACHE_TTL: int = 3600
+    # Jaccard trigram similarity for near-duplicate questions; 0 disables the tier
+    SQL_CACHE_SIMILARITY_THRESHOLD: float = 0.0
+
+    # Query result cache, invalidated per table when its data changes
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Results with more rows than this are never cached
+    RESULT_CACHE_MAX_ROWS: int = 10000
+    RESULT_CACHE_TTL: int = 300
+    # Seconds between polls of the per-table modification counters
+    RESULT_CACHE_CHECK_INTERVAL: float = 5
+
+    # Check generated SQL with EXPLAIN before running it, and send planner
+    # errors back to the AI for up to SQL_VERIFY_MAX_REPAIRS fixes
+    SQL_VERIFY_ENABLED: bool = True
+    SQL_VERIFY_MAX_REPAIRS: int = 2
+    SQL_VERIFY_TIMEOUT: float = 5
+    # Planner cost limit for generated queries (unset disables it) and what to
+    # do above it: 'reject', 'limit' (add LIMIT QUERY_COST_LIMIT_ROWS) or 'repair'
+    QUERY_MAX_COST: Optional[float] = None
+    QUERY_COST_ACTION: str = "reject"
+    QUERY_COST_LIMIT_ROWS: int = 1000
+
+    # Share one AI call / query execution among concurrent identical requests
+    COALESCE_REQUESTS: bool = True
+
+    # Background query jobs (/jobs): concurrent jobs per worker, jobs that may
+    # be queued or running at once (in total and per API key), and where
+    # results are written as Arrow files (a temporary directory when unset).
+    # Results are kept for JOB_RESULT_TTL seconds; JOB_TIMEOUT is the statement
+    # timeout (0 disables). Jobs live in the worker that accepted them, so
+    # with several workers the load balancer must route each API key to the
+    # same one (sticky sessions).
+    JOB_WORKERS: int = 4
+    JOB_MAX_PENDING: int = 100
+    JOB_MAX_PENDING_PER_KEY: int = 10
+    JOB_RESULT_DIR: Optional[str] = None
+    JOB_RESULT_TTL: int = 3600
+    JOB_TIMEOUT: int = 3600
+    JOB_MAX_ROWS: Optional[int] = None
+    # Rows per page of GET /jobs/{id}/result
+    JOB_RESULT_PAGE_SIZE: int = 1000
+
+    # Conversation history: 'memory', 'sqlite' (shared by workers on a host, kept
+    # across restarts) or 'redis' (shared across hosts, at SHARED_CACHE_REDIS_URL)
+    CONVERSATION_STORE: str = "memory"
+    CONVERSATION_STORE_PATH: Optional[str] = None  # Required for the sqlite store
+    CONVERSATION_MAX_CONVERSATIONS: int = 10000
+    CONVERSATION_MAX_MESSAGES: int = 50
+    CONVERSATION_MAX_CHARS: int = 32000
+    CONVERSATION_TTL: int = 86400
+    # Prompt tokens spent on earlier turns of a conversation; 0 sends no history
+    HISTORY_TOKEN_BUDGET: int = 500
+
+    # Add an X-Timing header with the per-stage latency breakdown to /chat responses
+    TIMING_HEADER: bool = False
+
+    # /batch limits: questions per request, concurrent AI calls and queries
+    BATCH_MAX_QUESTIONS: int = 500
+    BATCH_LLM_CONCURRENCY: int = 8
+    BATCH_DB_CONCURRENCY: int = 10
 
     class Config:
         env_file = ".env"
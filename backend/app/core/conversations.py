@@ -0,0 +1,327 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import json
+import sqlite3
+import threading
+import time
+
+from .cache import create_redis_client
+from .schema_retrieval import estimate_tokens
+
+
+def _trim(messages: List[Dict], max_messages: int, max_chars: int) -> List[Dict]:
+    """Keep the newest messages within the per-conversation caps."""
+    kept, size = [], 0
+    for message in reversed(messages[-max_messages:]):
+        size += len(message["content"])
+        if size > max_chars and kept:
+            break
+        kept.append(message)
+    kept.reverse()
+    return kept
+
+
+class MemoryConversationStore:
+    """Conversation histories held in process memory.
+
+    At most ``max_conversations`` are kept, least recently used first out,
+    and a conversation expires ``ttl`` seconds after its last message. Each
+    keeps only its newest ``max_messages`` messages and ``max_chars``
+    characters of content.
+    """
+
+    def __init__(
+            self,
+            max_conversations: int = 10000,
+            max_messages: int = 50,
+            max_chars: int = 32000,
+            ttl: Optional[float] = 86400
+    ):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self._conversations: "OrderedDict[str, Tuple[List[Dict], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, conversation_id: str) -> None:
+        with self._lock:
+            self._conversations[conversation_id] = ([], time.time())
+            self._evict()
+
+    def get(self, conversation_id: str) -> Optional[List[Dict]]:
+        """Return the messages of a conversation, or None if it is unknown or expired."""
+        with self._lock:
+            entry = self._conversations.get(conversation_id)
+            if entry is None:
+                return None
+            if self.ttl and entry[1] + self.ttl <= time.time():
+                del self._conversations[conversation_id]
+                return None
+            self._conversations.move_to_end(conversation_id)
+            return list(entry[0])
+
+    def append(self, conversation_id: str, role: str, content: str, sql: Optional[str] = None) -> None:
+        """Add a message, creating the conversation if needed."""
+        message = {"role": role, "content": content[:self.max_chars]}
+        if sql:
+            message["sql"] = sql
+        with self._lock:
+            messages, _ = self._conversations.pop(conversation_id, ([], 0))
+            self._conversations[conversation_id] = (
+                _trim(messages + [message], self.max_messages, self.max_chars),
+                time.time()
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+
+
+class SQLiteConversationStore:
+    """Conversation histories persisted to a SQLite file.
+
+    Survives restarts and is shared by every worker on the host: WAL mode
+    lets readers run alongside a writer, and writes take the database lock
+    up front (BEGIN IMMEDIATE) so concurrent appends from several processes
+    serialize instead of failing. Caps and TTL behave as in
+    MemoryConversationStore.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_conversations: int = 10000,
+            max_messages: int = 50,
+            max_chars: int = 32000,
+            ttl: Optional[float] = 86400
+    ):
+        self.path = path
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            " id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL,"
+            " role TEXT NOT NULL, content TEXT NOT NULL, sql TEXT)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS conversation_messages_conversation"
+            " ON conversation_messages (conversation_id, id)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS conversations_lru ON conversations (updated_at)")
+
+    def create(self, conversation_id: str) -> None:
+        with self._lock:
+            self._write(lambda: self._touch(conversation_id))
+
+    def get(self, conversation_id: str) -> Optional[List[Dict]]:
+        """Return the messages of a conversation, or None if it is unknown or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if row is None or (self.ttl and row[0] + self.ttl <= time.time()):
+                return None
+            rows = self._conn.execute(
+                "SELECT role, content, sql FROM conversation_messages"
+                " WHERE conversation_id = ? ORDER BY id",
+                (conversation_id,)
+            ).fetchall()
+        messages = []
+        for role, content, sql in rows:
+            message = {"role": role, "content": content}
+            if sql:
+                message["sql"] = sql
+            messages.append(message)
+        return messages
+
+    def append(self, conversation_id: str, role: str, content: str, sql: Optional[str] = None) -> None:
+        """Add a message, creating the conversation if needed."""
+        def append_message():
+            self._touch(conversation_id)
+            self._conn.execute(
+                "INSERT INTO conversation_messages (conversation_id, role, content, sql) VALUES (?, ?, ?, ?)",
+                (conversation_id, role, content[:self.max_chars], sql)
+            )
+            self._trim(conversation_id)
+
+        with self._lock:
+            self._write(append_message)
+
+    def _write(self, func) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            func()
+            self._evict()
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _touch(self, conversation_id: str) -> None:
+        self._conn.execute(
+            "INSERT INTO conversations (id, updated_at) VALUES (?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET updated_at = excluded.updated_at",
+            (conversation_id, time.time())
+        )
+
+    def _trim(self, conversation_id: str) -> None:
+        rows = self._conn.execute(
+            "SELECT id, length(content) FROM conversation_messages"
+            " WHERE conversation_id = ? ORDER BY id DESC",
+            (conversation_id,)
+        ).fetchall()
+        size = 0
+        for position, (message_id, length) in enumerate(rows):
+            size += length
+            if position >= self.max_messages or (size > self.max_chars and position > 0):
+                self._conn.execute(
+                    "DELETE FROM conversation_messages WHERE conversation_id = ? AND id <= ?",
+                    (conversation_id, message_id)
+                )
+                break
+
+    def _evict(self) -> None:
+        stale = []
+        if self.ttl:
+            stale = [row[0] for row in self._conn.execute(
+                "SELECT id FROM conversations WHERE updated_at <= ?", (time.time() - self.ttl,)
+            )]
+        overflow = self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0] - self.max_conversations
+        if overflow > 0:
+            stale.extend(row[0] for row in self._conn.execute(
+                "SELECT id FROM conversations ORDER BY updated_at LIMIT ?", (overflow,)
+            ))
+        for conversation_id in set(stale):
+            self._conn.execute("DELETE FROM conversation_messages WHERE conversation_id = ?", (conversation_id,))
+            self._conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+
+class RedisConversationStore:
+    """Conversation histories in Redis, shared by workers on every host.
+
+    Each conversation is a list of JSON messages under
+    ``{namespace}:{conversation_id}``; appends trim it to the newest
+    ``max_messages`` and reset its expiry to ``ttl``. ``max_conversations``
+    is not enforced here: the server's maxmemory policy bounds the total.
+    """
+
+    def __init__(
+            self,
+            client,
+            namespace: str = "nlquery:conversations",
+            max_conversations: int = 10000,
+            max_messages: int = 50,
+            max_chars: int = 32000,
+            ttl: Optional[float] = 86400
+    ):
+        self.client = client
+        self.namespace = namespace
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.ttl = ttl
+
+    def _key(self, conversation_id: str) -> str:
+        return f"{self.namespace}:{conversation_id}"
+
+    def create(self, conversation_id: str) -> None:
+        # Lists cannot be empty in Redis, so a new conversation is a marker entry
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(conversation_id))
+        pipe.rpush(self._key(conversation_id), "null")
+        if self.ttl:
+            pipe.expire(self._key(conversation_id), int(self.ttl))
+        pipe.execute()
+
+    def get(self, conversation_id: str) -> Optional[List[Dict]]:
+        """Return the messages of a conversation, or None if it is unknown or expired."""
+        items = self.client.lrange(self._key(conversation_id), 0, -1)
+        if not items:
+            return None
+        messages = [message for message in map(json.loads, items) if message is not None]
+        return _trim(messages, self.max_messages, self.max_chars)
+
+    def append(self, conversation_id: str, role: str, content: str, sql: Optional[str] = None) -> None:
+        """Add a message, creating the conversation if needed."""
+        message = {"role": role, "content": content[:self.max_chars]}
+        if sql:
+            message["sql"] = sql
+        key = self._key(conversation_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, json.dumps(message))
+        # The character cap is applied on read; this bounds the list itself
+        pipe.ltrim(key, -self.max_messages, -1)
+        if self.ttl:
+            pipe.expire(key, int(self.ttl))
+        pipe.execute()
+
+
+def create_conversation_store(
+        kind: str,
+        path: Optional[str] = None,
+        redis_url: Optional[str] = None,
+        max_conversations: int = 10000,
+        max_messages: int = 50,
+        max_chars: int = 32000,
+        ttl: Optional[float] = 86400
+):
+    """Build a conversation store from its settings name ('memory', 'sqlite' or 'redis')."""
+    caps = dict(
+        max_conversations=max_conversations,
+        max_messages=max_messages,
+        max_chars=max_chars,
+        ttl=ttl
+    )
+    if kind == "memory":
+        return MemoryConversationStore(**caps)
+    if kind == "sqlite":
+        if not path:
+            raise ValueError("The sqlite conversation store requires a file path")
+        return SQLiteConversationStore(path, **caps)
+    if kind == "redis":
+        return RedisConversationStore(create_redis_client(redis_url), **caps)
+    raise ValueError(f"Unsupported conversation store: {kind}")
+
+
+def history_context(messages: Optional[List[Dict]], token_budget: int) -> Optional[str]:
+    """Render the recent turns of a conversation for the AI prompt.
+
+    Each earlier question is paired with the SQL generated for it. Turns are
+    added newest first until ``token_budget`` is spent, so long conversations
+    only carry their most recent context.
+    """
+    if not messages or token_budget <= 0:
+        return None
+
+    turns: List[str] = []
+    question: Optional[str] = None
+    for message in messages:
+        if message["role"] == "user":
+            question = message["content"]
+        elif question is not None and message.get("sql"):
+            turns.append(f"User: {question}\nSQL: {message['sql']}")
+            question = None
+
+    kept, used = [], 0
+    for turn in reversed(turns):
+        cost = estimate_tokens(turn)
+        if used + cost > token_budget:
+            break
+        kept.append(turn)
+        used += cost
+    if not kept:
+        return None
+    kept.reverse()
+    return "Earlier in this conversation:\n" + "\n\n".join(kept)
@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Union
+import itertools
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .query_executor import DatabaseConfig
+
+
+@dataclass
+class DataSourceConfig:
+    """A named database: the primary and any read replicas of it."""
+    name: str
+    primary: DatabaseConfig
+    replicas: List[DatabaseConfig] = field(default_factory=list)
+
+
+class UnknownDataSourceError(KeyError):
+    """No data source is configured under the requested name."""
+
+
+def _replica_config(primary: DatabaseConfig, replica: Union[str, Dict[str, Any]]) -> DatabaseConfig:
+    """Build a replica's config; anything it does not set is taken from the primary."""
+    if isinstance(replica, str):
+        host, _, port = replica.partition(":")
+        replica = {"host": host, **({"port": int(port)} if port else {})}
+    return replace(primary, **replica)
+
+
+def parse_data_source(name: str, spec: Dict[str, Any]) -> DataSourceConfig:
+    """Build a data source from its settings entry.
+
+    ``spec`` has the DatabaseConfig fields plus an optional ``replicas``
+    list, whose items are ``"host"``, ``"host:port"`` or partial configs.
+    """
+    spec = dict(spec)
+    replicas = spec.pop("replicas", [])
+    try:
+        primary = DatabaseConfig(**spec)
+    except TypeError as e:
+        raise ValueError(f"Invalid configuration for data source '{name}': {str(e)}")
+    return DataSourceConfig(
+        name=name,
+        primary=primary,
+        replicas=[_replica_config(primary, replica) for replica in replicas]
+    )
+
+
+class ReplicaRouter:
+    """Choose the engine for one data source's read-only queries.
+
+    Queries go to the healthy replica with the fewest checked-out pool
+    connections; ties rotate so light traffic is spread too. Without a
+    healthy replica they go to the primary.
+
+    Replicas are probed with ``SELECT 1`` every ``probe_interval`` seconds on
+    a background thread, and one that drops a connection mid-query is taken
+    out of rotation until its next successful probe.
+    """
+
+    def __init__(
+            self,
+            primary: Engine,
+            replicas: List[Engine],
+            probe_interval: float = 10
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.probe_interval = probe_interval
+        self._healthy: Dict[int, bool] = {id(engine): True for engine in self.replicas}
+        self._failures: Dict[int, int] = {id(engine): 0 for engine in self.replicas}
+        self._rotation = itertools.count()
+        self._next_probe = time.monotonic() + probe_interval
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load(engine: Engine) -> int:
+        # Every replica gets the same pool settings, so checkouts compare directly
+        pool = engine.pool
+        return pool.checkedout() if hasattr(pool, "checkedout") else 0
+
+    def choose(self) -> Engine:
+        """Return the least-loaded healthy replica, or the primary."""
+        if not self.replicas:
+            return self.primary
+        self._maybe_probe()
+        healthy = [engine for engine in self.replicas if self._healthy[id(engine)]]
+        if not healthy:
+            return self.primary
+        offset = next(self._rotation) % len(healthy)
+        rotated = healthy[offset:] + healthy[:offset]
+        return min(rotated, key=self._load)
+
+    def is_replica(self, engine: Engine) -> bool:
+        return id(engine) in self._healthy
+
+    def mark_failed(self, engine: Engine) -> None:
+        """Take a replica out of rotation until it passes a probe."""
+        if self.is_replica(engine):
+            with self._lock:
+                self._healthy[id(engine)] = False
+                self._failures[id(engine)] += 1
+
+    def _maybe_probe(self) -> None:
+        with self._lock:
+            if self._probing or time.monotonic() < self._next_probe:
+                return
+            self._probing = True
+        threading.Thread(target=self.probe, name="nlquery-replica-probe", daemon=True).start()
+
+    def probe(self) -> None:
+        """Check every replica now and update its health."""
+        try:
+            for engine in self.replicas:
+                try:
+                    with engine.connect() as connection:
+                        connection.execute(text("SELECT 1"))
+                    healthy = True
+                except Exception as e:
+                    print(f"Replica {engine.url.render_as_string(hide_password=True)} failed its health probe: {str(e)}")
+                    healthy = False
+                with self._lock:
+                    if not healthy and self._healthy[id(engine)]:
+                        self._failures[id(engine)] += 1
+                    self._healthy[id(engine)] = healthy
+        finally:
+            with self._lock:
+                self._probing = False
+                self._next_probe = time.monotonic() + self.probe_interval
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    "database": engine.url.render_as_string(hide_password=True),
+                    "healthy": self._healthy[id(engine)],
+                    "failures": self._failures[id(engine)],
+                    "checked_out": self._load(engine)
+                }
+                for engine in self.replicas
+            ]
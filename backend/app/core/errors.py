@@ -39,4 +39,16 @@ class QueryError(HTTPException):
                 error_type="query_error",
                 context=context
             ).dict()
-        )
\ No newline at end of file
+        )
+
+class RateLimitError(HTTPException):
+    def __init__(self, detail: str, retry_after: int, context: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            status_code=http_status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=ErrorResponse(
+                detail=detail,
+                error_type="rate_limited",
+                context=context
+            ).dict(),
+            headers={"Retry-After": str(retry_after)}
+        )
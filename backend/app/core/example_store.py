@@ -0,0 +1,321 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import math
+import sqlite3
+import threading
+import time
+
+from .prompts import render_example
+from .schema_retrieval import estimate_tokens, tokenize
+from .sql_utils import normalize_sql
+from .translation_cache import normalize_question
+
+
+@dataclass
+class Example:
+    id: int
+    partition: str
+    question_key: str
+    sql_key: str
+    question: str
+    sql: str
+    execution_time: float
+    schema_version: Optional[str]
+    terms: List[str] = field(default_factory=list)
+
+
+class _BM25Index:
+    """Okapi BM25 over the question terms of one partition's examples.
+
+    Examples are added and removed one at a time as the store changes; term
+    weights follow from the postings when a question is ranked.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, examples: Iterable[Example] = ()):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        for example in examples:
+            self.add(example)
+
+    def add(self, example: Example) -> None:
+        self._lengths[example.id] = len(example.terms)
+        self._total_length += len(example.terms)
+        for term in example.terms:
+            documents = self._postings.setdefault(term, {})
+            documents[example.id] = documents.get(example.id, 0) + 1
+
+    def remove(self, example: Example) -> None:
+        if self._lengths.pop(example.id, None) is None:
+            return
+        self._total_length -= len(example.terms)
+        for term in set(example.terms):
+            documents = self._postings[term]
+            del documents[example.id]
+            if not documents:
+                del self._postings[term]
+
+    def rank(self, terms: List[str]) -> List[Tuple[int, float]]:
+        """Return ``(example id, score)`` for examples sharing a term, best first."""
+        count = max(len(self._lengths), 1)
+        average_length = self._total_length / count or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            documents = self._postings.get(term)
+            if not documents:
+                continue
+            idf = math.log(1 + (count - len(documents) + 0.5) / (len(documents) + 0.5))
+            for example_id, frequency in documents.items():
+                norm = 1 - self.B + self.B * self._lengths[example_id] / average_length
+                scores[example_id] = scores.get(example_id, 0.0) + idf * (
+                    frequency * (self.K1 + 1) / (frequency + self.K1 * norm)
+                )
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+class ExampleStore:
+    """Question -> SQL pairs that ran successfully, used as few-shot examples.
+
+    Pairs are recorded after a generated query returns rows within
+    ``max_execution_time`` seconds, and the ``top_k`` questions most similar
+    to a new one (BM25 over their terms) are added to its prompt, within
+    ``token_budget`` estimated tokens. Examples are searched and recorded
+    within a partition, such as one API key's questions to one database.
+
+    A question and a SQL statement are each stored once per partition: a
+    new pair replaces any example with the same normalized question or SQL.
+    At most ``max_examples`` are kept, oldest recorded first out.
+
+    With a ``path`` the examples live in a SQLite file, survive restarts and
+    are shared by every worker on the host; other workers' writes are picked
+    up on the next search by re-reading the file. Without one they are kept
+    in memory. This worker's own writes update the search index in place.
+
+    Examples recorded against an older schema version are checked again
+    with ``validate`` before they are used, and dropped if they fail.
+    """
+
+    def __init__(
+            self,
+            path: Optional[str] = None,
+            max_examples: int = 1000,
+            top_k: int = 3,
+            token_budget: int = 800,
+            max_execution_time: float = 1.0
+    ):
+        self.path = path
+        self.max_examples = max_examples
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.max_execution_time = max_execution_time
+        self.recorded = 0
+        self.searches = 0
+        self.injected = 0
+        self._examples: Dict[int, Example] = {}
+        # (partition, normalized question or SQL) -> example id
+        self._by_question: Dict[Tuple[str, str], int] = {}
+        self._by_sql: Dict[Tuple[str, str], int] = {}
+        self._indexes: Dict[str, _BM25Index] = {}
+        self._data_version: Optional[int] = None
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly
+        self._conn = sqlite3.connect(
+            path or ":memory:", check_same_thread=False, timeout=10, isolation_level=None
+        )
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS few_shot_examples ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, partition TEXT NOT NULL,"
+            " question_key TEXT NOT NULL, sql_key TEXT NOT NULL, question TEXT NOT NULL,"
+            " sql TEXT NOT NULL, execution_time REAL NOT NULL, schema_version TEXT,"
+            " recorded_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS few_shot_examples_age ON few_shot_examples (recorded_at)"
+        )
+        with self._lock:
+            self._load()
+
+    def _load(self) -> None:
+        """Re-read every example and drop the indexes built from the old ones."""
+        rows = self._conn.execute(
+            "SELECT id, partition, question_key, sql_key, question, sql, execution_time, schema_version"
+            " FROM few_shot_examples"
+        ).fetchall()
+        self._examples = {}
+        self._by_question = {}
+        self._by_sql = {}
+        self._indexes.clear()
+        for row in rows:
+            self._add(Example(*row, terms=tokenize(row[4])))
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _add(self, example: Example) -> None:
+        self._examples[example.id] = example
+        self._by_question[(example.partition, example.question_key)] = example.id
+        self._by_sql[(example.partition, example.sql_key)] = example.id
+        index = self._indexes.get(example.partition)
+        if index is not None:
+            index.add(example)
+
+    def _discard(self, example_id: int) -> None:
+        example = self._examples.pop(example_id, None)
+        if example is None:
+            return
+        for keys, key in (
+                (self._by_question, (example.partition, example.question_key)),
+                (self._by_sql, (example.partition, example.sql_key))
+        ):
+            if keys.get(key) == example_id:
+                del keys[key]
+        index = self._indexes.get(example.partition)
+        if index is not None:
+            index.remove(example)
+
+    def _sync(self) -> None:
+        # data_version only changes when another connection commits
+        if self.path and self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+            self._load()
+
+    def _index(self, partition: str) -> _BM25Index:
+        index = self._indexes.get(partition)
+        if index is None:
+            index = self._indexes[partition] = _BM25Index([
+                example for example in self._examples.values() if example.partition == partition
+            ])
+        return index
+
+    def record(
+            self,
+            partition: str,
+            question: str,
+            sql: str,
+            execution_time: float,
+            schema_version: Optional[str] = None
+    ) -> bool:
+        """Remember a successful pair; returns whether it was stored.
+
+        Pairs slower than ``max_execution_time``, too large to ever fit the
+        token budget, or already stored are skipped.
+        """
+        if execution_time > self.max_execution_time:
+            return False
+        if estimate_tokens(render_example(question, sql)) > self.token_budget:
+            return False
+
+        question_key = normalize_question(question)
+        sql_key = normalize_sql(sql)
+        with self._lock:
+            self._sync()
+            stored = self._examples.get(self._by_question.get((partition, question_key)))
+            if stored is not None and stored.sql_key == sql_key and stored.schema_version == schema_version:
+                return False
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Other workers may have written since the check above
+                self._sync()
+                replaced = {
+                    self._by_question.get((partition, question_key)),
+                    self._by_sql.get((partition, sql_key))
+                } - {None}
+                self._conn.executemany("DELETE FROM few_shot_examples WHERE id = ?", [(i,) for i in replaced])
+                example_id = self._conn.execute(
+                    "INSERT INTO few_shot_examples (partition, question_key, sql_key, question, sql,"
+                    " execution_time, schema_version, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (partition, question_key, sql_key, question, sql, execution_time, schema_version, time.time())
+                ).lastrowid
+                evicted = []
+                overflow = len(self._examples) - len(replaced) + 1 - self.max_examples
+                if overflow > 0:
+                    evicted = [row[0] for row in self._conn.execute(
+                        "SELECT id FROM few_shot_examples ORDER BY recorded_at LIMIT ?", (overflow,)
+                    )]
+                    self._conn.executemany("DELETE FROM few_shot_examples WHERE id = ?", [(i,) for i in evicted])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            for old_id in replaced:
+                self._discard(old_id)
+            self._add(Example(
+                example_id, partition, question_key, sql_key, question, sql, execution_time, schema_version,
+                terms=tokenize(question)
+            ))
+            for old_id in evicted:
+                self._discard(old_id)
+            self.recorded += 1
+        return True
+
+    def search(
+            self,
+            partition: str,
+            question: str,
+            schema_version: Optional[str] = None,
+            validate: Optional[Callable[[str], bool]] = None
+    ) -> List[Example]:
+        """Return up to ``top_k`` examples similar to ``question``, best first.
+
+        Examples whose SQL repeats a better match's, or that would take the
+        rendered examples over ``token_budget``, are left out.
+        """
+        terms = tokenize(question)
+        if not terms:
+            return []
+
+        chosen: List[Example] = []
+        stale: List[int] = []
+        with self._lock:
+            self.searches += 1
+            self._sync()
+            seen_sql = set()
+            budget = self.token_budget
+            for example_id, _ in self._index(partition).rank(terms):
+                if len(chosen) >= self.top_k:
+                    break
+                example = self._examples[example_id]
+                if example.sql_key in seen_sql:
+                    continue
+                if example.schema_version != schema_version:
+                    if validate is None or not validate(example.sql):
+                        stale.append(example_id)
+                        continue
+                    self._conn.execute(
+                        "UPDATE few_shot_examples SET schema_version = ? WHERE id = ?",
+                        (schema_version, example_id)
+                    )
+                    example.schema_version = schema_version
+                cost = estimate_tokens(render_example(example.question, example.sql))
+                if cost > budget:
+                    continue
+                budget -= cost
+                seen_sql.add(example.sql_key)
+                chosen.append(example)
+
+            if stale:
+                self._conn.executemany("DELETE FROM few_shot_examples WHERE id = ?", [(i,) for i in stale])
+                for example_id in stale:
+                    self._discard(example_id)
+            self.injected += len(chosen)
+        return chosen
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM few_shot_examples")
+            self._load()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "examples": len(self._examples),
+                "recorded": self.recorded,
+                "searches": self.searches,
+                "injected": self.injected
+            }
+
+    def close(self) -> None:
+        self._conn.close()
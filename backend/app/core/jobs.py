@@ -0,0 +1,252 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import asyncio
+import os
+import time
+import uuid
+
+from .metrics import record_error
+from .result_encoding import ArrowFileWriter
+from .sql_verification import add_limit
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already queued or running."""
+
+
+@dataclass
+class Job:
+    id: str
+    owner: str
+    question: str
+    data_source: Optional[str] = None
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    sql: Optional[str] = None
+    columns: Optional[List[str]] = None
+    # Rows fetched and written to the result file so far
+    rows_fetched: int = 0
+    truncated: bool = False
+    error: Optional[str] = None
+    path: Optional[str] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "question": self.question,
+            "data_source": self.data_source,
+            "sql": self.sql,
+            "columns": self.columns,
+            "rows_fetched": self.rows_fetched,
+            "truncated": self.truncated,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+def _remove(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class JobManager:
+    """Long-running queries executed in the background of this worker process.
+
+    ``submit`` returns at once with a queued job; at most ``max_workers``
+    jobs generate and run their SQL at a time, and at most ``max_pending``
+    may be queued or running before new ones are refused. One owner may
+    hold at most ``max_pending_per_owner`` of those, so a single client
+    cannot fill the queue for everyone. Rows are fetched ``batch_size`` at a
+    time from a server-side cursor and appended to an Arrow IPC file under
+    ``directory``, so a large result never sits in memory; ``max_rows``
+    optionally caps it.
+
+    Cancelling a job cancels its statement on the database server. Finished
+    jobs and their files are kept for ``ttl`` seconds.
+
+    Jobs are only known to the process that accepted them, so with several
+    workers a client's requests must be routed to the same one.
+    """
+
+    def __init__(
+            self,
+            directory: str,
+            max_workers: int = 4,
+            max_pending: int = 100,
+            max_pending_per_owner: int = 10,
+            batch_size: int = 1000,
+            timeout: Optional[float] = 3600,
+            max_rows: Optional[int] = None,
+            ttl: float = 3600
+    ):
+        self.directory = directory
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_pending_per_owner = max_pending_per_owner
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._jobs: Dict[str, Job] = {}
+        self._slots = asyncio.Semaphore(max_workers)
+        os.makedirs(directory, exist_ok=True)
+        self._remove_stale_files()
+
+    def _remove_stale_files(self) -> None:
+        """Delete result files left behind by earlier processes."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".arrow") and os.path.getmtime(path) < cutoff:
+                _remove(path)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job in list(self._jobs.values()):
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job.id]
+                _remove(job.path)
+
+    def submit(
+            self,
+            executor,
+            question: str,
+            owner: str,
+            data_source: Optional[str] = None,
+            context: Optional[str] = None
+    ) -> Job:
+        """Queue a question for ``executor``; raises JobQueueFull when at capacity."""
+        self._prune()
+        active = [job for job in self._jobs.values() if not job.finished]
+        if len(active) >= self.max_pending:
+            raise JobQueueFull(f"{len(active)} jobs are already queued or running")
+        owned = sum(job.owner == owner for job in active)
+        if owned >= self.max_pending_per_owner:
+            raise JobQueueFull(
+                f"Too many jobs queued or running for this API key (limit {self.max_pending_per_owner})"
+            )
+
+        job = Job(id=uuid.uuid4().hex, owner=owner, question=question, data_source=data_source)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, executor, context))
+        return job
+
+    def get(self, job_id: str, owner: str) -> Optional[Job]:
+        """Return a job if it exists and was submitted by ``owner``."""
+        job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def list(self, owner: str) -> List[Job]:
+        self._prune()
+        return [job for job in self._jobs.values() if job.owner == owner]
+
+    async def cancel(self, job_id: str, owner: str, wait: float = 5) -> Optional[Job]:
+        """Cancel a queued or running job, or delete a finished one with its result.
+
+        Waits up to ``wait`` seconds for a running query to stop.
+        """
+        job = self.get(job_id, owner)
+        if job is None:
+            return None
+        if job.finished:
+            del self._jobs[job.id]
+            _remove(job.path)
+            return job
+        job.task.cancel()
+        await asyncio.wait([job.task], timeout=wait)
+        return job
+
+    async def _run(self, job: Job, executor, context: Optional[str]) -> None:
+        try:
+            async with self._slots:
+                job.status = RUNNING
+                job.started_at = time.time()
+                query_result = await executor.generate_query(job.question, context=context)
+                if query_result.get("error"):
+                    raise ValueError(query_result["message"])
+                query_result, job.sql = await executor.verify_query(job.question, query_result, context=context)
+                await self._spill(job, executor)
+                if not query_result.get("verified"):
+                    await executor.remember_translation(
+                        executor.with_context(job.question, context), query_result
+                    )
+                job.status = SUCCEEDED
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+            _remove(job.path)
+            job.path = None
+        except Exception as e:
+            record_error("job")
+            print(f"Error running job {job.id}: {str(e)}")
+            job.status = FAILED
+            job.error = str(e)
+            _remove(job.path)
+            job.path = None
+        finally:
+            job.finished_at = time.time()
+
+    async def _spill(self, job: Job, executor) -> None:
+        """Stream the job's rows into its result file."""
+        loop = asyncio.get_running_loop()
+        sql = job.sql
+        if self.max_rows:
+            # One row past the cap tells whether any were left out, and the
+            # database can stop there
+            sql = add_limit(sql, self.max_rows + 1, executor.sql_dialect()) or sql
+        rows = executor.stream_sql(sql, timeout=self.timeout, batch_size=self.batch_size)
+        writer = None
+        try:
+            job.columns = await rows.__anext__()
+            job.path = os.path.join(self.directory, f"{job.id}.arrow")
+            writer = ArrowFileWriter(job.path, job.columns, {"question": job.question, "sql": job.sql})
+            async for batch in rows:
+                if self.max_rows and job.rows_fetched + len(batch) > self.max_rows:
+                    batch = batch[:self.max_rows - job.rows_fetched]
+                    job.truncated = True
+                if batch:
+                    # File writes stay off the event loop and the database threads
+                    await loop.run_in_executor(None, writer.write, batch)
+                    job.rows_fetched += len(batch)
+                if job.truncated:
+                    break
+        finally:
+            await rows.aclose()
+            if writer is not None:
+                await loop.run_in_executor(None, writer.close)
+
+    def stats(self) -> Dict:
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"workers": self.max_workers, **counts}
+
+    async def shutdown(self) -> None:
+        """Cancel every unfinished job and wait for them to stop."""
+        tasks = [job.task for job in self._jobs.values() if not job.finished]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks, timeout=5)
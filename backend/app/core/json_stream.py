@@ -0,0 +1,102 @@
+from typing import Iterable, List, Optional, Tuple
+import json
+import re
+
+# An escape sequence cut off at the end of a chunk, including the first half
+# of a surrogate pair whose second half has not arrived yet. Its backslash
+# must not itself be escaped: in \\u00e9 the first backslash escapes the
+# second and "u00e9" is plain text. Group 1 keeps the even run of
+# backslashes before the escape.
+_INCOMPLETE_ESCAPE = re.compile(
+    r"(?<!\\)((?:\\\\)*)(?:\\u[dD][89abAB][0-9a-fA-F]{2}(?:\\u?[0-9a-fA-F]{0,3})?|\\u[0-9a-fA-F]{0,3})$"
+)
+
+
+def _decode(raw: str) -> str:
+    return json.loads(f'"{raw}"')
+
+
+class JSONFieldStream:
+    """Pick top-level string fields out of a JSON object as it streams in.
+
+    Feed the completion text chunk by chunk. For each field in ``fields``
+    whose value is a string, ``feed`` returns ``("delta", field, text)``
+    events as its characters arrive and a ``("done", field, value)`` event
+    as soon as the closing quote is seen, long before the whole object is
+    complete. Text before the opening brace (such as a markdown fence) is
+    skipped; nested values are passed over.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = set(fields)
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._expect_key = False
+        self._is_key = False
+        self._key: Optional[str] = None
+        self._capture: Optional[str] = None
+        self._raw: List[str] = []
+        self._emitted = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, str, str]]:
+        events: List[Tuple[str, str, str]] = []
+        for ch in chunk:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._end_string(events)
+                    continue
+                if self._is_key or self._capture:
+                    self._raw.append(ch)
+                continue
+
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._raw = []
+                self._is_key = self._depth == 1 and self._expect_key
+                if self._depth == 1 and not self._expect_key and self._key in self.fields:
+                    self._capture = self._key
+                    self._emitted = 0
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+            elif self._depth == 1 and ch == ":":
+                self._expect_key = False
+            elif self._depth == 1 and ch == ",":
+                self._expect_key = True
+
+        if self._capture:
+            self._emit_delta(events, final=False)
+        return events
+
+    def _end_string(self, events: List[Tuple[str, str, str]]) -> None:
+        self._in_string = False
+        if self._is_key:
+            self._key = _decode("".join(self._raw))
+            self._is_key = False
+        elif self._capture:
+            value = self._emit_delta(events, final=True)
+            events.append(("done", self._capture, value))
+            self._capture = None
+        self._raw = []
+
+    def _emit_delta(self, events: List[Tuple[str, str, str]], final: bool) -> str:
+        raw = "".join(self._raw)
+        if not final:
+            raw = _INCOMPLETE_ESCAPE.sub(r"\1", raw[:-1] if self._escaped else raw)
+        text = _decode(raw)
+        if len(text) > self._emitted:
+            events.append(("delta", self._capture, text[self._emitted:]))
+            self._emitted = len(text)
+        return text
@@ -0,0 +1,115 @@
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+import asyncio
+
+# httpx and the provider SDKs take a large share of startup time; they are
+# imported on first use, and only the configured provider's SDK is loaded
+if TYPE_CHECKING:
+    import httpx
+
+
+class LLMClientPool:
+    """Process-wide async AI clients sharing one pooled HTTP client.
+
+    Clients are created once per (provider, api_key, base_url) and all of them
+    send requests through the same ``httpx.AsyncClient``, so TCP/TLS
+    connections to the provider are kept alive and reused across requests.
+    ``semaphore`` caps how many AI calls may be in flight at once.
+    Nothing is imported or connected until the first client is requested.
+    """
+
+    def __init__(
+            self,
+            max_connections: int = 100,
+            max_keepalive_connections: int = 20,
+            keepalive_expiry: float = 30.0,
+            timeout: float = 60.0,
+            connect_timeout: float = 5.0,
+            http2: bool = True,
+            max_concurrency: int = 50,
+            max_retries: int = 2
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.read_timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.http2 = http2
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._http_client: Optional["httpx.AsyncClient"] = None
+        self._clients: Dict[Tuple, Any] = {}
+
+    @property
+    def timeout(self) -> "httpx.Timeout":
+        import httpx
+
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    @property
+    def http_client(self) -> "httpx.AsyncClient":
+        if self._http_client is None or self._http_client.is_closed:
+            import httpx
+
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                timeout=self.timeout,
+                http2=self.http2
+            )
+        return self._http_client
+
+    def get(self, provider: str, api_key: str, base_url: Optional[str] = None):
+        """Return the shared async client for a provider."""
+        key = (provider, api_key, base_url)
+        client = self._clients.get(key)
+        if client is None:
+            client = create_ai_client(
+                provider,
+                api_key,
+                base_url=base_url,
+                http_client=self.http_client,
+                timeout=self.timeout,
+                max_retries=self.max_retries
+            )
+            self._clients[key] = client
+        return client
+
+    def register(self, provider: str, api_key: str, client, base_url: Optional[str] = None) -> None:
+        """Use a prebuilt client (for example a mock) for a provider."""
+        self._clients[(provider, api_key, base_url)] = client
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and forget all AI clients."""
+        self._clients.clear()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+def create_ai_client(
+        provider: str,
+        api_key: str,
+        base_url: Optional[str] = None,
+        http_client: Optional["httpx.AsyncClient"] = None,
+        timeout: Optional["httpx.Timeout"] = None,
+        max_retries: int = 2
+):
+    """Create an async AI client for ``provider`` ('claude' or 'openai')."""
+    kwargs: Dict[str, Any] = {"api_key": api_key, "max_retries": max_retries}
+    if base_url:
+        kwargs["base_url"] = base_url
+    if http_client is not None:
+        kwargs["http_client"] = http_client
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    if provider == "claude":
+        from anthropic import AsyncAnthropic
+
+        return AsyncAnthropic(**kwargs)
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(**kwargs)
@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+from typing import Dict, Iterator, Optional
+import time
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+# Stages of a request, in the order they usually happen:
+# schema (load/refresh), prompt (build), llm (provider call), parse (JSON
+# response), verify (EXPLAIN), execute (SQL), serialize (response body)
+_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "nlquery_stage_seconds",
+    "Time spent in each stage of handling a request",
+    ["stage"],
+    buckets=_LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "nlquery_request_seconds",
+    "End-to-end request latency per endpoint",
+    ["endpoint"],
+    buckets=_LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "nlquery_llm_tokens",
+    "Tokens reported by the AI provider",
+    ["provider", "kind"]
+)
+CACHE_LOOKUPS = Counter(
+    "nlquery_cache_lookups",
+    "Cache lookups by cache and outcome",
+    ["cache", "result"]
+)
+ERRORS = Counter(
+    "nlquery_errors",
+    "Failed requests by the stage that failed",
+    ["stage"]
+)
+ADMISSION_REJECTIONS = Counter(
+    "nlquery_admission_rejections",
+    "Requests and AI calls shed with 429, by limit hit",
+    ["reason"]
+)
+
+# Stage durations of the request being handled, when it asked for them
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timing() -> Dict[str, float]:
+    """Collect stage durations for the current request and return the dict they go into."""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage on the monotonic clock.
+
+    The duration is observed in the stage histogram and, for requests that
+    called ``start_request_timing``, added to that request's breakdown.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage=name).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """Render a breakdown as ``stage;dur=<ms>`` pairs, as in Server-Timing."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+def record_llm_usage(provider: str, usage) -> int:
+    """Count tokens from an Anthropic or OpenAI usage object and return their total."""
+    if usage is None:
+        return 0
+    if isinstance(usage, dict):
+        # Fields the installed SDK does not model yet come back as plain dicts
+        usage = SimpleNamespace(**usage)
+    total = 0
+    for kind, attribute in (
+            ("input", "input_tokens"),
+            ("output", "output_tokens"),
+            ("cache_read", "cache_read_input_tokens"),
+            ("cache_write", "cache_creation_input_tokens"),
+            ("input", "prompt_tokens"),
+            ("output", "completion_tokens"),
+    ):
+        count = getattr(usage, attribute, None)
+        if count:
+            LLM_TOKENS.labels(provider=provider, kind=kind).inc(count)
+            total += count
+    return total
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def record_error(stage_name: str) -> None:
+    ERRORS.labels(stage=stage_name).inc()
+
+
+def record_rejection(reason: str) -> None:
+    ADMISSION_REJECTIONS.labels(reason=reason).inc()
+
+
+class PoolCollector:
+    """Report connection pool gauges for every engine in an ExecutorRegistry."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def collect(self):
+        size = GaugeMetricFamily("nlquery_db_pool_size", "Configured pool size", labels=["database"])
+        checked_out = GaugeMetricFamily(
+            "nlquery_db_pool_checked_out", "Connections currently in use", labels=["database"]
+        )
+        overflow = GaugeMetricFamily(
+            "nlquery_db_pool_overflow", "Connections open beyond the pool size", labels=["database"]
+        )
+        for engine in self.registry.engines():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            database = engine.url.render_as_string(hide_password=True)
+            size.add_metric([database], pool.size())
+            checked_out.add_metric([database], pool.checkedout())
+            overflow.add_metric([database], max(pool.overflow(), 0))
+        yield size
+        yield checked_out
+        yield overflow
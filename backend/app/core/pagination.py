@@ -0,0 +1,206 @@
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+import json
+import uuid
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from .cache import MemoryCacheBackend
+from .sql_utils import strip_terminator
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(payload: Dict) -> str:
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Dict:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError("Invalid pagination cursor")
+    if not isinstance(payload, dict) or "q" not in payload:
+        raise InvalidCursorError("Invalid pagination cursor")
+    return payload
+
+
+def detect_keyset(sql: str, schema: Dict, dialect: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """Return ``(column, direction)`` if ``sql`` can be paged by keyset.
+
+    Seeking past the last key of a page is only correct when that key is
+    unique in the result. That requires a plain SELECT from a single table
+    (no joins, grouping or set operations) ordered by nothing but the
+    table's single-column primary key, with no LIMIT/OFFSET of its own.
+    Anything else is paged with LIMIT/OFFSET.
+    """
+    try:
+        statement = sqlglot.parse_one(strip_terminator(sql), read=dialect)
+    except SqlglotError:
+        return None
+    if not isinstance(statement, exp.Select) or any(
+            statement.args.get(clause) for clause in ("joins", "group", "having", "limit", "offset")
+    ):
+        return None
+
+    source = statement.args.get("from")
+    order = statement.args.get("order")
+    if source is None or order is None or len(order.expressions) != 1:
+        return None
+    table = source.this
+    ordered = order.expressions[0]
+    column = ordered.this
+    if (
+            not isinstance(table, exp.Table)
+            or not isinstance(column, exp.Column)
+            or column.table not in ("", table.name, table.alias_or_name)
+    ):
+        return None
+
+    keys = [col["name"] for col in schema["tables"].get(table.name, []) if col.get("primary_key")]
+    if len(keys) != 1 or keys[0].lower() != column.name.lower():
+        return None
+    return keys[0], "DESC" if ordered.args.get("desc") else "ASC"
+
+
+def _page_in_place(sql: str, limit: int, offset: int, dialect: Optional[str]) -> Optional[str]:
+    """Give a plain SELECT the page's LIMIT/OFFSET itself, without a wrapper.
+
+    A LIMIT/OFFSET the query already has is folded in. Returns None when
+    that is not possible: set operations, FETCH or non-literal limits, or
+    SQL that does not parse.
+    """
+    try:
+        statement = sqlglot.parse_one(sql, read=dialect)
+    except SqlglotError:
+        return None
+    if not isinstance(statement, exp.Select):
+        return None
+
+    bounds = {}
+    for clause, kind in (("limit", exp.Limit), ("offset", exp.Offset)):
+        node = statement.args.get(clause)
+        if node is None:
+            continue
+        value = node.expression
+        if not isinstance(node, kind) or not isinstance(value, exp.Literal) or not value.is_int:
+            return None
+        bounds[clause] = int(value.this)
+    if "limit" in bounds:
+        limit = max(min(limit, bounds["limit"] - offset), 0)
+    return statement.limit(limit).offset(bounds.get("offset", 0) + offset).sql(dialect=dialect)
+
+
+def _check_wrappable(sql: str, dialect: Optional[str]) -> None:
+    """Raise ValueError if MySQL would reject ``sql`` as a derived table.
+
+    MySQL refuses a derived table with two columns of the same name, which
+    a join easily produces (``SELECT *`` over two tables with an ``id``).
+    """
+    if dialect != "mysql":
+        return
+    try:
+        statement = sqlglot.parse_one(sql, read=dialect)
+    except SqlglotError:
+        return
+    names = [name.lower() for name in statement.named_selects]
+    select = statement if isinstance(statement, exp.Select) else statement.find(exp.Select)
+    joined = select is not None and bool(select.args.get("joins"))
+    if len(set(names)) != len(names) or (joined and "*" in names):
+        raise ValueError("This query cannot be paginated: give every result column a distinct name")
+
+
+def paginate_sql(
+        sql: str,
+        limit: int,
+        offset: int = 0,
+        keyset: Optional[Tuple[str, str]] = None,
+        after: Any = None,
+        dialect: Optional[str] = None
+) -> Tuple[str, Dict]:
+    """Rewrite ``sql`` so it returns one page; returns ``(sql, params)``.
+
+    With a keyset and the last key of the previous page this seeks past it.
+    Otherwise it pages with LIMIT/OFFSET and relies on the query's ORDER BY,
+    adding them to the query itself when it is a plain SELECT and wrapping
+    it in a subquery when not.
+    """
+    inner = strip_terminator(sql)
+    params: Dict[str, Any] = {"nlq_limit": limit}
+    if keyset and after is not None:
+        column, direction = keyset
+        column = exp.to_identifier(column, quoted=True).sql(dialect=dialect)
+        comparison = "<" if direction == "DESC" else ">"
+        params["nlq_after"] = after
+        _check_wrappable(inner, dialect)
+        return (
+            f"SELECT * FROM ({inner}) AS nlq_page "
+            f"WHERE nlq_page.{column} {comparison} :nlq_after "
+            f"ORDER BY nlq_page.{column} {direction} LIMIT :nlq_limit",
+            params
+        )
+
+    paged = _page_in_place(inner, limit, offset, dialect)
+    if paged is not None:
+        return paged, {}
+
+    _check_wrappable(inner, dialect)
+    params["nlq_offset"] = offset
+    return (
+        f"SELECT * FROM ({inner}) AS nlq_page LIMIT :nlq_limit OFFSET :nlq_offset",
+        params
+    )
+
+
+class QueryPager:
+    """Remembers the SQL behind each paginated query.
+
+    Cursor tokens only carry an opaque query id plus the position, so
+    clients can never smuggle their own SQL in through a cursor, and later
+    pages never call the AI provider again.
+    """
+
+    def __init__(self, backend=None, ttl: Optional[float] = 3600):
+        # A shared backend lets a cursor issued by one worker be used on another
+        self.shared = backend is not None
+        self.backend = backend if backend is not None else MemoryCacheBackend(max_entries=10000)
+        self.ttl = ttl
+
+    def register(self, sql: str, keyset: Optional[Tuple[str, str]], query: Dict) -> str:
+        query_id = uuid.uuid4().hex
+        self.backend.set(
+            query_id,
+            {"sql": sql, "keyset": list(keyset) if keyset else None, "query": query},
+            ttl=self.ttl
+        )
+        return query_id
+
+    def lookup(self, query_id: str) -> Dict:
+        entry = self.backend.get(query_id)
+        if entry is None:
+            raise InvalidCursorError("Pagination cursor has expired")
+        return entry
+
+    def next_cursor(
+            self,
+            query_id: str,
+            page_size: int,
+            offset: int,
+            keyset: Optional[List],
+            columns: List[str],
+            rows: List
+    ) -> str:
+        """Build the cursor for the page after ``rows``."""
+        payload: Dict[str, Any] = {"q": query_id, "n": page_size, "o": offset + len(rows)}
+        if keyset and keyset[0] in columns:
+            last_value = rows[-1][columns.index(keyset[0])]
+            # Only values that bind back cleanly from JSON are usable as keys
+            if isinstance(last_value, (int, str)):
+                payload["k"] = last_value
+        return encode_cursor(payload)
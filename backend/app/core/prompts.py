@@ -0,0 +1,121 @@
+from typing import Dict, Iterable, List, Optional
+
+
+# Static instructions go first so the prefix is byte-identical across requests
+# and schema versions, which lets provider-side prompt caching reuse it.
+SYSTEM_PROMPT_PREFIX = """You are a SQL query generator. Convert natural language requests into valid SQL queries using the database schema provided below.
+
+REQUIREMENTS:
+1. Return ONLY a JSON object with this exact structure:
+{
+  "sql": "SELECT * FROM example",
+  "explanation": "This query does X",
+  "validation": {
+    "isValid": true,
+    "issues": []
+  }
+}
+
+2. Follow these rules:
+- Use only tables and columns from the schema
+- Include comments for complex queries
+- Use proper SQL syntax and JOIN statements
+- Always verify column references
+- Handle dates and times appropriately
+- Use appropriate SQL functions
+- Ensure proper WHERE clauses
+
+Do not include any other text, markdown, or explanation outside the JSON object. The response should be a single, valid JSON object that can be parsed directly."""
+
+# Anthropic caches no prefix shorter than this; a cache_control marker on a
+# shorter one is ignored
+MIN_CACHEABLE_PROMPT_TOKENS = 1024
+
+SCHEMA_FORMATS = ("verbose", "compact")
+
+
+class SchemaRenderer:
+    """Render a schema snapshot to prompt text, once per snapshot.
+
+    Each table and relationship is rendered a single time when the renderer
+    is built; descriptions of the whole schema or of a pruned subset are then
+    just joins of those pieces.
+
+    ``verbose`` is the original bulleted layout. ``compact`` is DDL-style,
+    one ``CREATE TABLE`` line per table, and costs roughly half the tokens.
+    """
+
+    def __init__(self, schema: Dict, fmt: str = "verbose"):
+        if fmt not in SCHEMA_FORMATS:
+            raise ValueError(f"Unsupported schema format: {fmt}")
+        self.schema = schema
+        self.fmt = fmt
+        self._tables: Dict[str, str] = {
+            name: self._render_table(name, columns)
+            for name, columns in schema["tables"].items()
+        }
+        self._relationships = [
+            (rel["table1"], rel["table2"], self._render_relationship(rel))
+            for rel in schema["relationships"]
+        ]
+        self._full: Optional[str] = None
+
+    def _render_table(self, name: str, columns: List[Dict]) -> str:
+        if self.fmt == "compact":
+            definitions = ", ".join(f"{col['name']} {col['type']}" for col in columns)
+            return f"CREATE TABLE {name} ({definitions});\n"
+        lines = [f"Table: {name}\n", "Columns:\n"]
+        lines.extend(f"  - {col['name']} ({col['type']})\n" for col in columns)
+        lines.append("\n")
+        return "".join(lines)
+
+    def _render_relationship(self, rel: Dict) -> str:
+        source = f"{rel['table1']}.{rel['keys'][rel['table1']]}"
+        target = f"{rel['table2']}.{rel['keys'][rel['table2']]}"
+        if self.fmt == "compact":
+            return f"-- FK {source} -> {target}\n"
+        return f"- {rel['table1']} {rel['type']} {rel['table2']} ({source} -> {target})\n"
+
+    def render(self, tables: Optional[Iterable[str]] = None) -> str:
+        """Describe the whole schema, or only ``tables`` and the keys between them."""
+        if tables is None:
+            if self._full is None:
+                self._full = self._join(self._tables, self._relationships)
+            return self._full
+
+        names = set(tables)
+        return self._join(
+            {name: text for name, text in self._tables.items() if name in names},
+            [rel for rel in self._relationships if rel[0] in names and rel[1] in names]
+        )
+
+    def _join(self, tables: Dict[str, str], relationships: List) -> str:
+        parts = ["Database Schema:\n\n"]
+        parts.extend(tables.values())
+        if self.fmt == "compact":
+            parts.append("\n")
+        if relationships:
+            parts.append("Relationships:\n")
+            parts.extend(rel[2] for rel in relationships)
+        return "".join(parts)
+
+
+def repair_request(natural_language: str, sql: str, problem: str) -> str:
+    """Ask the model to fix SQL that failed verification."""
+    return (
+        f"{natural_language}\n\n"
+        f"Your previous SQL for this request was:\n{sql}\n\n"
+        f"It cannot be used as is: {problem}\n"
+        "Return a corrected JSON object in the same format."
+    )
+
+
+def render_example(question: str, sql: str) -> str:
+    return f"Question: {question}\nSQL: {sql}\n\n"
+
+
+def render_examples(examples: Iterable) -> str:
+    """Describe earlier questions and the SQL that answered them."""
+    parts = ["Examples of questions answered correctly against this database:\n\n"]
+    parts.extend(render_example(example.question, example.sql) for example in examples)
+    return "".join(parts).rstrip("\n")
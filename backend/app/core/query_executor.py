@@ -1,14 +1,62 @@
-from typing import Dict, List, Optional, Union
-import anthropic
-from openai import AsyncOpenAI
-from sqlalchemy import create_engine, inspect, text
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+import asyncio
+import functools
+import hashlib
+import time
+from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
 from dataclasses import dataclass
-import pandas as pd
 import json
-import re
-from datetime import datetime
+
+from .admission import AdmissionRejected, LLMScheduler, current_client, report_llm_tokens
+from .example_store import Example, ExampleStore
+from .json_stream import JSONFieldStream
+from .metrics import record_cache_lookup, record_error, record_llm_usage, stage
+from .llm_clients import create_ai_client
+from .result_encoding import rows_to_records
+from .pagination import QueryPager, decode_cursor, detect_keyset, paginate_sql
+from .result_cache import ResultCache
+from .single_flight import SingleFlight
+from .schema_cache import SchemaCache
+from .sql_utils import normalize_sql
+from .sql_validation import SQLValidator, is_read_only, sqlglot_dialect
+from .sql_verification import (
+    CostLimitError,
+    PlanEstimate,
+    VerificationConfig,
+    add_limit,
+    explain_statement,
+    parse_plan,
+    planner_message,
+)
+from .schema_retrieval import SchemaIndex, SchemaPruningConfig, estimate_tokens
+from .prompts import (
+    MIN_CACHEABLE_PROMPT_TOKENS,
+    SYSTEM_PROMPT_PREFIX,
+    SchemaRenderer,
+    render_examples,
+    repair_request,
+)
+from .translation_cache import TranslationCache, normalize_question
+
+
+# How much longer than the server-side statement timeout we wait before
+# cancelling the query from the client side.
+_CANCEL_GRACE_SECONDS = 1.0
+
+_STREAM_DONE = object()
+
+# Set while a request holds an AI provider slot; tasks it starts inherit it
+_holding_llm_slot: ContextVar[bool] = ContextVar("holding_llm_slot", default=False)
+
+_BACKEND_ID_SQL = {
+    "postgresql": "SELECT pg_backend_pid()",
+    "mysql": "SELECT CONNECTION_ID()",
+}
 
 
 @dataclass
@@ -29,14 +77,142 @@ class AIConfig:
     model: Optional[str] = None
     temperature: float = 0
     max_tokens: int = 1000
+    base_url: Optional[str] = None  # Override for proxies or gateways
+
+
+def build_database_url(db_config: DatabaseConfig) -> str:
+    """Build the SQLAlchemy connection URL for a database configuration."""
+    if db_config.type == "postgresql":
+        url = f"postgresql://{db_config.user}:{db_config.password}@{db_config.host}:{db_config.port}/{db_config.database}"
+    elif db_config.type == "mysql":
+        url = f"mysql+pymysql://{db_config.user}:{db_config.password}@{db_config.host}:{db_config.port}/{db_config.database}"
+    elif db_config.type == "sqlite":
+        # Local file databases (fixtures, benchmarks); database is the file path
+        return f"sqlite:///{db_config.database}"
+    else:
+        raise ValueError(f"Unsupported database type: {db_config.type}")
+
+    # Add SSL if required
+    if db_config.ssl:
+        url += "?ssl=true"
+
+    return url
+
+
+def create_database_engine(
+        db_config: DatabaseConfig,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: int = 30,
+        pool_recycle: int = 3600
+) -> Engine:
+    """Create a pooled SQLAlchemy engine for a database configuration."""
+    connect_args = {}
+    if db_config.type == "sqlite":
+        # Connections are handed between database pool threads
+        connect_args["check_same_thread"] = False
+    return create_engine(
+        build_database_url(db_config),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=True,
+        connect_args=connect_args
+    )
+
+
+def _set_statement_timeout(connection, timeout: Optional[float]) -> None:
+    """Apply a server-side statement timeout to the current connection."""
+    if not timeout:
+        return
+    milliseconds = int(timeout * 1000)
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        # SET LOCAL is scoped to the current transaction, so the pool never
+        # hands out a connection with a leftover timeout
+        connection.execute(text(f"SET LOCAL statement_timeout = {milliseconds}"))
+    elif dialect == "mysql":
+        connection.execute(text(f"SET SESSION MAX_EXECUTION_TIME = {milliseconds}"))
+
+
+def _reset_statement_timeout(connection) -> None:
+    """Undo session-scoped timeouts before the connection returns to the pool."""
+    if connection.dialect.name == "mysql":
+        try:
+            connection.execute(text("SET SESSION MAX_EXECUTION_TIME = 0"))
+        except SQLAlchemyError:
+            # The pool will discard the connection if it is broken
+            pass
+
+
+def _set_read_only(connection) -> None:
+    """Make the database itself refuse writes for the current transaction.
+
+    Generated SQL is already parsed and rejected unless it is a plain
+    query, but functions and procedures can still write; this is the
+    backstop. Must run before the first statement of the transaction.
+    """
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "mysql"):
+        # Applies to the transaction being started and ends with it
+        connection.execute(text("SET TRANSACTION READ ONLY"))
+    elif dialect == "sqlite":
+        connection.execute(text("PRAGMA query_only = ON"))
+
+
+def _reset_read_only(connection) -> None:
+    """Undo connection-scoped read-only mode before the connection returns to the pool."""
+    if connection.dialect.name == "sqlite":
+        try:
+            connection.execute(text("PRAGMA query_only = OFF"))
+        except SQLAlchemyError:
+            pass
+
+
+def cancel_backend_query(engine: Engine, backend_id: Any) -> None:
+    """Cancel the statement running on another connection of ``engine``."""
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_cancel_backend(:pid)"), {"pid": backend_id})
+        elif engine.dialect.name == "mysql":
+            conn.execute(text(f"KILL QUERY {int(backend_id)}"))
 
 
 class AIQueryExecutor:
-    def __init__(self, ai_config: AIConfig, db_config: DatabaseConfig):
+    def __init__(
+            self,
+            ai_config: AIConfig,
+            db_config: DatabaseConfig,
+            engine: Optional[Engine] = None,
+            schema_cache: Optional[SchemaCache] = None,
+            db_executor: Optional[ThreadPoolExecutor] = None,
+            ai_client=None,
+            llm_semaphore: Optional[asyncio.Semaphore] = None,
+            translation_cache: Optional[TranslationCache] = None,
+            pager: Optional[QueryPager] = None,
+            schema_pruning: Optional[SchemaPruningConfig] = None,
+            schema_format: str = "verbose",
+            prompt_caching: bool = True,
+            result_cache: Optional[ResultCache] = None,
+            generation_flight: Optional[SingleFlight] = None,
+            execution_flight: Optional[SingleFlight] = None,
+            verification: Optional[VerificationConfig] = None,
+            router=None,
+            llm_scheduler: Optional[LLMScheduler] = None,
+            example_store: Optional[ExampleStore] = None
+    ):
         self.ai_config = ai_config
         self.db_config = db_config
-        self.engine: Optional[Engine] = None
+        self.engine: Optional[Engine] = engine
+        self.schema_cache = schema_cache or SchemaCache()
         self.schema = {"tables": {}, "relationships": []}
+        self.schema_version: Optional[str] = None
+        # Blocking database work runs here; None means the loop's default pool
+        self.db_executor = db_executor
+        self.connected = False
+        # Engines passed in are shared and must not be disposed by this executor
+        self._owns_engine = False
 
         # Set default AI models if not specified
         if not self.ai_config.model:
@@ -45,116 +221,421 @@ class AIQueryExecutor:
                 else "gpt-4"
             )
 
-        # Initialize AI client
-        if ai_config.provider == "claude":
-            self.ai_client = anthropic.Anthropic(api_key=ai_config.api_key)
-        else:
-            self.ai_client = AsyncOpenAI(api_key=ai_config.api_key)
+        # Initialize AI client; shared clients reuse pooled HTTP connections
+        self.ai_client = ai_client or create_ai_client(
+            ai_config.provider,
+            ai_config.api_key,
+            base_url=ai_config.base_url
+        )
+        # Caps concurrent AI calls across every executor sharing the semaphore
+        self.llm_semaphore = llm_semaphore
+        # Fair queue of AI calls between API keys; replaces the semaphore when set
+        self.llm_scheduler = llm_scheduler
+        self.translation_cache = translation_cache
+        self.pager = pager or QueryPager()
+        # Large schemas are cut down to the tables relevant to each question
+        self.schema_pruning = schema_pruning
+        self._schema_index: Optional[SchemaIndex] = None
+        self._schema_index_version: Optional[str] = None
+        # 'verbose' or 'compact'; see SchemaRenderer
+        self.schema_format = schema_format
+        self._schema_renderer: Optional[SchemaRenderer] = None
+        self._sql_validator: Optional[SQLValidator] = None
+        # Mark the stable prompt prefix as cacheable for providers that support it
+        self.prompt_caching = prompt_caching
+        self.result_cache = result_cache
+        # Concurrent identical questions and SQL share one in-flight call
+        self.generation_flight = generation_flight
+        self.execution_flight = execution_flight
+        # EXPLAIN generated SQL before running it; None runs it unchecked
+        self.verification = verification
+        # ReplicaRouter spreading read-only queries over replicas of the
+        # database; schema reflection and change tracking stay on the primary
+        self.router = router
+        # Fast, successful question -> SQL pairs, shown to the AI as examples
+        self.example_store = example_store
 
     def connect(self) -> None:
         """Establish database connection and fetch schema."""
         try:
-            # Create connection URL
-            if self.db_config.type == "postgresql":
-                url = f"postgresql://{self.db_config.user}:{self.db_config.password}@{self.db_config.host}:{self.db_config.port}/{self.db_config.database}"
-            elif self.db_config.type == "mysql":
-                url = f"mysql+pymysql://{self.db_config.user}:{self.db_config.password}@{self.db_config.host}:{self.db_config.port}/{self.db_config.database}"
-            else:
-                raise ValueError(f"Unsupported database type: {self.db_config.type}")
-
-            # Add SSL if required
-            if self.db_config.ssl:
-                url += "?ssl=true"
-
-            # Create engine with connection pooling
-            self.engine = create_engine(
-                url,
-                pool_size=5,
-                max_overflow=10,
-                pool_timeout=30,
-                pool_recycle=3600
-            )
+            # Create engine with connection pooling unless one was shared with us
+            if not self.engine:
+                self.engine = create_database_engine(self.db_config)
+                self._owns_engine = True
 
             # Test connection
             with self.engine.connect() as conn:
                 conn.execute(text("SELECT 1"))
 
-            # Fetch schema if not already loaded
-            if not self.schema["tables"]:
-                self.fetch_database_schema()
+            # Load the schema from the cache, reflecting it if needed
+            self.fetch_database_schema()
+
+            self.connected = True
 
         except Exception as e:
             raise ConnectionError(f"Database connection failed: {str(e)}")
 
     def disconnect(self) -> None:
-        """Close database connection."""
-        if self.engine:
+        """Close database connection.
+
+        Shared engines are owned by the registry and are left untouched.
+        """
+        if self.engine and self._owns_engine:
             self.engine.dispose()
             self.engine = None
+        self.connected = False
+
+    def fetch_database_schema(self, force: bool = False, full: bool = False) -> Dict:
+        """Fetch database schema including tables, columns, and relationships.
 
-    def fetch_database_schema(self) -> Dict:
-        """Fetch database schema including tables, columns, and relationships."""
+        The schema comes from the shared schema cache and is only re-reflected
+        when the cached snapshot is stale, or when ``force``/``full`` is set.
+        """
         if not self.engine:
             raise ConnectionError("Not connected to database")
 
-        inspector = inspect(self.engine)
-        schema = {"tables": {}, "relationships": []}
-
-        # Fetch tables and columns
-        for table_name in inspector.get_table_names():
-            columns = []
-            for column in inspector.get_columns(table_name):
-                columns.append({
-                    "name": column["name"],
-                    "type": str(column["type"])
-                })
-            schema["tables"][table_name] = columns
-
-        # Fetch foreign key relationships
-        for table_name in inspector.get_table_names():
-            for fk in inspector.get_foreign_keys(table_name):
-                schema["relationships"].append({
-                    "table1": table_name,
-                    "table2": fk["referred_table"],
-                    "type": "foreignKey",
-                    "keys": {
-                        table_name: fk["constrained_columns"][0],
-                        fk["referred_table"]: fk["referred_columns"][0]
-                    }
-                })
-
-        self.schema = schema
-        return schema
-
-    def generate_schema_description(self) -> str:
+        snapshot = self.schema_cache.get(self.engine, force=force, full=full)
+        previous_version = self.schema_version
+        self.schema = snapshot.schema
+        self.schema_version = snapshot.version
+
+        # Translations made against the old schema may reference dropped columns
+        if self.translation_cache and previous_version and previous_version != snapshot.version:
+            self.translation_cache.invalidate_schema(previous_version)
+
+        return self.schema
+
+    async def run_blocking(self, func: Callable, *args, **kwargs):
+        """Run blocking database work on the database thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.db_executor,
+            functools.partial(func, *args, **kwargs)
+        )
+
+    async def cache_call(self, cache, func: Callable, *args):
+        """Call a cache method, on the database threads when ``cache`` is shared.
+
+        Shared caches talk to SQLite or Redis, which must not block the loop.
+        """
+        if cache.shared:
+            return await self.run_blocking(func, *args)
+        return func(*args)
+
+    def read_engine(self) -> Engine:
+        """Return the engine to run a read-only query on."""
+        if self.router is None:
+            return self.engine
+        return self.router.choose()
+
+    def _execute_sql(
+            self,
+            engine: Engine,
+            sql: str,
+            use_transaction: bool,
+            timeout: Optional[float],
+            backend_ids: List,
+            params: Optional[Dict] = None,
+            max_rows: Optional[int] = None
+    ) -> Tuple[List[str], List]:
+        """Execute SQL synchronously and return ``(columns, rows)``.
+
+        The connection's backend id is appended to ``backend_ids`` before the
+        statement runs so the caller can cancel it from another connection.
+        With ``max_rows`` at most ``max_rows + 1`` rows are fetched, so the
+        caller can tell a capped result from one that fit exactly.
+        """
+        with engine.connect() as connection:
+            try:
+                with connection.begin() if use_transaction else nullcontext():
+                    _set_read_only(connection)
+                    backend_id_sql = _BACKEND_ID_SQL.get(connection.dialect.name)
+                    if backend_id_sql:
+                        backend_ids.append(connection.execute(text(backend_id_sql)).scalar())
+                    _set_statement_timeout(connection, timeout)
+
+                    result = connection.execute(text(sql), params or {})
+                    columns = list(result.keys())
+                    data = result.fetchmany(max_rows + 1) if max_rows else result.fetchall()
+            finally:
+                _reset_statement_timeout(connection)
+                _reset_read_only(connection)
+
+        return columns, data
+
+    async def run_sql(
+            self,
+            sql: str,
+            use_transaction: bool = True,
+            timeout: Optional[float] = 30,
+            params: Optional[Dict] = None,
+            max_rows: Optional[int] = None
+    ) -> Tuple[List[str], List]:
+        """Execute SQL off the event loop, cancelling it if it overruns ``timeout``.
+
+        The query runs on a read replica when there is a healthy one. If the
+        replica cannot be reached or drops the connection, it is taken out of
+        rotation and the query is retried once on the primary.
+        """
+        engine = self.read_engine()
+        backend_ids: List = []
+        try:
+            return await self._run_sql_on(engine, sql, use_transaction, timeout, params, max_rows, backend_ids)
+        except DBAPIError as e:
+            # Without a backend id the statement never started
+            unreachable = e.connection_invalidated or (
+                not backend_ids and engine.dialect.name in _BACKEND_ID_SQL
+            )
+            if engine is self.engine or not unreachable:
+                raise
+            print(f"Replica {engine.url.render_as_string(hide_password=True)} failed, using the primary: {str(e)}")
+            self.router.mark_failed(engine)
+            return await self._run_sql_on(self.engine, sql, use_transaction, timeout, params, max_rows, [])
+
+    async def _run_sql_on(
+            self,
+            engine: Engine,
+            sql: str,
+            use_transaction: bool,
+            timeout: Optional[float],
+            params: Optional[Dict],
+            max_rows: Optional[int],
+            backend_ids: List
+    ) -> Tuple[List[str], List]:
+        future = self.run_blocking(
+            self._execute_sql, engine, sql, use_transaction, timeout, backend_ids,
+            params=params, max_rows=max_rows
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            if not timeout:
+                return await future
+            return await asyncio.wait_for(future, timeout + _CANCEL_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            if backend_ids:
+                # Use the default pool so a saturated database pool cannot block the cancel
+                await loop.run_in_executor(None, cancel_backend_query, engine, backend_ids[0])
+            raise TimeoutError(f"Query exceeded the {timeout}s timeout and was cancelled")
+        except asyncio.CancelledError:
+            # Nobody is waiting for the rows any more; stop the statement too
+            if backend_ids:
+                loop.run_in_executor(None, cancel_backend_query, engine, backend_ids[0])
+            raise
+
+    async def run_cached_sql(
+            self,
+            sql: str,
+            use_transaction: bool = True,
+            timeout: Optional[float] = 30,
+            params: Optional[Dict] = None,
+            max_rows: Optional[int] = None
+    ) -> Tuple[List[str], List, bool]:
+        """Like ``run_sql``, but served from the result cache when possible.
+
+        Returns ``(columns, rows, cached)``. Concurrent calls for the same
+        SQL share a single execution.
+        """
+        if self.execution_flight is None:
+            return await self._run_cached_sql(sql, use_transaction, timeout, params, max_rows)
+
+        key = (
+            str(self.engine.url),
+            normalize_sql(sql, self.sql_dialect()),
+            json.dumps(params or {}, sort_keys=True, default=str),
+            max_rows,
+            use_transaction
+        )
+        return await self.execution_flight.do(
+            key,
+            lambda: self._run_cached_sql(sql, use_transaction, timeout, params, max_rows)
+        )
+
+    async def _run_cached_sql(
+            self,
+            sql: str,
+            use_transaction: bool,
+            timeout: Optional[float],
+            params: Optional[Dict],
+            max_rows: Optional[int]
+    ) -> Tuple[List[str], List, bool]:
+        cache = self.result_cache
+        if cache is None:
+            with stage("execute"):
+                columns, data = await self.run_sql(
+                    sql, use_transaction=use_transaction, timeout=timeout, params=params, max_rows=max_rows
+                )
+            return columns, data, False
+
+        if cache.check_due(self.engine):
+            await self.run_blocking(cache.check_modifications, self.engine)
+        hit = await self.cache_call(cache, cache.get, self.engine, sql, params, max_rows)
+        record_cache_lookup("result", hit is not None)
+        if hit is not None:
+            return hit[0], hit[1], True
+
+        epoch = cache.epoch(self.engine)
+        with stage("execute"):
+            columns, data = await self.run_sql(
+                sql, use_transaction=use_transaction, timeout=timeout, params=params, max_rows=max_rows
+            )
+        await self.cache_call(cache, cache.set, self.engine, sql, params, max_rows, columns, data, epoch)
+        return columns, data, False
+
+    def get_schema_index(self) -> SchemaIndex:
+        """Return the table retrieval index for the current schema version."""
+        if self._schema_index is None or self._schema_index_version != self.schema_version:
+            self._schema_index = SchemaIndex(self.schema)
+            self._schema_index_version = self.schema_version
+        return self._schema_index
+
+    def select_prompt_tables(self, natural_language: Optional[str]) -> Optional[List[str]]:
+        """Return the tables worth sending for this question, or None for all."""
+        pruning = self.schema_pruning
+        if (
+                not pruning
+                or not natural_language
+                or len(self.schema["tables"]) <= pruning.min_tables
+        ):
+            return None
+
+        return self.get_schema_index().select_within_budget(natural_language, pruning)
+
+    def get_schema_renderer(self) -> SchemaRenderer:
+        """Return the prompt renderer for the current schema snapshot."""
+        # Snapshots are replaced, never mutated, so identity tracks the version
+        if self._schema_renderer is None or self._schema_renderer.schema is not self.schema:
+            self._schema_renderer = SchemaRenderer(self.schema, self.schema_format)
+        return self._schema_renderer
+
+    def _iter_sql(
+            self,
+            engine: Engine,
+            sql: str,
+            timeout: Optional[float],
+            batch_size: int,
+            backend_ids: List
+    ) -> Iterator:
+        """Yield the column names, then row batches, from a server-side cursor.
+
+        Only ``batch_size`` rows are held in memory at a time. The connection
+        stays checked out until the generator is exhausted or closed. Its
+        backend id is appended to ``backend_ids`` as in ``_execute_sql``.
+        """
+        with engine.connect() as connection:
+            connection = connection.execution_options(stream_results=True, yield_per=batch_size)
+            try:
+                with connection.begin():
+                    _set_read_only(connection)
+                    backend_id_sql = _BACKEND_ID_SQL.get(connection.dialect.name)
+                    if backend_id_sql:
+                        backend_ids.append(connection.execute(text(backend_id_sql)).scalar())
+                    _set_statement_timeout(connection, timeout)
+                    result = connection.execute(text(sql))
+                    yield list(result.keys())
+                    for partition in result.partitions(batch_size):
+                        yield partition
+            finally:
+                _reset_statement_timeout(connection)
+                _reset_read_only(connection)
+
+    async def stream_sql(
+            self,
+            sql: str,
+            timeout: Optional[float] = 30,
+            batch_size: int = 1000
+    ) -> AsyncIterator:
+        """Stream ``sql`` off the event loop: column names first, then row batches.
+
+        If the consumer is cancelled while a batch is being fetched, the
+        statement is cancelled on the server too.
+        """
+        engine = self.read_engine()
+        backend_ids: List = []
+        iterator = self._iter_sql(engine, sql, timeout, batch_size, backend_ids)
+        fetch: Optional[asyncio.Future] = None
+        try:
+            while True:
+                fetch = asyncio.ensure_future(self.run_blocking(next, iterator, _STREAM_DONE))
+                # Shielded so a cancelled consumer can still wait for the fetch below
+                item = await asyncio.shield(fetch)
+                if item is _STREAM_DONE:
+                    break
+                yield item
+        except asyncio.CancelledError:
+            if backend_ids and fetch is not None and not fetch.done():
+                await asyncio.get_running_loop().run_in_executor(
+                    None, cancel_backend_query, engine, backend_ids[0]
+                )
+            raise
+        finally:
+            if fetch is not None and not fetch.done():
+                # The cursor cannot be closed while a fetch is still using it
+                await asyncio.wait([fetch])
+            if fetch is not None and not fetch.cancelled():
+                fetch.exception()
+            # Releases the cursor and connection if the client went away early
+            await self.run_blocking(iterator.close)
+
+    def prepare_schema_state(self) -> None:
+        """Build the per-schema retrieval index, renderer and validator ahead of the first question."""
+        if self.schema_pruning and len(self.schema["tables"]) > self.schema_pruning.min_tables:
+            self.get_schema_index()
+        self.generate_schema_description()
+        self.get_sql_validator()
+
+    def generate_schema_description(self, tables: Optional[List[str]] = None) -> str:
         """Generate a human-readable description of the database schema."""
-        description = "Database Schema:\n\n"
-
-        # Describe tables and columns
-        for table_name, columns in self.schema["tables"].items():
-            description += f"Table: {table_name}\n"
-            description += "Columns:\n"
-            for col in columns:
-                description += f"  - {col['name']} ({col['type']})\n"
-            description += "\n"
-
-        # Describe relationships
-        if self.schema["relationships"]:
-            description += "Relationships:\n"
-            for rel in self.schema["relationships"]:
-                description += f"- {rel['table1']} {rel['type']} {rel['table2']}"
-                description += f" ({rel['table1']}.{rel['keys'][rel['table1']]} -> "
-                description += f"{rel['table2']}.{rel['keys'][rel['table2']]})\n"
-
-        return description
-
-    async def build_query(self, natural_language: str) -> Dict:
+        return self.get_schema_renderer().render(tables)
+
+    def translation_cache_args(self) -> Tuple:
+        """Everything besides the question that a cached translation depends on."""
+        return self.ai_config.model, self.ai_config.temperature, self.schema_version
+
+    @asynccontextmanager
+    async def llm_slot(self) -> AsyncIterator[None]:
+        """Wait for a turn to call the AI provider.
+
+        A call made while the request already holds a slot, such as the
+        repair of streamed SQL that starts before the stream has finished,
+        shares it instead of waiting for a second one.
+        """
+        if _holding_llm_slot.get():
+            yield
+            return
+        if self.llm_scheduler is not None:
+            slot = self.llm_scheduler.slot()
+        else:
+            slot = self.llm_semaphore or nullcontext()
+        async with slot:
+            token = _holding_llm_slot.set(True)
+            try:
+                yield
+            finally:
+                _holding_llm_slot.reset(token)
+
+    async def build_query(self, natural_language: str, use_cache: bool = True) -> Dict:
         """Generate SQL query from natural language using AI."""
         try:
-            if self.ai_config.provider == "claude":
-                return await self._build_query_with_claude(natural_language)
-            else:
-                return await self._build_query_with_openai(natural_language)
+            if self.translation_cache and use_cache:
+                cached = await self.cache_call(
+                    self.translation_cache, self.translation_cache.get,
+                    natural_language, *self.translation_cache_args()
+                )
+                record_cache_lookup("translation", cached is not None)
+                if cached is not None:
+                    return cached
+
+            async with self.llm_slot():
+                if self.ai_config.provider == "claude":
+                    result = await self._build_query_with_claude(natural_language)
+                else:
+                    result = await self._build_query_with_openai(natural_language)
+
+            # Cached by remember_translation once the SQL is known to work
+            return result
+        except AdmissionRejected:
+            # Shed load is reported to the client as such, not as a bad query
+            raise
         except Exception as e:
             return {
                 "error": True,
@@ -164,25 +645,31 @@ class AIQueryExecutor:
 
     async def _build_query_with_claude(self, natural_language: str) -> Dict:
         """Generate SQL query using Claude."""
-        system_prompt = self._get_system_prompt()
+        with stage("prompt"):
+            examples = await self.select_examples(natural_language)
+            system_prompt = self._get_system_blocks(natural_language, examples)
 
         try:
-            message = await self.ai_client.messages.create(
-                model=self.ai_config.model,
-                max_tokens=self.ai_config.max_tokens,
-                temperature=self.ai_config.temperature,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": natural_language}
-                ]
-            )
+            with stage("llm"):
+                message = await self.ai_client.messages.create(
+                    model=self.ai_config.model,
+                    max_tokens=self.ai_config.max_tokens,
+                    temperature=self.ai_config.temperature,
+                    # The Messages API takes the system prompt as a top-level field
+                    system=system_prompt,
+                    messages=[
+                        {"role": "user", "content": natural_language}
+                    ]
+                )
+            report_llm_tokens(record_llm_usage("claude", getattr(message, "usage", None)))
 
             # Get the response content
             response_text = message.content[0].text
 
             # Try to parse the JSON response
             try:
-                result = json.loads(response_text)
+                with stage("parse"):
+                    result = json.loads(response_text)
             except json.JSONDecodeError as e:
                 print(f"Failed to parse JSON response: {response_text}")
                 raise ValueError(f"Invalid JSON response: {str(e)}")
@@ -199,7 +686,9 @@ class AIQueryExecutor:
 
     async def _build_query_with_openai(self, natural_language: str) -> Dict:
         """Generate SQL query using OpenAI."""
-        system_prompt = self._get_system_prompt()
+        with stage("prompt"):
+            examples = await self.select_examples(natural_language)
+            system_prompt = self._get_system_prompt(natural_language, examples)
 
         try:
             # Base configuration
@@ -217,7 +706,9 @@ class AIQueryExecutor:
             if self.ai_config.model in ["gpt-4-1106-preview", "gpt-3.5-turbo-1106"]:
                 completion_params["response_format"] = {"type": "json_object"}
 
-            response = await self.ai_client.chat.completions.create(**completion_params)
+            with stage("llm"):
+                response = await self.ai_client.chat.completions.create(**completion_params)
+            report_llm_tokens(record_llm_usage("openai", getattr(response, "usage", None)))
 
             # Get the response content
             response_text = response.choices[0].message.content
@@ -232,7 +723,8 @@ class AIQueryExecutor:
                     clean_text = clean_text[:-3]
                 clean_text = clean_text.strip()
 
-                result = json.loads(clean_text)
+                with stage("parse"):
+                    result = json.loads(clean_text)
             except json.JSONDecodeError as e:
                 print(f"Failed to parse JSON response: {response_text}")
                 raise ValueError(f"Invalid JSON response: {str(e)}")
@@ -247,134 +739,618 @@ class AIQueryExecutor:
             print(f"Error in OpenAI query generation: {str(e)}")
             raise ValueError(f"Failed to generate query: {str(e)}")
 
-    def _get_system_prompt(self) -> str:
-        """Generate system prompt for AI models."""
-        return f"""You are a SQL query generator. Convert natural language requests into valid SQL queries using the provided database schema.
-
-{self.generate_schema_description()}
-
-REQUIREMENTS:
-1. Return ONLY a JSON object with this exact structure:
-{{
-  "sql": "SELECT * FROM example",
-  "explanation": "This query does X",
-  "validation": {{
-    "isValid": true,
-    "issues": []
-  }}
-}}
-
-2. Follow these rules:
-- Use only tables and columns from the schema
-- Include comments for complex queries
-- Use proper SQL syntax and JOIN statements
-- Always verify column references
-- Handle dates and times appropriately
-- Use appropriate SQL functions
-- Ensure proper WHERE clauses
-
-Do not include any other text, markdown, or explanation outside the JSON object. The response should be a single, valid JSON object that can be parsed directly."""
+    def example_partition(self) -> str:
+        """Key the example store files examples under: the request's API key and this database.
+
+        Examples are the questions and SQL of whoever asked them, so each
+        key only sees its own. The key is stored hashed.
+        """
+        config = self.db_config
+        client = hashlib.sha256(current_client().encode("utf-8")).hexdigest()[:16]
+        return f"{client}:{config.type}://{config.host}:{config.port}/{config.database}"
+
+    async def select_examples(self, natural_language: Optional[str]) -> List[Example]:
+        """Return the stored examples most similar to this question.
+
+        The search may read the store's file and validate SQL, so it runs on
+        the database threads.
+        """
+        if self.example_store is None or not natural_language:
+            return []
+        return await self.run_blocking(
+            self.example_store.search,
+            self.example_partition(),
+            natural_language,
+            schema_version=self.schema_version,
+            validate=lambda sql: not self.validate_query(sql)["issues"]
+        )
+
+    def _get_system_prompt(
+            self,
+            natural_language: Optional[str] = None,
+            examples: Optional[List[Example]] = None
+    ) -> str:
+        """Generate system prompt for AI models, with ``examples`` from ``select_examples``."""
+        tables = self.select_prompt_tables(natural_language)
+        prompt = f"{SYSTEM_PROMPT_PREFIX}\n\n{self.generate_schema_description(tables)}"
+        if examples:
+            prompt += f"\n\n{render_examples(examples)}"
+        return prompt
+
+    def _get_system_blocks(
+            self,
+            natural_language: Optional[str] = None,
+            examples: Optional[List[Example]] = None
+    ) -> List[Dict]:
+        """Generate the system prompt as Anthropic content blocks.
+
+        The cache breakpoint goes after the schema block when it is the full
+        schema, since it then only changes with the schema version; pruned
+        descriptions vary per question, so only the static instructions
+        before them could be cached. Either way the breakpoint is only set
+        when the prefix it closes is long enough for the provider to cache.
+        Few-shot examples come last, after the cached blocks.
+        """
+        tables = self.select_prompt_tables(natural_language)
+        prefix = {"type": "text", "text": SYSTEM_PROMPT_PREFIX}
+        schema_block = {"type": "text", "text": self.generate_schema_description(tables)}
+        if self.prompt_caching:
+            cached = schema_block if tables is None else prefix
+            cached_tokens = estimate_tokens(SYSTEM_PROMPT_PREFIX)
+            if cached is schema_block:
+                cached_tokens += estimate_tokens(schema_block["text"])
+            if cached_tokens >= MIN_CACHEABLE_PROMPT_TOKENS:
+                cached["cache_control"] = {"type": "ephemeral"}
+        blocks = [prefix, schema_block]
+        if examples:
+            blocks.append({"type": "text", "text": render_examples(examples)})
+        return blocks
+
+    def sql_dialect(self) -> Optional[str]:
+        """Return the sqlglot dialect of the connected database."""
+        if self.engine is not None:
+            return sqlglot_dialect(self.engine.dialect.name)
+        return sqlglot_dialect(self.db_config.type if self.db_config else None)
+
+    def get_sql_validator(self) -> SQLValidator:
+        """Return the reference validator for the current schema snapshot."""
+        if self._sql_validator is None or self._sql_validator.schema is not self.schema:
+            self._sql_validator = SQLValidator(self.schema, self.sql_dialect())
+        return self._sql_validator
 
     def is_unsafe_query(self, sql: str) -> bool:
-        """Check if the query contains unsafe operations."""
-        unsafe_patterns = [
-            r"DROP\s+",
-            r"DELETE\s+WITHOUT\s+WHERE",
-            r"UPDATE\s+WITHOUT\s+WHERE",
-            r"TRUNCATE\s+",
-            r"ALTER\s+",
-            r"GRANT\s+",
-            r"REVOKE\s+"
-        ]
-
-        return any(re.search(pattern, sql, re.IGNORECASE) for pattern in unsafe_patterns)
+        """Check if the query is anything other than a single read-only SELECT."""
+        return not is_read_only(sql, self.sql_dialect())
 
     def validate_query(self, sql: str) -> Dict:
         """Validate the SQL query against the schema."""
-        issues = []
-
-        # Extract table and column references
-        table_pattern = r"FROM\s+(\w+)|JOIN\s+(\w+)"
-        column_pattern = r"SELECT\s+(.+?)\s+FROM|WHERE\s+(.+?)\s+(?:GROUP|ORDER|LIMIT|$)|GROUP BY\s+(.+?)\s+(?:ORDER|LIMIT|$)|ORDER BY\s+(.+?)\s+(?:LIMIT|$)"
-
-        # Validate table references
-        for match in re.finditer(table_pattern, sql, re.IGNORECASE):
-            table_name = match.group(1) or match.group(2)
-            if table_name not in self.schema["tables"]:
-                issues.append(f"Invalid table reference: {table_name}")
-
-        # Validate column references
-        for match in re.finditer(column_pattern, sql, re.IGNORECASE):
-            columns = match.group(1) or match.group(2) or match.group(3) or match.group(4)
-            if columns and columns != '*':
-                for col in columns.split(','):
-                    column_name = col.strip().split('.')[-1]
-                    if not any(
-                            any(c["name"] == column_name for c in table_cols)
-                            for table_cols in self.schema["tables"].values()
-                    ):
-                        issues.append(f"Invalid column reference: {column_name}")
+        return self.get_sql_validator().validate(sql)
+
+    @staticmethod
+    def with_context(natural_language: str, context: Optional[str]) -> str:
+        """Prefix a question with conversation context for the AI prompt."""
+        if not context:
+            return natural_language
+        return f"{context}\n\nCurrent request: {natural_language}"
+
+    async def generate_query(self, natural_language: str, context: Optional[str] = None) -> Dict:
+        """Make sure the schema is loaded, then generate SQL using AI.
+
+        ``context`` (earlier turns of the conversation) is sent along with
+        the question so follow-ups can refer back to them.
+        """
+        natural_language = self.with_context(natural_language, context)
+        with stage("schema"):
+            if not self.connected:
+                await self.run_blocking(self.connect)
+            else:
+                # Cheap when the cached snapshot is still within its TTL
+                await self.run_blocking(self.fetch_database_schema)
+
+        if self.generation_flight is None:
+            return await self.build_query(natural_language)
+
+        # Identical questions against the same schema share one AI call
+        key = (
+            self.ai_config.provider,
+            self.ai_config.model,
+            self.ai_config.temperature,
+            self.schema_version,
+            normalize_question(natural_language)
+        )
+        return await self.generation_flight.do(key, lambda: self.build_query(natural_language))
+
+    def checked_sql(self, query_result: Dict) -> str:
+        """Return the generated SQL, raising ValueError if it must not run."""
+        if not query_result.get("success") or not query_result.get("sql"):
+            raise ValueError("Failed to generate SQL query")
+
+        sql = query_result["sql"]
+
+        # Check for unsafe operations
+        if self.is_unsafe_query(sql):
+            raise ValueError("Query contains unsafe operations")
+
+        return sql
+
+    def _explain_sql(self, sql: str, timeout: Optional[float]) -> Optional[PlanEstimate]:
+        """Plan ``sql`` without running it; raises the database's error if it cannot be planned.
+
+        Returns None for databases without a supported EXPLAIN.
+        """
+        engine = self.read_engine()
+        statement = explain_statement(engine.dialect.name, sql)
+        if statement is None:
+            return None
+        with engine.connect() as connection:
+            try:
+                with connection.begin():
+                    _set_read_only(connection)
+                    _set_statement_timeout(connection, timeout)
+                    first_row = connection.execute(text(statement)).first()
+            finally:
+                _reset_statement_timeout(connection)
+                _reset_read_only(connection)
+        return parse_plan(engine.dialect.name, first_row)
+
+    async def repair_query(self, natural_language: str, sql: str, problem: str) -> Dict:
+        """Ask the AI to fix ``sql``, telling it what was wrong."""
+        query_result = await self.build_query(
+            repair_request(natural_language, sql, problem),
+            # The repair prompt is specific to this failure; never reuse it
+            use_cache=False
+        )
+        if query_result.get("error"):
+            raise ValueError(query_result["message"])
+        return query_result
+
+    async def verify_query(
+            self,
+            natural_language: str,
+            query_result: Dict,
+            context: Optional[str] = None,
+            remember: bool = True
+    ) -> Tuple[Dict, str]:
+        """Check generated SQL with EXPLAIN before it runs, repairing it if needed.
+
+        The planner resolves every table, column and type without reading
+        any data, so a bad query costs one cheap round trip instead of a
+        failed execution. Planner errors are sent back to the AI, up to
+        ``verification.max_repairs`` times. With ``max_cost`` set, a query
+        estimated above it is rejected, rewritten with a LIMIT, or sent back
+        for a cheaper version, depending on ``cost_action``.
+
+        Returns the (possibly repaired) query result and its SQL. Verified
+        translations are marked as such and, with ``remember``, added to the
+        translation cache so they are not checked again.
+        """
+        sql = self.checked_sql(query_result)
+        config = self.verification
+        if config is None or query_result.get("verified"):
+            return query_result, sql
+
+        natural_language = self.with_context(natural_language, context)
+        for attempt in range(config.max_repairs + 1):
+            try:
+                with stage("verify"):
+                    estimate = await self.run_blocking(self._explain_sql, sql, config.timeout)
+            except SQLAlchemyError as e:
+                problem = f"the database rejected it: {planner_message(e)}"
+                issues = self.validate_query(sql)["issues"]
+                if issues:
+                    problem += f" ({'; '.join(issues)})"
+            else:
+                if (
+                        estimate is None
+                        or estimate.cost is None
+                        or config.max_cost is None
+                        or estimate.cost <= config.max_cost
+                ):
+                    break
+                over = f"the estimated cost {estimate.cost:.0f} is above the limit of {config.max_cost:.0f}"
+                if config.cost_action == "limit":
+                    sql = await self._limit_query(sql, over)
+                    query_result = {**query_result, "sql": sql}
+                    break
+                if config.cost_action != "repair":
+                    raise CostLimitError(f"Query rejected: {over}")
+                problem = f"{over}. Write a cheaper query, for example with tighter filters or a LIMIT"
+
+            if attempt == config.max_repairs:
+                if config.max_repairs:
+                    raise ValueError(f"Generated SQL still fails after {config.max_repairs} repairs: {problem}")
+                raise ValueError(f"Generated SQL fails verification: {problem}")
+            print(f"Repairing generated SQL: {problem}")
+            query_result = await self.repair_query(natural_language, sql, problem)
+            sql = self.checked_sql(query_result)
+
+        if remember:
+            return await self.remember_translation(natural_language, query_result), sql
+        return {**query_result, "verified": True}, sql
+
+    async def remember_translation(self, natural_language: str, query_result: Dict) -> Dict:
+        """Mark a translation verified and add it to the translation cache.
+
+        Called once the SQL has passed verification or run successfully, so
+        a translation that fails is never served again from the cache.
+        """
+        query_result = {**query_result, "verified": True}
+        if self.translation_cache:
+            await self.cache_call(
+                self.translation_cache, self.translation_cache.set,
+                natural_language, *self.translation_cache_args(), query_result
+            )
+        return query_result
+
+    async def _limit_query(self, sql: str, over: str) -> str:
+        """Rewrite an over-cost query with the configured LIMIT, or reject it."""
+        config = self.verification
+        limited = add_limit(sql, config.limit_rows, self.sql_dialect())
+        if limited is None:
+            raise CostLimitError(f"Query rejected: {over}")
+        with stage("verify"):
+            estimate = await self.run_blocking(self._explain_sql, limited, config.timeout)
+        if estimate is not None and estimate.cost is not None and estimate.cost > config.max_cost:
+            raise CostLimitError(
+                f"Query rejected: the estimated cost {estimate.cost:.0f} is above the limit "
+                f"of {config.max_cost:.0f} even with LIMIT {config.limit_rows}"
+            )
+        return limited
 
-        return {
-            "isValid": len(issues) == 0,
-            "issues": issues
-        }
+    async def remember_example(self, natural_language: str, result: Dict) -> None:
+        """Offer a successful, freshly executed query to the example store.
+
+        Rows served from the result cache say nothing about how fast the SQL
+        runs, and empty results may come from a wrong filter, so neither is
+        recorded.
+        """
+        if self.example_store is None or result.get("cached") or not result.get("row_count"):
+            return
+        try:
+            await self.run_blocking(
+                self.example_store.record,
+                self.example_partition(),
+                natural_language,
+                result["sql"],
+                result["execution_time"],
+                self.schema_version
+            )
+        except Exception as e:
+            print(f"Failed to record few-shot example: {str(e)}")
 
     async def execute_query(
             self,
             natural_language: str,
             use_transaction: bool = True,
-            timeout: int = 30
+            timeout: int = 30,
+            page_size: Optional[int] = None,
+            cursor: Optional[str] = None,
+            max_rows: Optional[int] = None,
+            as_records: bool = True,
+            llm_slots: Optional[asyncio.Semaphore] = None,
+            db_slots: Optional[asyncio.Semaphore] = None,
+            context: Optional[str] = None
     ) -> Dict:
-        """Execute natural language query and return results."""
+        """Execute natural language query and return results.
+
+        With ``page_size`` or ``cursor`` only one page is returned, along with
+        a ``next_cursor`` for the following page. Later pages reuse the SQL
+        generated for the first one. ``max_rows`` caps how many rows are ever
+        fetched into memory; larger results are cut off and marked truncated.
+        ``cached`` tells whether the rows came from the result cache.
+        Rows are always returned under ``rows``; ``as_records`` also builds the
+        dict-per-row ``results`` list. ``llm_slots`` and ``db_slots`` bound
+        SQL generation and execution separately when many queries run at once.
+        ``context`` is passed on to ``generate_query``. Generated SQL goes
+        through ``verify_query`` before it runs. Standalone questions (no
+        ``context``) that run fast enough are offered to the example store.
+        """
         try:
-            if not self.engine:
-                self.connect()
-
-            # Generate query using AI
-            query_result = await self.build_query(natural_language)
-
-            if not query_result.get("success") or not query_result.get("sql"):
-                raise ValueError("Failed to generate SQL query")
-
-            sql = query_result["sql"]
-
-            # Check for unsafe operations
-            if self.is_unsafe_query(sql):
-                raise ValueError("Query contains unsafe operations")
+            if cursor:
+                position = decode_cursor(cursor)
+                query_id = position["q"]
+                entry = await self.cache_call(self.pager, self.pager.lookup, query_id)
+                query_result, sql, keyset = entry["query"], entry["sql"], entry["keyset"]
+                page_size = position.get("n") or page_size
+                offset, after = position.get("o", 0), position.get("k")
+            else:
+                # Generate query using AI
+                async with llm_slots or nullcontext():
+                    query_result = await self.generate_query(natural_language, context=context)
+                query_result, sql = await self.verify_query(natural_language, query_result, context=context)
+                if page_size:
+                    keyset = detect_keyset(sql, self.schema, self.sql_dialect())
+                    query_id = await self.cache_call(self.pager, self.pager.register, sql, keyset, query_result)
+                    offset, after = 0, None
 
-            start_time = datetime.now()
+            start_time = time.perf_counter()
 
             # Execute query
-            with self.engine.connect() as connection:
-                if use_transaction:
-                    with connection.begin():
-                        result = connection.execute(text(sql))
-                        data = result.fetchall()
-                else:
-                    result = connection.execute(text(sql))
-                    data = result.fetchall()
-
-            # Convert to DataFrame for easier handling
-            df = pd.DataFrame(data, columns=result.keys())
-
-            execution_time = (datetime.now() - start_time).total_seconds()
-
-            return {
+            next_cursor = None
+            truncated = False
+            if page_size:
+                if max_rows:
+                    page_size = min(page_size, max_rows)
+                # Fetch one extra row to learn whether another page exists
+                page_sql, params = paginate_sql(
+                    sql, page_size + 1, offset, keyset, after, self.sql_dialect()
+                )
+                async with db_slots or nullcontext():
+                    columns, data, cached = await self.run_cached_sql(
+                        page_sql, use_transaction=use_transaction, timeout=timeout, params=params
+                    )
+                if len(data) > page_size:
+                    data = data[:page_size]
+                    next_cursor = self.pager.next_cursor(query_id, page_size, offset, keyset, columns, data)
+            else:
+                async with db_slots or nullcontext():
+                    columns, data, cached = await self.run_cached_sql(
+                        sql, use_transaction=use_transaction, timeout=timeout, max_rows=max_rows
+                    )
+                if max_rows and len(data) > max_rows:
+                    data = data[:max_rows]
+                    truncated = True
+
+            execution_time = time.perf_counter() - start_time
+
+            # Rows stay as fetched; the dict-per-row copy is only built on request
+            records = None
+            if as_records:
+                with stage("serialize"):
+                    records = rows_to_records(columns, data)
+
+            result = {
                 "success": True,
                 "query": query_result,
-                "results": df.to_dict(orient="records"),
-                "columns": list(df.columns),
-                "row_count": len(df),
+                "results": records,
+                "rows": data,
+                "columns": columns,
+                "row_count": len(data),
                 "execution_time": execution_time,
+                "next_cursor": next_cursor,
+                "truncated": truncated,
+                "cached": cached,
                 "sql": sql  # Include the executed SQL for reference
             }
-
+            if not cursor and not query_result.get("verified"):
+                # Without verification the translation is only cached once it has run
+                result["query"] = await self.remember_translation(
+                    self.with_context(natural_language, context), query_result
+                )
+            if not cursor and not context:
+                await self.remember_example(natural_language, result)
+            return result
+
+        except AdmissionRejected:
+            raise
         except Exception as e:
+            record_error("execution" if 'sql' in locals() else "generation")
             print(f"Error executing query: {str(e)}")
             print(f"SQL Query: {query_result.get('sql') if 'query_result' in locals() else 'Not generated'}")
             return {
                 "success": False,
                 "error": str(e),
                 "query": query_result if 'query_result' in locals() else None
-            }
\ No newline at end of file
+            }
+
+    async def execute_many(
+            self,
+            questions: List[str],
+            use_transaction: bool = True,
+            timeout: int = 30,
+            max_rows: Optional[int] = None,
+            as_records: bool = True,
+            llm_concurrency: int = 8,
+            db_concurrency: int = 10
+    ) -> List[Dict]:
+        """Execute many natural language queries concurrently.
+
+        Questions that normalize to the same text run once. At most
+        ``llm_concurrency`` SQL generations and ``db_concurrency`` database
+        queries are in flight at a time, so a large batch neither trips the
+        provider's rate limits nor drains the connection pool. Results are
+        returned in input order, one per question; a failed question is
+        reported in its own result without affecting the rest.
+        """
+        if not self.connected:
+            try:
+                await self.run_blocking(self.connect)
+            except Exception as e:
+                return [{"success": False, "error": str(e), "query": None} for _ in questions]
+
+        llm_slots = asyncio.Semaphore(llm_concurrency)
+        db_slots = asyncio.Semaphore(db_concurrency)
+        unique: Dict[str, str] = {}
+        for question in questions:
+            unique.setdefault(normalize_question(question), question)
+
+        results = await asyncio.gather(*(
+            self.execute_query(
+                question,
+                use_transaction=use_transaction,
+                timeout=timeout,
+                max_rows=max_rows,
+                as_records=as_records,
+                llm_slots=llm_slots,
+                db_slots=db_slots
+            )
+            for question in unique.values()
+        ), return_exceptions=True)
+        # Only AdmissionRejected escapes execute_query; it fails just its question
+        results = [
+            {"success": False, "error": str(result), "query": None} if isinstance(result, Exception) else result
+            for result in results
+        ]
+        by_question = dict(zip(unique, results))
+        return [dict(by_question[normalize_question(question)]) for question in questions]
+
+    async def _stream_completion(self, natural_language: str) -> AsyncIterator[str]:
+        """Yield the AI response text as the provider generates it."""
+        examples = await self.select_examples(natural_language)
+        if self.ai_config.provider == "claude":
+            async with self.ai_client.messages.stream(
+                model=self.ai_config.model,
+                max_tokens=self.ai_config.max_tokens,
+                temperature=self.ai_config.temperature,
+                system=self._get_system_blocks(natural_language, examples),
+                messages=[
+                    {"role": "user", "content": natural_language}
+                ]
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                message = await stream.get_final_message()
+            report_llm_tokens(record_llm_usage("claude", getattr(message, "usage", None)))
+            return
+
+        stream = await self.ai_client.chat.completions.create(
+            model=self.ai_config.model,
+            temperature=self.ai_config.temperature,
+            max_tokens=self.ai_config.max_tokens,
+            messages=[
+                {"role": "system", "content": self._get_system_prompt(natural_language, examples)},
+                {"role": "user", "content": natural_language}
+            ],
+            stream=True,
+            # Usage arrives in a final chunk without choices
+            extra_body={"stream_options": {"include_usage": True}}
+        )
+        usage = None
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        report_llm_tokens(record_llm_usage("openai", usage))
+
+    @staticmethod
+    def _parse_completion(response_text: str) -> Dict:
+        """Parse a complete AI response into a query result."""
+        clean_text = response_text.strip()
+        if clean_text.startswith("```json"):
+            clean_text = clean_text[7:]
+        if clean_text.endswith("```"):
+            clean_text = clean_text[:-3]
+        try:
+            result = json.loads(clean_text.strip())
+        except json.JSONDecodeError as e:
+            print(f"Failed to parse JSON response: {response_text}")
+            raise ValueError(f"Invalid JSON response: {str(e)}")
+        if "sql" not in result:
+            raise ValueError("Response missing required 'sql' field")
+        return {**result, "success": True}
+
+    async def _execute_for_stream(
+            self,
+            natural_language: str,
+            query_result: Dict,
+            use_transaction: bool,
+            timeout: Optional[float],
+            max_rows: Optional[int]
+    ) -> Dict:
+        query_result, sql = await self.verify_query(natural_language, query_result, remember=False)
+        start_time = time.perf_counter()
+        columns, data, cached = await self.run_cached_sql(
+            sql, use_transaction=use_transaction, timeout=timeout, max_rows=max_rows
+        )
+        truncated = bool(max_rows and len(data) > max_rows)
+        if truncated:
+            data = data[:max_rows]
+        return {
+            "query": query_result,
+            "sql": sql,
+            "columns": columns,
+            "rows": data,
+            "row_count": len(data),
+            "execution_time": time.perf_counter() - start_time,
+            "truncated": truncated,
+            "cached": cached
+        }
+
+    async def stream_query(
+            self,
+            natural_language: str,
+            use_transaction: bool = True,
+            timeout: int = 30,
+            max_rows: Optional[int] = None,
+            context: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """Generate SQL with a streamed completion, then execute it.
+
+        Yields ``sql_delta`` and ``explanation_delta`` events as tokens
+        arrive, ``sql`` as soon as the ``sql`` field is complete (execution
+        starts right then, while the explanation is still being generated),
+        ``query`` with the full parsed response, and finally ``result`` with
+        the rows. Failures end the stream with an ``error`` event.
+
+        The SQL is verified (see ``verify_query``) as part of execution; if
+        that repairs it, a second ``sql`` event carries the repaired SQL and
+        ``query`` holds the repaired response.
+        """
+        natural_language = self.with_context(natural_language, context)
+        execution: Optional[asyncio.Future] = None
+        try:
+            with stage("schema"):
+                if not self.connected:
+                    await self.run_blocking(self.connect)
+                else:
+                    await self.run_blocking(self.fetch_database_schema)
+
+            query_result = cached_result = None
+            if self.translation_cache:
+                query_result = cached_result = await self.cache_call(
+                    self.translation_cache, self.translation_cache.get,
+                    natural_language, *self.translation_cache_args()
+                )
+                record_cache_lookup("translation", query_result is not None)
+
+            if query_result is None:
+                fields = JSONFieldStream(("sql", "explanation"))
+                chunks: List[str] = []
+                async with self.llm_slot():
+                    async for text in self._stream_completion(natural_language):
+                        chunks.append(text)
+                        for kind, field, value in fields.feed(text):
+                            if kind == "delta":
+                                yield {"type": f"{field}_delta", "text": value}
+                            elif field == "sql":
+                                partial = {"success": True, "sql": value}
+                                sql = self.checked_sql(partial)
+                                yield {"type": "sql", "sql": sql}
+                                execution = asyncio.ensure_future(self._execute_for_stream(
+                                    natural_language, partial, use_transaction, timeout, max_rows
+                                ))
+                query_result = self._parse_completion("".join(chunks))
+
+            if execution is None:
+                sql = self.checked_sql(query_result)
+                yield {"type": "sql", "sql": sql}
+                execution = asyncio.ensure_future(self._execute_for_stream(
+                    natural_language, query_result, use_transaction, timeout, max_rows
+                ))
+            result = await execution
+            checked = result.pop("query")
+            if checked["sql"] != sql:
+                # Verification repaired the SQL; the repair replaces the streamed response
+                query_result = checked
+                yield {"type": "sql", "sql": checked["sql"]}
+            if query_result is not cached_result:
+                query_result = await self.remember_translation(natural_language, query_result)
+            yield {"type": "query", "query": query_result}
+            yield {"type": "result", **result}
+            if not context:
+                await self.remember_example(natural_language, result)
+
+        except Exception as e:
+            record_error("stream")
+            print(f"Error streaming query: {str(e)}")
+            error = {"type": "error", "detail": str(e)}
+            if isinstance(e, AdmissionRejected):
+                error["retry_after"] = e.retry_after_seconds
+            yield error
+        finally:
+            # The client went away or generation failed: stop the query too
+            if execution is not None and not execution.done():
+                execution.cancel()
+            elif execution is not None and not execution.cancelled():
+                # Mark a failure retrieved even if it was never awaited
+                execution.exception()
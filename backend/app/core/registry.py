@@ -0,0 +1,422 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, astuple
+from typing import Dict, List, Optional, Set, Tuple
+import threading
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from .config import settings
+from .query_executor import (
+    AIConfig,
+    AIQueryExecutor,
+    DatabaseConfig,
+    create_database_engine,
+)
+from .llm_clients import LLMClientPool
+from .pagination import QueryPager
+from .result_cache import ResultCache
+from .admission import LLMScheduler
+from .cache import create_cache_backend
+from .example_store import ExampleStore
+from .data_sources import DataSourceConfig, ReplicaRouter, UnknownDataSourceError, parse_data_source
+from .schema_cache import SchemaCache
+from .schema_retrieval import SchemaPruningConfig
+from .shared_cache import SharedCache, create_shared_cache
+from .single_flight import SingleFlight
+from .sql_verification import VerificationConfig
+from .translation_cache import TranslationCache
+
+
+def ai_config_from_settings() -> AIConfig:
+    """Build the AI configuration from the application settings."""
+    return AIConfig(
+        provider=settings.AI_PROVIDER,
+        api_key=settings.AI_API_KEY,
+        model=settings.AI_MODEL,
+        temperature=settings.AI_TEMPERATURE,
+        max_tokens=settings.AI_MAX_TOKENS,
+        base_url=settings.AI_BASE_URL
+    )
+
+
+def db_config_from_settings() -> DatabaseConfig:
+    """Build the database configuration from the application settings."""
+    return DatabaseConfig(
+        type=settings.DB_TYPE,
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        database=settings.DB_NAME,
+        ssl=settings.DB_SSL
+    )
+
+
+def data_sources_from_settings() -> Dict[str, DataSourceConfig]:
+    """Build every configured data source, the DB_* database included."""
+    sources = {
+        name: parse_data_source(name, spec)
+        for name, spec in settings.DATA_SOURCES.items()
+    }
+    sources[settings.DEFAULT_DATA_SOURCE] = parse_data_source(
+        settings.DEFAULT_DATA_SOURCE,
+        {**asdict(db_config_from_settings()), "replicas": settings.DB_REPLICAS}
+    )
+    return sources
+
+
+def _open_connections(engine: Engine, count: int) -> None:
+    """Check out ``count`` connections at once so the pool holds them open."""
+    if isinstance(engine.pool, QueuePool):
+        count = min(count, engine.pool.size())
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+class ExecutorRegistry:
+    """Cache of pooled engines and query executors for one application.
+
+    Engines are keyed by DatabaseConfig so every executor talking to the same
+    database shares one connection pool. Executors are keyed by the
+    (AIConfig, DatabaseConfig) pair so the reflected schema and AI client are
+    reused across requests.
+
+    Named data sources (``data_sources``) each get their own schema cache
+    and a ReplicaRouter over their replicas' engines; ``get_source_executor``
+    returns the executor for one of them.
+
+    With a ``shared_cache``, schema snapshots are shared with the other
+    workers through it as well. With an ``llm_scheduler``, every executor's
+    AI calls wait in its fair queue instead of on the client pool semaphore.
+    An ``example_store`` supplies every executor's few-shot examples.
+    """
+
+    def __init__(
+            self,
+            pool_size: int = 5,
+            max_overflow: int = 10,
+            pool_timeout: int = 30,
+            pool_recycle: int = 3600,
+            schema_ttl: int = 300,
+            db_threads: int = 15,
+            llm_clients: Optional[LLMClientPool] = None,
+            translation_cache: Optional[TranslationCache] = None,
+            pager: Optional[QueryPager] = None,
+            schema_pruning: Optional[SchemaPruningConfig] = None,
+            schema_format: str = "verbose",
+            prompt_caching: bool = True,
+            result_cache: Optional[ResultCache] = None,
+            coalesce_requests: bool = True,
+            verification: Optional[VerificationConfig] = None,
+            data_sources: Optional[Dict[str, DataSourceConfig]] = None,
+            default_data_source: Optional[str] = None,
+            replica_probe_interval: float = 10,
+            shared_cache: Optional[SharedCache] = None,
+            llm_scheduler: Optional[LLMScheduler] = None,
+            example_store: Optional[ExampleStore] = None
+    ):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self.schema_ttl = schema_ttl
+        self.shared_cache = shared_cache
+        self._shared_schemas = shared_cache.backend("schema", max_entries=1000) if shared_cache else None
+        self.schema_cache = self._new_schema_cache()
+        self.db_threads = db_threads
+        self.db_executor = ThreadPoolExecutor(max_workers=db_threads, thread_name_prefix="nlquery-db")
+        self.llm_clients = llm_clients or LLMClientPool()
+        self.translation_cache = translation_cache
+        self.pager = pager or QueryPager()
+        self.schema_pruning = schema_pruning
+        self.schema_format = schema_format
+        self.prompt_caching = prompt_caching
+        self.result_cache = result_cache
+        self.generation_flight = SingleFlight() if coalesce_requests else None
+        self.execution_flight = SingleFlight() if coalesce_requests else None
+        self.verification = verification
+        self.llm_scheduler = llm_scheduler
+        self.example_store = example_store
+        self.data_sources = data_sources or {}
+        self.default_data_source = default_data_source
+        self.replica_probe_interval = replica_probe_interval
+        self._engines: Dict[Tuple, Engine] = {}
+        self._executors: Dict[Tuple, AIQueryExecutor] = {}
+        self._schema_caches: Dict[str, SchemaCache] = {}
+        self._routers: Dict[str, ReplicaRouter] = {}
+        # Data sources warm_up has completed for
+        self._warm: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _new_schema_cache(self) -> SchemaCache:
+        return SchemaCache(
+            ttl=self.schema_ttl,
+            shared=self._shared_schemas,
+            bus=self.shared_cache.bus if self.shared_cache else None
+        )
+
+    def get_engine(self, db_config: DatabaseConfig) -> Engine:
+        """Return the shared engine for a database, creating it on first use."""
+        key = astuple(db_config)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = create_database_engine(
+                    db_config,
+                    pool_size=self.pool_size,
+                    max_overflow=self.max_overflow,
+                    pool_timeout=self.pool_timeout,
+                    pool_recycle=self.pool_recycle
+                )
+                self._engines[key] = engine
+            return engine
+
+    def engines(self) -> List[Engine]:
+        """Return every pooled engine created so far."""
+        with self._lock:
+            return list(self._engines.values())
+
+    def get_executor(self, ai_config: AIConfig, db_config: DatabaseConfig) -> AIQueryExecutor:
+        """Return the shared executor for an AI/database pair."""
+        # Key on the config as given, before the executor fills in a default model
+        key = (astuple(ai_config), astuple(db_config))
+        with self._lock:
+            executor = self._executors.get(key)
+        if executor is not None:
+            return executor
+
+        engine = self.get_engine(db_config)
+        return self._add_executor(key, ai_config, db_config, engine, self.schema_cache, None)
+
+    def get_data_source(self, name: Optional[str] = None) -> DataSourceConfig:
+        """Return a data source by name, or the default one."""
+        name = name or self.default_data_source
+        source = self.data_sources.get(name)
+        if source is None:
+            raise UnknownDataSourceError(name)
+        return source
+
+    def get_source_executor(self, ai_config: AIConfig, name: Optional[str] = None) -> AIQueryExecutor:
+        """Return the shared executor for an AI config and a named data source.
+
+        Raises UnknownDataSourceError for names that are not configured.
+        """
+        source = self.get_data_source(name)
+        key = (astuple(ai_config), "source", source.name)
+        with self._lock:
+            executor = self._executors.get(key)
+        if executor is not None:
+            return executor
+
+        engine = self.get_engine(source.primary)
+        replicas = [self.get_engine(replica) for replica in source.replicas]
+        with self._lock:
+            schema_cache = self._schema_caches.get(source.name)
+            if schema_cache is None:
+                schema_cache = self._schema_caches[source.name] = self._new_schema_cache()
+            router = self._routers.get(source.name)
+            if router is None and replicas:
+                router = ReplicaRouter(engine, replicas, probe_interval=self.replica_probe_interval)
+                self._routers[source.name] = router
+        return self._add_executor(key, ai_config, source.primary, engine, schema_cache, router)
+
+    def replica_stats(self) -> Dict[str, List[Dict]]:
+        """Health and load of every replica, by data source."""
+        with self._lock:
+            routers = dict(self._routers)
+        return {name: router.stats() for name, router in routers.items()}
+
+    def _add_executor(
+            self,
+            key: Tuple,
+            ai_config: AIConfig,
+            db_config: DatabaseConfig,
+            engine: Engine,
+            schema_cache: SchemaCache,
+            router: Optional[ReplicaRouter]
+    ) -> AIQueryExecutor:
+        with self._lock:
+            # Another request may have created it while we were building the engine
+            executor = self._executors.get(key)
+            if executor is None:
+                executor = AIQueryExecutor(
+                    ai_config,
+                    db_config,
+                    engine=engine,
+                    schema_cache=schema_cache,
+                    db_executor=self.db_executor,
+                    ai_client=self.llm_clients.get(
+                        ai_config.provider,
+                        ai_config.api_key,
+                        base_url=ai_config.base_url
+                    ),
+                    llm_semaphore=self.llm_clients.semaphore,
+                    translation_cache=self.translation_cache,
+                    pager=self.pager,
+                    schema_pruning=self.schema_pruning,
+                    schema_format=self.schema_format,
+                    prompt_caching=self.prompt_caching,
+                    result_cache=self.result_cache,
+                    generation_flight=self.generation_flight,
+                    execution_flight=self.execution_flight,
+                    verification=self.verification,
+                    router=router,
+                    llm_scheduler=self.llm_scheduler,
+                    example_store=self.example_store
+                )
+                self._executors[key] = executor
+            return executor
+
+    def warm_up(self, ai_config: AIConfig, name: Optional[str] = None, connections: int = 1) -> AIQueryExecutor:
+        """Get a data source ready for its first request.
+
+        Creates its AI client, reflects its schema and builds the prompt state
+        derived from it, and opens ``connections`` pooled connections to the
+        primary and to each replica. A replica that cannot be reached is
+        taken out of rotation instead of failing the warm-up.
+        """
+        name = name or self.default_data_source
+        executor = self.get_source_executor(ai_config, name)
+        executor.connect()
+        executor.prepare_schema_state()
+        _open_connections(executor.engine, connections)
+        if executor.router is not None:
+            for replica in executor.router.replicas:
+                try:
+                    _open_connections(replica, connections)
+                except Exception as e:
+                    print(f"Warm-up of a replica of '{name}' failed: {str(e)}")
+                    executor.router.mark_failed(replica)
+        with self._lock:
+            self._warm.add(name)
+        return executor
+
+    def readiness(self) -> Dict[str, bool]:
+        """Whether each data source has been warmed up."""
+        with self._lock:
+            return {name: name in self._warm for name in self.data_sources}
+
+    def shutdown(self) -> None:
+        """Dispose every pooled engine and forget all executors."""
+        with self._lock:
+            executors = list(self._executors.values())
+            engines = list(self._engines.values())
+            self._executors.clear()
+            self._engines.clear()
+            schema_caches = list(self._schema_caches.values())
+            self._schema_caches.clear()
+            self._routers.clear()
+            self._warm.clear()
+
+        for executor in executors:
+            executor.disconnect()
+        for engine in engines:
+            engine.dispose()
+        self.schema_cache.invalidate()
+        for schema_cache in schema_caches:
+            schema_cache.invalidate()
+        if self.result_cache:
+            self.result_cache.clear()
+        self.db_executor.shutdown(wait=False, cancel_futures=True)
+        # Leave the registry usable if it is warmed up again
+        self.db_executor = ThreadPoolExecutor(max_workers=self.db_threads, thread_name_prefix="nlquery-db")
+
+
+
+def create_registry() -> ExecutorRegistry:
+    """Build the registry, its shared cache tier and every cache from the settings.
+
+    Called from the application's lifespan hook, so each app instance (and
+    each reload) gets its own engines, pools and caches.
+    """
+    shared_cache = create_shared_cache(
+        settings.SHARED_CACHE_BACKEND,
+        path=settings.SHARED_CACHE_PATH,
+        redis_url=settings.SHARED_CACHE_REDIS_URL,
+        namespace=settings.SHARED_CACHE_NAMESPACE
+    )
+
+    return ExecutorRegistry(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        schema_ttl=settings.SCHEMA_CACHE_TTL,
+        db_threads=settings.DB_EXECUTOR_THREADS,
+        llm_clients=LLMClientPool(
+            max_connections=settings.AI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.AI_KEEPALIVE_EXPIRY,
+            timeout=settings.AI_TIMEOUT,
+            connect_timeout=settings.AI_CONNECT_TIMEOUT,
+            http2=settings.AI_HTTP2,
+            max_concurrency=settings.AI_MAX_CONCURRENCY
+        ),
+        translation_cache=TranslationCache(
+            shared_cache.backend("translations", max_entries=settings.SQL_CACHE_MAX_ENTRIES) if shared_cache
+            else create_cache_backend(
+                settings.SQL_CACHE_BACKEND,
+                path=settings.SQL_CACHE_PATH,
+                max_entries=settings.SQL_CACHE_MAX_ENTRIES,
+                redis_url=settings.SHARED_CACHE_REDIS_URL
+            ),
+            ttl=settings.SQL_CACHE_TTL,
+            similarity_threshold=settings.SQL_CACHE_SIMILARITY_THRESHOLD,
+            bus=shared_cache.bus if shared_cache else None
+        ) if settings.SQL_CACHE_ENABLED else None,
+        pager=QueryPager(
+            backend=shared_cache.backend("pages", max_entries=10000) if shared_cache else None,
+            ttl=settings.PAGE_CURSOR_TTL
+        ),
+        schema_pruning=SchemaPruningConfig(
+            top_k=settings.SCHEMA_PRUNING_TOP_K,
+            min_tables=settings.SCHEMA_PRUNING_MIN_TABLES,
+            token_budget=settings.SCHEMA_PROMPT_TOKEN_BUDGET
+        ) if settings.SCHEMA_PRUNING_ENABLED else None,
+        schema_format=settings.SCHEMA_PROMPT_FORMAT,
+        prompt_caching=settings.AI_PROMPT_CACHING,
+        result_cache=ResultCache(
+            max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+            max_rows=settings.RESULT_CACHE_MAX_ROWS,
+            ttl=settings.RESULT_CACHE_TTL,
+            check_interval=settings.RESULT_CACHE_CHECK_INTERVAL,
+            backend=shared_cache.backend(
+                "results",
+                max_bytes=settings.RESULT_CACHE_MAX_BYTES
+            ) if shared_cache else None,
+            bus=shared_cache.bus if shared_cache else None
+        ) if settings.RESULT_CACHE_ENABLED else None,
+        coalesce_requests=settings.COALESCE_REQUESTS,
+        data_sources=data_sources_from_settings(),
+        default_data_source=settings.DEFAULT_DATA_SOURCE,
+        replica_probe_interval=settings.REPLICA_PROBE_INTERVAL,
+        shared_cache=shared_cache,
+        llm_scheduler=LLMScheduler(
+            max_concurrency=settings.AI_MAX_CONCURRENCY,
+            tokens_per_minute=settings.AI_TOKENS_PER_MINUTE,
+            max_queue=settings.AI_QUEUE_MAX,
+            max_queue_per_key=settings.AI_QUEUE_MAX_PER_KEY,
+            max_wait=settings.AI_QUEUE_MAX_WAIT,
+            weights=settings.AI_KEY_WEIGHTS
+        ) if settings.RATE_LIMIT_ENABLED else None,
+        example_store=ExampleStore(
+            path=settings.FEW_SHOT_STORE_PATH,
+            max_examples=settings.FEW_SHOT_MAX_EXAMPLES,
+            top_k=settings.FEW_SHOT_TOP_K,
+            token_budget=settings.FEW_SHOT_TOKEN_BUDGET,
+            max_execution_time=settings.FEW_SHOT_MAX_EXECUTION_TIME
+        ) if settings.FEW_SHOT_ENABLED else None,
+        verification=VerificationConfig(
+            max_repairs=settings.SQL_VERIFY_MAX_REPAIRS,
+            max_cost=settings.QUERY_MAX_COST,
+            cost_action=settings.QUERY_COST_ACTION,
+            limit_rows=settings.QUERY_COST_LIMIT_ROWS,
+            timeout=settings.SQL_VERIFY_TIMEOUT
+        ) if settings.SQL_VERIFY_ENABLED else None
+    )
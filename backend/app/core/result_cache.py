@@ -0,0 +1,260 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from .cache import MemoryCacheBackend
+from .result_encoding import encode_compact_json
+from .shared_cache import RESULTS
+from .sql_utils import normalize_sql, referenced_tables
+from .sql_validation import sqlglot_dialect
+
+
+# Per-table modification counters, used to tell which tables changed since the
+# last check. PostgreSQL counts tuples written per table; MySQL exposes an
+# update time and approximate row count (subject to information_schema stats
+# caching on 8.0, which is disabled for the session where possible).
+_MODIFICATION_SQL = {
+    "postgresql": (
+        "SELECT relname, n_tup_ins + n_tup_upd + n_tup_del "
+        "FROM pg_stat_user_tables WHERE schemaname = current_schema() ORDER BY relname"
+    ),
+    "mysql": (
+        "SELECT table_name, CONCAT_WS('|', COALESCE(update_time, create_time), table_rows) "
+        "FROM information_schema.tables WHERE table_schema = DATABASE() ORDER BY table_name"
+    ),
+}
+
+# Rows serialized to estimate the size of a result
+_SIZE_SAMPLE_ROWS = 100
+
+
+def estimate_result_size(columns: List[str], rows: Sequence) -> int:
+    """Approximate the memory a result occupies from a sample of its rows."""
+    if not rows:
+        return len(encode_compact_json({"columns": columns}))
+    sample = rows[:_SIZE_SAMPLE_ROWS]
+    sample_size = len(encode_compact_json({"rows": sample}))
+    return len(encode_compact_json({"columns": columns})) + sample_size * len(rows) // len(sample)
+
+
+class ResultCache:
+    """Cache of query results keyed by normalized SQL and database identity.
+
+    Results larger than ``max_rows`` rows or ``max_entry_bytes`` are never
+    cached, and the whole cache is held under ``max_bytes`` by evicting the
+    least recently used results. Each entry is tagged with the tables it
+    reads; every ``check_interval`` seconds the per-table modification
+    counters are polled and results over tables that changed are dropped.
+    Databases without such counters rely on the TTL alone.
+
+    By default results live in this process. A shared ``backend`` (see
+    SharedCache) stores them once for every worker. Each invalidation is
+    then announced on ``bus``, so the other workers also discard results
+    of queries they had in flight.
+    """
+
+    def __init__(
+            self,
+            max_bytes: int = 64 * 1024 * 1024,
+            max_rows: int = 10000,
+            ttl: Optional[float] = 300,
+            check_interval: float = 5,
+            max_entry_bytes: Optional[int] = None,
+            backend=None,
+            bus=None
+    ):
+        self.shared = backend is not None
+        # Backends define __len__, so an empty one is falsy
+        self.backend = backend if backend is not None else MemoryCacheBackend(max_entries=100000, max_bytes=max_bytes)
+        self.bus = bus
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 10
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.invalidations = 0
+        # identity -> {table: modification counter}, and when it was read
+        self._fingerprints: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._checked_at: Dict[str, float] = {}
+        # Bumped on every invalidation so in-flight results can be discarded
+        self._epochs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if bus is not None:
+            bus.subscribe(RESULTS, self._bump_epoch)
+
+    @staticmethod
+    def identity(engine: Engine) -> str:
+        """Identify a database by its URL, with the password hidden."""
+        return engine.url.render_as_string(hide_password=True)
+
+    def _key(self, engine: Engine, sql: str, params: Optional[Dict], max_rows: Optional[int]) -> str:
+        raw = "|".join((
+            self.identity(engine),
+            normalize_sql(sql, sqlglot_dialect(engine.dialect.name)),
+            json.dumps(params or {}, sort_keys=True, default=str),
+            str(max_rows)
+        ))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(
+            self,
+            engine: Engine,
+            sql: str,
+            params: Optional[Dict] = None,
+            max_rows: Optional[int] = None
+    ) -> Optional[Tuple[List[str], List]]:
+        """Return cached ``(columns, rows)`` for ``sql``, or None."""
+        entry = self.backend.get(self._key(engine, sql, params, max_rows))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def epoch(self, engine: Engine) -> int:
+        """Return the invalidation counter to pass back to ``set``."""
+        return self._epochs.get(self.identity(engine), 0)
+
+    def set(
+            self,
+            engine: Engine,
+            sql: str,
+            params: Optional[Dict],
+            max_rows: Optional[int],
+            columns: List[str],
+            rows: List,
+            epoch: int
+    ) -> bool:
+        """Cache a result unless it is too large or may already be stale.
+
+        ``epoch`` is the value of ``epoch()`` from before the query ran; if
+        tables were invalidated since then the result is not stored.
+        """
+        identity = self.identity(engine)
+        tables = referenced_tables(sql, sqlglot_dialect(engine.dialect.name))
+        fingerprints = self._fingerprints.get(identity)
+        if (
+                len(rows) > self.max_rows
+                or self._epochs.get(identity, 0) != epoch
+                # Results over tables we cannot name could never be invalidated
+                or tables is None
+                # Tables we cannot track would never be invalidated
+                or (fingerprints is not None and not {table.lower() for table in tables} <= fingerprints.keys())
+        ):
+            self.skipped += 1
+            return False
+
+        size = estimate_result_size(columns, rows)
+        if size > self.max_entry_bytes:
+            self.skipped += 1
+            return False
+
+        if self.shared:
+            # Plain tuples pickle far smaller than SQLAlchemy rows
+            rows = [tuple(row) for row in rows]
+        self.backend.set(
+            self._key(engine, sql, params, max_rows),
+            (columns, rows),
+            ttl=self.ttl,
+            # Unquoted identifiers are case-insensitive; tag them folded
+            tags=[f"{identity}|{table.lower()}" for table in tables],
+            size=size
+        )
+        return True
+
+    def check_due(self, engine: Engine) -> bool:
+        """Whether the modification counters should be polled before a lookup."""
+        checked_at = self._checked_at.get(self.identity(engine))
+        return checked_at is None or time.monotonic() - checked_at >= self.check_interval
+
+    def check_modifications(self, engine: Engine) -> int:
+        """Poll per-table counters and drop results over changed tables.
+
+        Blocking; run it on the database thread pool. Returns the number of
+        cached results invalidated.
+        """
+        identity = self.identity(engine)
+        with self._lock:
+            if not self.check_due(engine):
+                return 0
+            self._checked_at[identity] = time.monotonic()
+
+        current = _fetch_modification_counters(engine)
+        if current is None:
+            # Keep the last counters so changes made meanwhile still show up
+            return 0
+        with self._lock:
+            previous = self._fingerprints.get(identity)
+            self._fingerprints[identity] = current
+            if previous is None:
+                return 0
+            changed = {
+                table for table in previous.keys() | current.keys()
+                if previous.get(table) != current.get(table)
+            }
+            if not changed:
+                return 0
+            self._epochs[identity] = self._epochs.get(identity, 0) + 1
+
+        removed = sum(self.backend.invalidate_tag(f"{identity}|{table}") for table in changed)
+        self.invalidations += removed
+        if self.bus is not None:
+            self.bus.publish(RESULTS, identity)
+        return removed
+
+    def _bump_epoch(self, identity: str) -> None:
+        """Another worker invalidated results of ``identity``."""
+        with self._lock:
+            self._epochs[identity] = self._epochs.get(identity, 0) + 1
+
+    def clear(self) -> None:
+        """Forget everything cached; a shared backend is left to the other workers."""
+        with self._lock:
+            self._fingerprints.clear()
+            self._checked_at.clear()
+            for identity in self._epochs:
+                self._epochs[identity] += 1
+        if not self.shared:
+            self.backend.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "invalidations": self.invalidations,
+            "entries": len(self.backend),
+            "bytes": self.backend.size_bytes
+        }
+
+
+def _fetch_modification_counters(engine: Engine) -> Optional[Dict[str, Any]]:
+    """Return ``{table: counter}`` for ``engine``, or None if unsupported."""
+    sql = _MODIFICATION_SQL.get(engine.dialect.name)
+    if sql is None:
+        return None
+    try:
+        with engine.connect() as conn:
+            if engine.dialect.name == "mysql":
+                try:
+                    conn.execute(text("SET SESSION information_schema_stats_expiry = 0"))
+                except SQLAlchemyError:
+                    # Older servers do not cache these statistics at all
+                    pass
+            counters: Dict[str, Any] = {}
+            for name, value in conn.execute(text(sql)):
+                # Tables differing only in case share a key; keep both counters
+                key = str(name).lower()
+                counters[key] = (counters[key], value) if key in counters else value
+            return counters
+    except SQLAlchemyError as e:
+        print(f"Failed to read table modification counters: {str(e)}")
+        return None
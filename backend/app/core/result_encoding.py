@@ -0,0 +1,245 @@
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
+import threading
+
+import orjson
+from sqlalchemy.engine import Row
+
+# Response formats for query results, picked from the Accept header
+JSON = "json"
+COMPACT_JSON = "compact"
+ARROW = "arrow"
+
+COMPACT_JSON_MEDIA_TYPE = "application/vnd.nlquery.compact+json"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_MEDIA_TYPE = "application/vnd.apache.arrow.file"
+
+_MEDIA_TYPES = {
+    COMPACT_JSON_MEDIA_TYPE: COMPACT_JSON,
+    ARROW_STREAM_MEDIA_TYPE: ARROW,
+}
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Return the result format requested by an Accept header.
+
+    Anything other than the two columnar media types gets the original
+    row-per-dict JSON response.
+    """
+    if not accept:
+        return JSON
+
+    best, best_quality = JSON, 0.0
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        fmt = _MEDIA_TYPES.get(media_type.strip().lower())
+        if fmt is None:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
+
+
+def rows_to_records(columns: List[str], rows: Sequence) -> List[Dict[str, Any]]:
+    """Convert rows to the row-per-dict layout of ChatResponse.results."""
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _orjson_default(value: Any) -> Any:
+    if isinstance(value, Row):
+        return tuple(value)
+    if isinstance(value, Decimal):
+        # Matches how FastAPI's jsonable_encoder renders Decimal
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def encode_compact_json(payload: Dict[str, Any]) -> bytes:
+    """Serialize a ``{columns, rows: [[...]]}`` payload with orjson.
+
+    Rows can be SQLAlchemy Row objects; they are converted one at a time
+    during serialization rather than copied up front.
+    """
+    return orjson.dumps(payload, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _arrow_column(pa, values: List[Any]):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # Mixed or exotic types: fall back to text rather than failing the request
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def encode_arrow_ipc(columns: List[str], rows: Sequence, metadata: Optional[Dict[str, str]] = None) -> bytes:
+    """Encode rows as an Arrow IPC stream, one record batch per call.
+
+    ``metadata`` (e.g. the SQL and message) is attached to the Arrow schema.
+    Requires pyarrow, which is imported on first use.
+    """
+    import pyarrow as pa
+
+    arrays = [_arrow_column(pa, [row[i] for row in rows]) for i in range(len(columns))]
+    table = pa.Table.from_arrays(arrays, names=columns)
+    if metadata:
+        table = table.replace_schema_metadata({k: v for k, v in metadata.items() if v is not None})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _wider_type(pa, current, incoming):
+    """The narrowest type that holds values of both ``current`` and ``incoming``."""
+    if pa.types.is_null(incoming) or incoming == current:
+        return current
+    if pa.types.is_string(current):
+        return current
+    if pa.types.is_decimal(current) and pa.types.is_decimal(incoming):
+        scale = max(current.scale, incoming.scale)
+        if incoming.precision - incoming.scale + scale > 38:
+            return pa.string()
+        return pa.decimal128(38, scale)
+    if pa.types.is_decimal(current) and pa.types.is_integer(incoming):
+        return current
+    if pa.types.is_integer(current) and pa.types.is_decimal(incoming):
+        return _wider_type(pa, pa.decimal128(38, 0), incoming)
+    numeric = (pa.types.is_integer, pa.types.is_floating, pa.types.is_decimal)
+    if any(check(current) for check in numeric) and any(check(incoming) for check in numeric):
+        return pa.float64()
+    return pa.string()
+
+
+def _cast(pa, array, target):
+    if pa.types.is_string(target) and not pa.types.is_string(array.type):
+        # Text the way the values print in Python, as _arrow_column does
+        return pa.array([None if v is None else str(v) for v in array.to_pylist()], type=pa.string())
+    return array.cast(target)
+
+
+class ArrowFileWriter:
+    """Append row batches to an Arrow IPC file as they are fetched.
+
+    Column types are inferred from the first batch; a column that is all
+    NULL there is stored as text, and decimals get the full 38 digits of
+    precision. A later batch that does not fit widens the column: to a
+    larger decimal scale, from integers to floats, or to text when nothing
+    narrower holds both. The rows written so far are then copied into a
+    file with the wider schema, so each widening costs one pass over them.
+    Requires pyarrow, which is imported on first use.
+    """
+
+    def __init__(self, path: str, columns: List[str], metadata: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.columns = columns
+        self.metadata = {k: v for k, v in (metadata or {}).items() if v is not None}
+        self.row_count = 0
+        self._schema = None
+        self._writer = None
+        self._sink = None
+        # Writes and close may come from different threads
+        self._lock = threading.Lock()
+
+    def _schema_for(self, pa, types: List):
+        return pa.schema(
+            [pa.field(name, pa.string() if pa.types.is_null(t) else t) for name, t in zip(self.columns, types)],
+            metadata=self.metadata
+        )
+
+    def _open(self, pa, types: List) -> None:
+        types = [pa.decimal128(38, t.scale) if pa.types.is_decimal128(t) else t for t in types]
+        self._schema = self._schema_for(pa, types)
+        self._sink = pa.OSFile(self.path, "wb")
+        self._writer = pa.ipc.new_file(self._sink, self._schema)
+
+    def _widen(self, pa, types: List) -> None:
+        """Copy the rows written so far into a file with ``types``, then keep appending to it."""
+        self._writer.close()
+        self._sink.close()
+        temporary = f"{self.path}.tmp"
+        for attempt in range(2):
+            schema = self._schema_for(pa, types)
+            sink = pa.OSFile(temporary, "wb")
+            writer = pa.ipc.new_file(sink, schema)
+            try:
+                with pa.memory_map(self.path) as source:
+                    reader = pa.ipc.open_file(source)
+                    for i in range(reader.num_record_batches):
+                        batch = reader.get_batch(i)
+                        writer.write_batch(pa.RecordBatch.from_arrays(
+                            [_cast(pa, column, field.type) for column, field in zip(batch.columns, schema)],
+                            schema=schema
+                        ))
+                break
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                writer.close()
+                sink.close()
+                if attempt:
+                    os.remove(temporary)
+                    raise
+                # Earlier values do not fit, e.g. too many digits for a larger
+                # scale: store the columns that changed as text instead
+                types = [t if t == field.type else pa.string() for t, field in zip(types, self._schema)]
+        # The new file stays open for writing across the rename
+        os.replace(temporary, self.path)
+        self._schema, self._writer, self._sink = schema, writer, sink
+
+    def write(self, rows: Sequence) -> None:
+        import pyarrow as pa
+
+        if not rows:
+            return
+        with self._lock:
+            arrays = [_arrow_column(pa, [row[i] for row in rows]) for i in range(len(self.columns))]
+            if self._writer is None:
+                self._open(pa, [array.type for array in arrays])
+            else:
+                types = [_wider_type(pa, field.type, array.type) for field, array in zip(self._schema, arrays)]
+                if types != self._schema.types:
+                    self._widen(pa, types)
+            arrays = [
+                array if array.type == field.type else _cast(pa, array, field.type)
+                for array, field in zip(arrays, self._schema)
+            ]
+            self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+            self.row_count += len(rows)
+
+    def close(self) -> None:
+        import pyarrow as pa
+
+        with self._lock:
+            if self._writer is None:
+                # No rows: still leave a readable file with the column names
+                self._open(pa, [pa.null()] * len(self.columns))
+            elif self._sink.closed:
+                # A failed widening already closed the file
+                return
+            self._writer.close()
+            self._sink.close()
+
+
+def read_arrow_file(path: str, offset: int = 0, limit: Optional[int] = None) -> Tuple[List[str], List[Tuple], int]:
+    """Read rows ``offset`` to ``offset + limit`` of an Arrow IPC file.
+
+    Returns ``(columns, rows, total_rows)``. The file is memory-mapped, so
+    only the requested rows are copied into Python objects.
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        page = table.slice(offset, limit)
+        rows = list(zip(*(column.to_pylist() for column in page.columns)))
+        return table.column_names, rows, table.num_rows
@@ -0,0 +1,304 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+import hashlib
+import json
+import threading
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from .shared_cache import SCHEMA
+
+
+# Per-table change fingerprints are computed from information_schema in two
+# bulk queries, so a refresh costs two round-trips plus reflection of only the
+# tables whose fingerprint moved.
+_CURRENT_SCHEMA = {
+    "postgresql": "current_schema()",
+    "mysql": "DATABASE()",
+}
+
+# Column comments feed table retrieval, so editing one must move the fingerprint
+_COLUMN_COMMENT = {
+    "postgresql": "col_description(format('%I.%I', c.table_schema, c.table_name)::regclass, c.ordinal_position)",
+    "mysql": "c.column_comment",
+}
+
+_COLUMNS_FINGERPRINT_SQL = """
+SELECT c.table_name, c.column_name, c.data_type, c.character_maximum_length,
+       c.numeric_precision, c.numeric_scale, c.is_nullable, {comment}
+FROM information_schema.columns c
+JOIN information_schema.tables t
+  ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+WHERE c.table_schema = {schema} AND t.table_type = 'BASE TABLE'
+ORDER BY c.table_name, c.ordinal_position
+"""
+
+_CONSTRAINTS_FINGERPRINT_SQL = """
+SELECT table_name, constraint_type, constraint_name
+FROM information_schema.table_constraints
+WHERE table_schema = {schema} AND constraint_type IN ('FOREIGN KEY', 'PRIMARY KEY')
+ORDER BY table_name, constraint_type, constraint_name
+"""
+
+
+@dataclass
+class SchemaSnapshot:
+    """An immutable view of a database schema at a point in time.
+
+    ``version`` is a content hash of ``schema`` and changes only when the
+    schema does, so downstream caches can use it as part of their key.
+    """
+    schema: Dict
+    version: str
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    loaded_at: float = 0.0
+    # Wall-clock time of the reflection, comparable across processes
+    refreshed_at: float = 0.0
+
+
+def schema_version(schema: Dict) -> str:
+    """Return a stable content hash for a schema dict."""
+    payload = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _reflect_tables(engine: Engine, table_names: Optional[List[str]] = None) -> Dict:
+    """Reflect columns and foreign keys for the given tables, or all of them.
+
+    Uses the inspector's bulk calls, so each kind of metadata costs one
+    round trip however many tables there are.
+    """
+    inspector = inspect(engine)
+    columns_by_table = inspector.get_multi_columns(filter_names=table_names)
+    primary_keys = inspector.get_multi_pk_constraint(filter_names=table_names)
+    foreign_keys = inspector.get_multi_foreign_keys(filter_names=table_names)
+    tables = {}
+    relationships = []
+
+    for key in sorted(columns_by_table, key=lambda key: key[1]):
+        table_name = key[1]
+        primary_key = set((primary_keys.get(key) or {}).get("constrained_columns") or [])
+        columns = []
+        for column in columns_by_table[key]:
+            entry = {"name": column["name"], "type": str(column["type"])}
+            # Keyset pagination needs to know which columns are unique
+            if column["name"] in primary_key:
+                entry["primary_key"] = True
+            # Comments feed table retrieval for large schemas
+            if column.get("comment"):
+                entry["comment"] = column["comment"]
+            columns.append(entry)
+        tables[table_name] = columns
+        for fk in foreign_keys.get(key, []):
+            relationships.append({
+                "table1": table_name,
+                "table2": fk["referred_table"],
+                "type": "foreignKey",
+                "keys": {
+                    table_name: fk["constrained_columns"][0],
+                    fk["referred_table"]: fk["referred_columns"][0]
+                }
+            })
+
+    return {"tables": tables, "relationships": relationships}
+
+
+def _fetch_fingerprints(engine: Engine) -> Optional[Dict[str, str]]:
+    """Return ``{table: fingerprint}`` or None if the dialect is unsupported."""
+    schema_expr = _CURRENT_SCHEMA.get(engine.dialect.name)
+    if schema_expr is None:
+        return None
+
+    parts: Dict[str, List[str]] = {}
+    with engine.connect() as conn:
+        columns_sql = _COLUMNS_FINGERPRINT_SQL.format(
+            schema=schema_expr, comment=_COLUMN_COMMENT[engine.dialect.name]
+        )
+        for row in conn.execute(text(columns_sql)):
+            parts.setdefault(row[0], []).append("|".join(str(v) for v in row[1:]))
+        for row in conn.execute(text(_CONSTRAINTS_FINGERPRINT_SQL.format(schema=schema_expr))):
+            parts.setdefault(row[0], []).append(f"{row[1]}|{row[2]}")
+
+    return {
+        table: hashlib.sha1("\n".join(items).encode("utf-8")).hexdigest()
+        for table, items in parts.items()
+    }
+
+
+class SchemaCache:
+    """Shared, TTL-bound cache of reflected schemas keyed by database URL.
+
+    On PostgreSQL and MySQL a stale snapshot is refreshed incrementally: only
+    tables whose information_schema fingerprint changed are re-reflected.
+    Other dialects fall back to a full reflection.
+
+    With a ``shared`` backend (see SharedCache), snapshots are also stored
+    there. A worker whose copy is stale adopts one another worker reflected
+    within the TTL instead of reflecting itself. When a refresh changes the
+    schema version, ``bus`` tells the other workers to drop their copy.
+    """
+
+    def __init__(self, ttl: int = 300, shared=None, bus=None):
+        self.ttl = ttl
+        self.shared = shared
+        self.bus = bus
+        self._snapshots: Dict[str, SchemaSnapshot] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        if bus is not None:
+            bus.subscribe(SCHEMA, self._drop)
+
+    def _key(self, engine: Engine) -> str:
+        # str() on a SQLAlchemy URL masks the password
+        return str(engine.url)
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def peek(self, engine: Engine) -> Optional[SchemaSnapshot]:
+        """Return the cached snapshot without refreshing it."""
+        return self._snapshots.get(self._key(engine))
+
+    def get(self, engine: Engine, force: bool = False, full: bool = False) -> SchemaSnapshot:
+        """Return a fresh snapshot, refreshing it if stale or when forced.
+
+        ``full`` skips the incremental path and re-reflects every table.
+        """
+        key = self._key(engine)
+        snapshot = self._snapshots.get(key)
+        if snapshot and not force and not full and self._is_fresh(snapshot):
+            return snapshot
+
+        with self._key_lock(key):
+            # Another thread may have refreshed while we waited
+            current = self._snapshots.get(key)
+            if current and not force and not full and self._is_fresh(current):
+                return current
+
+            shared = self._shared_get(key)
+            if shared is not None and (current is None or shared.refreshed_at > current.refreshed_at):
+                age = max(time.time() - shared.refreshed_at, 0.0)
+                current = SchemaSnapshot(
+                    schema=shared.schema,
+                    version=shared.version,
+                    fingerprints=shared.fingerprints,
+                    loaded_at=time.monotonic() - age,
+                    refreshed_at=shared.refreshed_at
+                )
+                if not force and not full and self._is_fresh(current):
+                    self._snapshots[key] = current
+                    return current
+
+            if current is None or full:
+                snapshot = self._load_full(engine)
+            else:
+                snapshot = self._load_incremental(engine, current)
+
+            self._snapshots[key] = snapshot
+            self._shared_set(key, snapshot, changed=current is not None and current.version != snapshot.version)
+            return snapshot
+
+    def _shared_get(self, key: str) -> Optional[SchemaSnapshot]:
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get(key)
+        except Exception as e:
+            print(f"Failed to read the shared schema snapshot: {str(e)}")
+            return None
+
+    def _shared_set(self, key: str, snapshot: SchemaSnapshot, changed: bool) -> None:
+        if self.shared is None:
+            return
+        try:
+            # Kept past the TTL so a stale copy can still seed an incremental refresh
+            self.shared.set(key, snapshot, ttl=self.ttl * 10 if self.ttl else None)
+        except Exception as e:
+            print(f"Failed to store the shared schema snapshot: {str(e)}")
+            return
+        if changed and self.bus is not None:
+            self.bus.publish(SCHEMA, key)
+
+    def _drop(self, key: str) -> None:
+        """Another worker changed the snapshot for ``key``."""
+        with self._lock:
+            self._snapshots.pop(key, None)
+
+    def invalidate(self, engine: Optional[Engine] = None) -> None:
+        """Drop the snapshot for one database, or all of them."""
+        with self._lock:
+            if engine is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(self._key(engine), None)
+
+    def _is_fresh(self, snapshot: SchemaSnapshot) -> bool:
+        return time.monotonic() - snapshot.loaded_at < self.ttl
+
+    def _load_full(self, engine: Engine) -> SchemaSnapshot:
+        try:
+            fingerprints = _fetch_fingerprints(engine) or {}
+        except Exception as e:
+            print(f"Schema fingerprint query failed, falling back to reflection: {str(e)}")
+            fingerprints = {}
+
+        schema = _reflect_tables(engine)
+        return SchemaSnapshot(
+            schema=schema,
+            version=schema_version(schema),
+            fingerprints=fingerprints,
+            loaded_at=time.monotonic(),
+            refreshed_at=time.time()
+        )
+
+    def _load_incremental(self, engine: Engine, previous: SchemaSnapshot) -> SchemaSnapshot:
+        try:
+            fingerprints = _fetch_fingerprints(engine)
+        except Exception as e:
+            print(f"Schema fingerprint query failed, falling back to reflection: {str(e)}")
+            fingerprints = None
+
+        if fingerprints is None or not previous.fingerprints:
+            return self._load_full(engine)
+
+        changed = [
+            table for table, fingerprint in fingerprints.items()
+            if previous.fingerprints.get(table) != fingerprint
+        ]
+        removed: Set[str] = set(previous.fingerprints) - set(fingerprints)
+
+        if not changed and not removed:
+            return SchemaSnapshot(
+                schema=previous.schema,
+                version=previous.version,
+                fingerprints=previous.fingerprints,
+                loaded_at=time.monotonic(),
+                refreshed_at=time.time()
+            )
+
+        refreshed = _reflect_tables(engine, changed)
+        dropped = removed | set(changed)
+
+        # Build a new dict so executors holding the old snapshot are unaffected
+        tables = {
+            name: columns for name, columns in previous.schema["tables"].items()
+            if name not in dropped
+        }
+        tables.update(refreshed["tables"])
+        relationships = [
+            rel for rel in previous.schema["relationships"]
+            if rel["table1"] not in dropped and rel["table2"] not in removed
+        ]
+        relationships.extend(refreshed["relationships"])
+
+        schema = {"tables": tables, "relationships": relationships}
+        return SchemaSnapshot(
+            schema=schema,
+            version=schema_version(schema),
+            fingerprints=fingerprints,
+            loaded_at=time.monotonic(),
+            refreshed_at=time.time()
+        )
@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set
+import math
+import re
+
+
+@dataclass
+class SchemaPruningConfig:
+    top_k: int = 8
+    # Schemas with this many tables or fewer are always sent in full
+    min_tables: int = 30
+    # Upper bound on the estimated tokens spent on the schema description
+    token_budget: int = 4000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for prompt budgeting (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Split identifiers and prose into lowercase terms.
+
+    ``customerOrders``, ``customer_orders`` and "customer orders" all yield
+    ``["customer", "order"]``.
+    """
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    terms = []
+    for word in re.split(r"[^A-Za-z0-9]+", text.lower()):
+        if len(word) < 2:
+            continue
+        # Cheap plural folding so "customers" matches a "customer" table
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+class SchemaIndex:
+    """Inverted index over table names, column names and column comments.
+
+    Built once per schema version and used to pick the tables relevant to a
+    question before the system prompt is rendered.
+    """
+
+    # Matches on the table name say more than matches on one of its columns
+    TABLE_WEIGHT = 3.0
+    COLUMN_WEIGHT = 1.0
+
+    def __init__(self, schema: Dict):
+        self.schema = schema
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._neighbors: Dict[str, Set[str]] = {}
+        self._table_tokens: Dict[str, int] = {}
+
+        for table_name, columns in schema["tables"].items():
+            # Matches the line layout of the rendered description
+            self._table_tokens[table_name] = estimate_tokens(
+                f"Table: {table_name}\nColumns:\n"
+                + "".join(f"  - {col['name']} ({col['type']})\n" for col in columns)
+            )
+            self._add(table_name, tokenize(table_name), self.TABLE_WEIGHT)
+            for col in columns:
+                self._add(table_name, tokenize(col["name"]), self.COLUMN_WEIGHT)
+                if col.get("comment"):
+                    self._add(table_name, tokenize(col["comment"]), self.COLUMN_WEIGHT)
+
+        for rel in schema["relationships"]:
+            self._neighbors.setdefault(rel["table1"], set()).add(rel["table2"])
+            self._neighbors.setdefault(rel["table2"], set()).add(rel["table1"])
+
+        table_count = max(len(schema["tables"]), 1)
+        self._idf = {
+            term: math.log(1 + table_count / len(tables))
+            for term, tables in self._postings.items()
+        }
+
+    def _add(self, table_name: str, terms: Iterable[str], weight: float) -> None:
+        for term in terms:
+            tables = self._postings.setdefault(term, {})
+            tables[table_name] = tables.get(table_name, 0.0) + weight
+
+    def rank(self, question: str) -> List[str]:
+        """Return tables matching the question, best first."""
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(question)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for table_name, weight in self._postings[term].items():
+                scores[table_name] = scores.get(table_name, 0.0) + idf * (1 + math.log(weight))
+        return sorted(scores, key=lambda name: (-scores[name], name))
+
+    def select(self, question: str, top_k: int) -> List[str]:
+        """Pick the top-k tables and expand them one hop along foreign keys.
+
+        Direct matches come first so that budget trimming drops join-only
+        neighbours before anything the question actually mentioned.
+        """
+        ranked = self.rank(question)[:top_k]
+        selected = list(ranked)
+        seen = set(ranked)
+        for table_name in ranked:
+            for neighbor in sorted(self._neighbors.get(table_name, ())):
+                if neighbor not in seen and neighbor in self.schema["tables"]:
+                    seen.add(neighbor)
+                    selected.append(neighbor)
+        return selected
+
+    def select_within_budget(self, question: str, config: SchemaPruningConfig) -> List[str]:
+        """Select relevant tables, keeping their description within the token budget.
+
+        When nothing in the question matches, tables are taken in schema
+        order so the model still sees as much of the schema as fits.
+        """
+        candidates = self.select(question, config.top_k) or list(self.schema["tables"])
+        selected, used = [], 0
+        for table_name in candidates:
+            cost = self._table_tokens[table_name]
+            if selected and used + cost > config.token_budget:
+                break
+            selected.append(table_name)
+            used += cost
+        return selected
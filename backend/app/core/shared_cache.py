@@ -0,0 +1,215 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from .cache import RedisCacheBackend, SQLiteCacheBackend, create_redis_client
+
+# Invalidation kinds published on the bus
+SCHEMA = "schema"
+TRANSLATIONS = "translations"
+RESULTS = "results"
+
+
+class InvalidationBus:
+    """Tells other processes to drop local state derived from shared entries.
+
+    Handlers are registered per kind and called with the message key. A
+    process never receives its own messages: the publisher has already
+    applied the change locally. This base class has no other processes to
+    tell, so publishing is a no-op.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable[[str], None]]] = defaultdict(list)
+
+    def subscribe(self, kind: str, handler: Callable[[str], None]) -> None:
+        self._handlers[kind].append(handler)
+
+    def publish(self, kind: str, key: str) -> None:
+        pass
+
+    def _dispatch(self, kind: str, key: str) -> None:
+        for handler in list(self._handlers.get(kind, ())):
+            try:
+                handler(key)
+            except Exception as e:
+                print(f"Invalidation handler for {kind} failed: {str(e)}")
+
+    def close(self) -> None:
+        pass
+
+
+class RedisInvalidationBus(InvalidationBus):
+    """Invalidation messages over Redis pub/sub.
+
+    Only small ``{"kind", "key"}`` messages travel here; the cached data
+    itself lives in the shared backend. Messages are received on a daemon
+    thread started by the first ``subscribe``.
+    """
+
+    def __init__(self, client, channel: str):
+        super().__init__()
+        self.client = client
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._thread: Optional[threading.Thread] = None
+        self._pubsub = None
+
+    def subscribe(self, kind: str, handler: Callable[[str], None]) -> None:
+        super().subscribe(kind, handler)
+        if self._thread is None:
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(self.channel)
+            self._thread = threading.Thread(target=self._listen, name="nlquery-invalidation", daemon=True)
+            self._thread.start()
+
+    def publish(self, kind: str, key: str) -> None:
+        try:
+            self.client.publish(self.channel, json.dumps({"origin": self.origin, "kind": kind, "key": key}))
+        except Exception as e:
+            # Other workers fall back on their TTLs
+            print(f"Failed to publish {kind} invalidation: {str(e)}")
+
+    def _listen(self) -> None:
+        while self._pubsub is not None:
+            try:
+                message = self._pubsub.get_message(timeout=1.0)
+            except Exception as e:
+                if self._pubsub is None:
+                    break
+                print(f"Invalidation subscription failed, retrying: {str(e)}")
+                time.sleep(1.0)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            event = json.loads(message["data"])
+            if event["origin"] != self.origin:
+                self._dispatch(event["kind"], event["key"])
+
+    def close(self) -> None:
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            pubsub.close()
+
+
+class SQLiteInvalidationBus(InvalidationBus):
+    """Invalidation messages through a table in the shared SQLite file.
+
+    Publishing appends a row; subscribed processes poll for new rows every
+    ``poll_interval`` seconds. Rows older than ``retention`` seconds are
+    pruned by whoever publishes.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.5, retention: float = 300):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS invalidation_events ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL,"
+                " kind TEXT NOT NULL, key TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+        self._last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM invalidation_events").fetchone()[0]
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, kind: str, handler: Callable[[str], None]) -> None:
+        super().subscribe(kind, handler)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._poll, name="nlquery-invalidation", daemon=True)
+            self._thread.start()
+
+    def publish(self, kind: str, key: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO invalidation_events (origin, kind, key, created_at) VALUES (?, ?, ?, ?)",
+                (self.origin, kind, key, now)
+            )
+            self._conn.execute("DELETE FROM invalidation_events WHERE created_at < ?", (now - self.retention,))
+
+    def _poll(self) -> None:
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                with self._lock:
+                    rows = self._conn.execute(
+                        "SELECT id, origin, kind, key FROM invalidation_events WHERE id > ? ORDER BY id",
+                        (self._last_id,)
+                    ).fetchall()
+            except sqlite3.Error as e:
+                print(f"Failed to read invalidation events: {str(e)}")
+                continue
+            for event_id, origin, kind, key in rows:
+                self._last_id = event_id
+                if origin != self.origin:
+                    self._dispatch(kind, key)
+
+    def close(self) -> None:
+        self._stopped.set()
+
+
+class SharedCache:
+    """The cache tier shared by every worker: named backends plus an invalidation bus.
+
+    ``kind`` is 'sqlite' (one host; put ``path`` on /dev/shm to keep it in
+    memory) or 'redis' (any number of hosts). Each ``backend(name)`` is a
+    separate namespace in the same store.
+    """
+
+    def __init__(
+            self,
+            kind: str,
+            path: Optional[str] = None,
+            redis_url: Optional[str] = None,
+            namespace: str = "nlquery"
+    ):
+        self.kind = kind
+        self.path = path
+        self.namespace = namespace
+        self.client = None
+        if kind == "sqlite":
+            if not path:
+                raise ValueError("The sqlite shared cache requires a file path")
+            self.bus = SQLiteInvalidationBus(path)
+        elif kind == "redis":
+            if not redis_url:
+                raise ValueError("The redis shared cache requires a server URL")
+            # One connection pool for every backend and the bus
+            self.client = create_redis_client(redis_url)
+            self.bus = RedisInvalidationBus(self.client, f"{namespace}:invalidate")
+        else:
+            raise ValueError(f"Unsupported shared cache: {kind}")
+
+    def backend(self, name: str, max_entries: int = 100000, max_bytes: Optional[int] = None):
+        """Return the backend for one cache, e.g. 'translations' or 'results'."""
+        if self.kind == "sqlite":
+            return SQLiteCacheBackend(
+                self.path, max_entries=max_entries, max_bytes=max_bytes, namespace=f"{self.namespace}_{name}"
+            )
+        # Redis memory is bounded by the server's maxmemory policy
+        return RedisCacheBackend(self.client, namespace=f"{self.namespace}:{name}", max_entries=max_entries)
+
+    def close(self) -> None:
+        self.bus.close()
+
+
+def create_shared_cache(
+        kind: str,
+        path: Optional[str] = None,
+        redis_url: Optional[str] = None,
+        namespace: str = "nlquery"
+) -> Optional[SharedCache]:
+    """Build the shared cache tier from settings; 'none' keeps every cache per process."""
+    if kind == "none":
+        return None
+    return SharedCache(kind, path=path, redis_url=redis_url, namespace=namespace)
@@ -0,0 +1,53 @@
+from typing import Optional, Set
+import functools
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.scope import traverse_scope
+
+
+def strip_terminator(sql: str) -> str:
+    """Drop surrounding whitespace and any trailing semicolons."""
+    return sql.strip().rstrip(";").strip()
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_sql(sql: str, dialect: Optional[str] = None) -> str:
+    """Normalize SQL for use as a cache key.
+
+    The SQL is parsed and regenerated without comments, so layout and
+    comments no longer matter while string literals are kept exactly as
+    written. SQL that sqlglot cannot parse is keyed on its exact text.
+    """
+    try:
+        statements = [statement for statement in sqlglot.parse(sql, read=dialect) if statement is not None]
+        return ";\n".join(statement.sql(dialect=dialect, comments=False) for statement in statements)
+    except SqlglotError:
+        return sql
+
+
+def referenced_tables(sql: str, dialect: Optional[str] = None) -> Optional[Set[str]]:
+    """Return the distinct tables a query reads, or None if they cannot all be named.
+
+    Every scope is walked (subqueries, CTEs, set operations), so comma joins
+    and quoted names are found. Schema-qualified tables and table functions
+    return None: they cannot be matched to a table of the current schema.
+    """
+    try:
+        statements = [statement for statement in sqlglot.parse(sql, read=dialect) if statement is not None]
+        if len(statements) != 1:
+            return None
+        scopes = traverse_scope(statements[0])
+    except SqlglotError:
+        return None
+
+    tables: Set[str] = set()
+    for scope in scopes:
+        for source in scope.sources.values():
+            if not isinstance(source, exp.Table):
+                continue
+            if not isinstance(source.this, exp.Identifier) or source.db or source.catalog:
+                return None
+            tables.add(source.name)
+    return tables
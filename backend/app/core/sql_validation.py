@@ -0,0 +1,217 @@
+from typing import Dict, FrozenSet, List, Optional, Set
+import re
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import OptimizeError, ParseError
+from sqlglot.optimizer.scope import Scope, traverse_scope
+
+
+# SQLAlchemy dialect names -> sqlglot dialects
+SQLGLOT_DIALECTS = {
+    "postgresql": "postgres",
+    "mysql": "mysql",
+    "sqlite": "sqlite",
+}
+
+# Statements that only read: SELECT and set operations (UNION/INTERSECT/EXCEPT)
+_READ_ONLY_ROOTS = (exp.Select, exp.Union, exp.Subquery)
+
+# Nodes that write, change the schema, take locks or change session state,
+# wherever they appear (a CTE can hide a DELETE ... RETURNING, for example).
+# Anything sqlglot does not understand parses as a Command and is refused.
+_WRITE_NODES = (
+    exp.DML,
+    exp.DDL,
+    exp.Drop,
+    exp.AlterTable,
+    exp.TruncateTable,
+    exp.Merge,
+    exp.Command,
+    exp.Into,
+    exp.Lock,
+    exp.Transaction,
+    exp.Set,
+    exp.Use,
+    exp.Pragma,
+    exp.LoadData,
+)
+
+# Functions with side effects that a plain SELECT can still call. This only
+# rejects the well-known ones early; user-defined functions can write too,
+# so generated SQL also runs in a read-only transaction.
+_SIDE_EFFECT_FUNCTIONS = frozenset({
+    "pg_terminate_backend", "pg_cancel_backend", "pg_reload_conf", "pg_rotate_logfile",
+    "set_config", "nextval", "setval", "pg_notify",
+    "lo_import", "lo_export", "lo_unlink", "lo_create", "lo_creat", "lo_from_bytea",
+    "lo_put", "lo_truncate", "lo_open", "lo_write",
+    "pg_read_file", "pg_read_binary_file", "pg_ls_dir", "pg_stat_file",
+    "dblink", "dblink_exec", "dblink_connect", "dblink_connect_u", "dblink_send_query",
+    "dblink_open", "dblink_fetch",
+    "pg_advisory_lock", "pg_advisory_lock_shared", "pg_advisory_xact_lock",
+    "pg_advisory_xact_lock_shared", "pg_try_advisory_lock", "pg_try_advisory_lock_shared",
+    "pg_try_advisory_xact_lock", "pg_try_advisory_xact_lock_shared",
+    "pg_advisory_unlock", "pg_advisory_unlock_all",
+    "pg_create_restore_point", "pg_switch_wal", "pg_logical_emit_message",
+    "pg_sleep", "pg_sleep_for", "pg_sleep_until",
+    "sleep", "benchmark", "load_file", "get_lock", "release_lock", "release_all_locks",
+    "sys_exec", "sys_eval",
+    "load_extension", "writefile", "edit",
+})
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def sqlglot_dialect(db_type: Optional[str]) -> Optional[str]:
+    """Map a database type ('postgresql', 'mysql', ...) to a sqlglot dialect."""
+    return SQLGLOT_DIALECTS.get(db_type or "")
+
+
+def parse_statements(sql: str, dialect: Optional[str] = None) -> List[exp.Expression]:
+    """Parse ``sql`` into statements; raises sqlglot's ParseError."""
+    # Trailing semicolons parse as empty statements
+    return [statement for statement in sqlglot.parse(sql, read=dialect) if statement is not None]
+
+
+def read_only_violation(statements: List[exp.Expression]) -> Optional[str]:
+    """Return why ``statements`` are not a single read-only query, or None."""
+    if len(statements) != 1:
+        return "Exactly one statement is allowed"
+
+    statement = statements[0]
+    if not isinstance(statement, _READ_ONLY_ROOTS):
+        return f"Only SELECT queries are allowed, got {statement.key.upper()}"
+
+    for node in statement.walk(bfs=False):
+        if isinstance(node, _WRITE_NODES):
+            return f"Query contains a {node.key.upper()} clause"
+        if isinstance(node, exp.Func):
+            name = node.name if isinstance(node, exp.Anonymous) else node.sql_name()
+            if name.lower() in _SIDE_EFFECT_FUNCTIONS:
+                return f"Query calls {name.lower()}(), which has side effects"
+    return None
+
+
+def is_read_only(sql: str, dialect: Optional[str] = None) -> bool:
+    """Whether ``sql`` is exactly one statement that cannot modify anything.
+
+    SQL that does not parse is treated as unsafe.
+    """
+    try:
+        statements = parse_statements(sql, dialect)
+    except ParseError:
+        return False
+    return read_only_violation(statements) is None
+
+
+class SQLValidator:
+    """Check a query's table and column references against a schema snapshot.
+
+    The schema is indexed once as ``{table: set(columns)}``, so each reference
+    is a hash lookup. Queries are parsed with sqlglot and resolved scope by
+    scope: table aliases, CTEs and derived tables are followed to what they
+    select, and correlated subqueries can see their enclosing scopes.
+    Identifiers are compared case-insensitively.
+    """
+
+    def __init__(self, schema: Dict, dialect: Optional[str] = None):
+        self.schema = schema
+        self.dialect = dialect
+        self.tables: Dict[str, FrozenSet[str]] = {
+            name.lower(): frozenset(col["name"].lower() for col in columns)
+            for name, columns in schema["tables"].items()
+        }
+
+    def validate(self, sql: str) -> Dict:
+        """Return ``{"isValid": bool, "issues": [...]}`` for ``sql``."""
+        try:
+            statements = parse_statements(sql, self.dialect)
+        except ParseError as e:
+            message = _WHITESPACE.sub(" ", str(e)).strip()
+            return {"isValid": False, "issues": [f"Could not parse SQL: {message}"]}
+
+        issues: List[str] = []
+        violation = read_only_violation(statements)
+        if violation:
+            issues.append(violation)
+
+        for statement in statements:
+            try:
+                scopes = traverse_scope(statement)
+            except OptimizeError as e:
+                issues.append(f"Invalid query structure: {str(e)}")
+                continue
+            checked: Set[int] = set()
+            # Inner scopes come first, so each column is checked where it appears
+            for scope in scopes:
+                self._check_scope(scope, checked, issues)
+
+        # Keep the first occurrence of each issue, in order
+        issues = list(dict.fromkeys(issues))
+        return {
+            "isValid": len(issues) == 0,
+            "issues": issues
+        }
+
+    def _check_scope(self, scope: Scope, checked: Set[int], issues: List[str]) -> None:
+        for source in scope.sources.values():
+            if (
+                    isinstance(source, exp.Table)
+                    and isinstance(source.this, exp.Identifier)
+                    and source.name.lower() not in self.tables
+            ):
+                issues.append(f"Invalid table reference: {source.name}")
+
+        aliases = {
+            select.alias.lower() for select in getattr(scope.expression, "expressions", ())
+            if isinstance(select, exp.Alias)
+        }
+        for column in scope.columns:
+            if id(column) in checked or isinstance(column.this, exp.Star):
+                continue
+            checked.add(id(column))
+            name = column.name.lower()
+
+            if column.table:
+                source = self._resolve_source(scope, column.table)
+                if source is None:
+                    issues.append(f"Invalid table reference: {column.table}")
+                elif not self._source_has(source, name):
+                    issues.append(f"Invalid column reference: {column.name}")
+                continue
+
+            # Unqualified: any visible source may provide it, or a select alias
+            if name in aliases:
+                continue
+            if not any(
+                    self._source_has(source, name)
+                    for visible in _scope_chain(scope)
+                    for source in visible.sources.values()
+            ):
+                issues.append(f"Invalid column reference: {column.name}")
+
+    @staticmethod
+    def _resolve_source(scope: Scope, alias: str):
+        for visible in _scope_chain(scope):
+            if alias in visible.sources:
+                return visible.sources[alias]
+        return None
+
+    def _source_has(self, source, name: str) -> bool:
+        if isinstance(source, exp.Table):
+            columns = self.tables.get(source.name.lower())
+            # Unknown tables are reported on their own
+            return columns is None or name in columns
+        if isinstance(source, Scope):
+            expression = source.expression
+            if not isinstance(expression, (exp.Select, exp.Union)) or expression.is_star:
+                return True
+            return name in {select.lower() for select in expression.named_selects}
+        # Table functions, UNNEST and the like: nothing to check against
+        return True
+
+
+def _scope_chain(scope: Optional[Scope]):
+    while scope is not None:
+        yield scope
+        scope = scope.parent
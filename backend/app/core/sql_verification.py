@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+import json
+
+from sqlglot import exp
+from sqlglot.errors import ParseError
+
+from .sql_validation import parse_statements
+
+
+# What to do with a query whose estimated cost is over the limit:
+# refuse it, cap it with a LIMIT, or ask the model for a cheaper query
+COST_ACTIONS = ("reject", "limit", "repair")
+
+
+@dataclass
+class VerificationConfig:
+    # Rounds of feeding planner errors back to the model; 0 only verifies
+    max_repairs: int = 2
+    # Planner cost above which a query is not run as is; None disables the check
+    max_cost: Optional[float] = None
+    cost_action: str = "reject"
+    # Rows kept when cost_action is 'limit'
+    limit_rows: int = 1000
+    # Server-side timeout for the EXPLAIN itself, in seconds
+    timeout: float = 5
+
+    def __post_init__(self):
+        if self.cost_action not in COST_ACTIONS:
+            raise ValueError(f"Unsupported cost action: {self.cost_action}")
+
+
+@dataclass
+class PlanEstimate:
+    # In the planner's own units, so only comparable within one database type
+    cost: Optional[float] = None
+    rows: Optional[float] = None
+
+
+class CostLimitError(ValueError):
+    """The query's estimated cost is over the configured limit."""
+
+
+def explain_statement(dialect: str, sql: str) -> Optional[str]:
+    """Return the EXPLAIN statement that plans ``sql`` without running it.
+
+    None means the database has no EXPLAIN the verifier understands.
+    """
+    if dialect == "postgresql":
+        return f"EXPLAIN (FORMAT JSON) {sql}"
+    if dialect == "mysql":
+        return f"EXPLAIN FORMAT=JSON {sql}"
+    if dialect == "sqlite":
+        # Resolves every table and column, but reports no cost
+        return f"EXPLAIN QUERY PLAN {sql}"
+    return None
+
+
+def parse_plan(dialect: str, first_row: Any) -> PlanEstimate:
+    """Read the cost estimate from the first row of an EXPLAIN result."""
+    if dialect not in ("postgresql", "mysql") or first_row is None:
+        return PlanEstimate()
+
+    plan = first_row[0]
+    if isinstance(plan, (str, bytes)):
+        plan = json.loads(plan)
+    if dialect == "postgresql":
+        root = plan[0]["Plan"]
+        return PlanEstimate(cost=float(root["Total Cost"]), rows=float(root["Plan Rows"]))
+
+    cost = plan.get("query_block", {}).get("cost_info", {}).get("query_cost")
+    return PlanEstimate(cost=float(cost) if cost is not None else None)
+
+
+def planner_message(error: Exception) -> str:
+    """The database's own message for a failed EXPLAIN, without SQLAlchemy's wrapping."""
+    message = str(getattr(error, "orig", None) or error)
+    # Drivers append the statement and hints on later lines
+    return message.strip().splitlines()[0] if message.strip() else type(error).__name__
+
+
+def add_limit(sql: str, limit: int, dialect: Optional[str] = None) -> Optional[str]:
+    """Rewrite ``sql`` to return at most ``limit`` rows.
+
+    Returns None when that cannot make the query cheaper: it does not parse,
+    or it already has a LIMIT no larger than ``limit``.
+    """
+    try:
+        statements = parse_statements(sql, dialect)
+    except ParseError:
+        return None
+    if len(statements) != 1 or not isinstance(statements[0], (exp.Select, exp.Union)):
+        return None
+
+    statement = statements[0]
+    existing = statement.args.get("limit")
+    if existing is not None:
+        value = existing.expression
+        if not isinstance(value, exp.Literal) or not value.is_int or int(value.this) <= limit:
+            return None
+    # Set operations are wrapped in a subquery, selects get the clause directly
+    return statement.limit(limit).sql(dialect=dialect)
@@ -0,0 +1,170 @@
+from typing import Dict, Optional, Set, Tuple
+import hashlib
+import re
+import threading
+
+from .cache import MemoryCacheBackend
+from .shared_cache import TRANSLATIONS
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different phrasings share a key."""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?.! ")
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TranslationCache:
+    """Cache of natural language -> SQL translations in front of the AI call.
+
+    Exact hits are keyed on the normalized question, model, temperature and
+    schema version. When ``similarity_threshold`` is set, a second tier looks
+    up near-identical questions through a character-trigram index and accepts
+    the best match whose Jaccard similarity reaches the threshold.
+
+    Every entry is tagged with its schema version so a schema change can drop
+    all translations made against the old schema. With a shared backend,
+    ``bus`` carries those drops to the other workers' similarity indexes,
+    which only know the questions their own process cached.
+    """
+
+    def __init__(
+            self,
+            backend,
+            ttl: Optional[float] = 3600,
+            similarity_threshold: float = 0.0,
+            bus=None
+    ):
+        self.backend = backend
+        # SQLite and Redis backends do I/O; callers keep them off the event loop
+        self.shared = not isinstance(backend, MemoryCacheBackend)
+        self.bus = bus
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        # partition -> {normalized question: trigrams}, and trigram -> questions
+        self._questions: Dict[Tuple, Dict[str, Set[str]]] = {}
+        self._postings: Dict[Tuple, Dict[str, Set[str]]] = {}
+        self._lock = threading.Lock()
+        if bus is not None:
+            bus.subscribe(TRANSLATIONS, self._forget_schema)
+
+    def _key(self, partition: Tuple, question: str) -> str:
+        raw = "|".join(str(part) for part in partition) + "|" + question
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(
+            self,
+            question: str,
+            model: str,
+            temperature: float,
+            schema_version: Optional[str]
+    ) -> Optional[Dict]:
+        """Return a cached translation, marked with the tier that served it."""
+        partition = (model, temperature, schema_version)
+        normalized = normalize_question(question)
+
+        result = self.backend.get(self._key(partition, normalized))
+        if result is not None:
+            self.hits += 1
+            return {**result, "cache": "exact"}
+
+        if self.similarity_threshold > 0:
+            match = self._most_similar(partition, normalized)
+            if match is not None:
+                result = self.backend.get(self._key(partition, match))
+                if result is not None:
+                    self.similar_hits += 1
+                    return {**result, "cache": "similar"}
+                # The backend evicted it; stop offering it as a candidate
+                self._forget(partition, match)
+
+        self.misses += 1
+        return None
+
+    def set(
+            self,
+            question: str,
+            model: str,
+            temperature: float,
+            schema_version: Optional[str],
+            result: Dict
+    ) -> None:
+        partition = (model, temperature, schema_version)
+        normalized = normalize_question(question)
+        tags = (schema_version,) if schema_version else ()
+        self.backend.set(self._key(partition, normalized), result, ttl=self.ttl, tags=tags)
+
+        if self.similarity_threshold > 0:
+            grams = _trigrams(normalized)
+            with self._lock:
+                self._questions.setdefault(partition, {})[normalized] = grams
+                postings = self._postings.setdefault(partition, {})
+                for gram in grams:
+                    postings.setdefault(gram, set()).add(normalized)
+
+    def invalidate_schema(self, schema_version: str) -> int:
+        """Drop every translation made against ``schema_version``."""
+        self._forget_schema(schema_version)
+        removed = self.backend.invalidate_tag(schema_version)
+        if self.bus is not None:
+            self.bus.publish(TRANSLATIONS, schema_version)
+        return removed
+
+    def _forget_schema(self, schema_version: str) -> None:
+        with self._lock:
+            for partition in [p for p in self._questions if p[2] == schema_version]:
+                del self._questions[partition]
+                del self._postings[partition]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._questions.clear()
+            self._postings.clear()
+        self.backend.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "entries": len(self.backend)
+        }
+
+    def _most_similar(self, partition: Tuple, question: str) -> Optional[str]:
+        grams = _trigrams(question)
+        with self._lock:
+            postings = self._postings.get(partition)
+            questions = self._questions.get(partition)
+            if not postings:
+                return None
+
+            overlap: Dict[str, int] = {}
+            for gram in grams:
+                for candidate in postings.get(gram, ()):
+                    overlap[candidate] = overlap.get(candidate, 0) + 1
+
+            best, best_score = None, 0.0
+            for candidate, shared in overlap.items():
+                score = shared / (len(grams) + len(questions[candidate]) - shared)
+                if score > best_score:
+                    best, best_score = candidate, score
+
+        return best if best_score >= self.similarity_threshold else None
+
+    def _forget(self, partition: Tuple, question: str) -> None:
+        with self._lock:
+            grams = self._questions.get(partition, {}).pop(question, set())
+            postings = self._postings.get(partition, {})
+            for gram in grams:
+                questions = postings.get(gram)
+                if questions is not None:
+                    questions.discard(question)
+                    if not questions:
+                        del postings[gram]
@@ -1,16 +1,68 @@
 # app/main.py
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
 from .core.config import settings
+from .core.registry import ExecutorRegistry, ai_config_from_settings, create_registry
+from .core.metrics import PoolCollector
 from .api import routes
 
 from fastapi.responses import JSONResponse
 from .core.errors import ErrorResponse
 
+
+async def warm_up_data_sources(registry: ExecutorRegistry) -> None:
+    """Warm every data source on the database threads, retrying failures until all are ready."""
+    loop = asyncio.get_running_loop()
+    pending = list(registry.data_sources)
+    while pending:
+        for name in list(pending):
+            try:
+                await loop.run_in_executor(registry.db_executor, functools.partial(
+                    registry.warm_up,
+                    ai_config_from_settings(),
+                    name,
+                    connections=settings.WARM_UP_CONNECTIONS
+                ))
+                pending.remove(name)
+            except Exception as e:
+                # Requests still work meanwhile; they connect on first use
+                print(f"Warm-up of data source '{name}' failed: {str(e)}")
+        if pending:
+            await asyncio.sleep(settings.WARM_UP_RETRY_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Benchmarks may install their own registry (e.g. with mock AI clients) first
+    registry = getattr(app.state, "registry", None) or create_registry()
+    app.state.registry = registry
+    pool_collector = PoolCollector(registry)
+    REGISTRY.register(pool_collector)
+    # Warm up in the background so /healthz answers while /readyz waits for it
+    warm_up = asyncio.create_task(warm_up_data_sources(registry)) if settings.WARM_UP_ON_STARTUP else None
+    try:
+        yield
+    finally:
+        if warm_up is not None:
+            warm_up.cancel()
+        await routes.jobs.shutdown()
+        registry.shutdown()
+        if registry.shared_cache is not None:
+            registry.shared_cache.close()
+        await registry.llm_clients.aclose()
+        REGISTRY.unregister(pool_collector)
+        del app.state.registry
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Set up CORS
@@ -25,6 +77,28 @@ app.add_middleware(
 # Include routers
 app.include_router(routes.router, prefix=settings.API_V1_STR)
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this worker process."""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz(request: Request):
+    """Readiness: every data source has its pools open and its schema cached."""
+    data_sources = request.app.state.registry.readiness()
+    ready = not settings.WARM_UP_ON_STARTUP or all(data_sources.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "warming_up", "data_sources": data_sources}
+    )
+
 
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
@@ -1,5 +1,5 @@
 # app/models/schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 
 class Message(BaseModel):
@@ -9,12 +9,72 @@ class Message(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
+    # Stream rows as NDJSON instead of returning one ChatResponse
+    stream: bool = False
+    # Return one page of results; pass next_cursor back to get the next page
+    page_size: Optional[int] = Field(default=None, ge=1)
+    cursor: Optional[str] = None
+    # Named data source to query; DEFAULT_DATA_SOURCE when omitted
+    data_source: Optional[str] = None
 
 class ChatResponse(BaseModel):
     message: str
     sql: Optional[str] = None
     results: Optional[List[Dict[str, Any]]] = None
     error: Optional[str] = None
+    next_cursor: Optional[str] = None
+    # True when the result hit MAX_RESULT_ROWS and was cut off
+    truncated: bool = False
+    # True when the rows were served from the query result cache
+    cached: bool = False
+
+class BatchRequest(BaseModel):
+    # Identical questions are only generated and executed once
+    questions: List[str] = Field(min_length=1)
+    data_source: Optional[str] = None
+
+class BatchItem(BaseModel):
+    question: str
+    success: bool
+    sql: Optional[str] = None
+    results: Optional[List[Dict[str, Any]]] = None
+    row_count: int = 0
+    truncated: bool = False
+    cached: bool = False
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    # One item per question, in request order
+    results: List[BatchItem]
+
+class JobRequest(BaseModel):
+    message: str
+    conversation_id: Optional[str] = None
+    data_source: Optional[str] = None
+
+class JobResponse(BaseModel):
+    id: str
+    # 'queued', 'running', 'succeeded', 'failed' or 'cancelled'
+    status: str
+    question: str
+    data_source: Optional[str] = None
+    sql: Optional[str] = None
+    columns: Optional[List[str]] = None
+    # Rows fetched and written to the result file so far
+    rows_fetched: int = 0
+    # True when the result hit JOB_MAX_ROWS and was cut off
+    truncated: bool = False
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class JobResultResponse(BaseModel):
+    columns: List[str]
+    rows: List[List[Any]]
+    offset: int
+    # Rows in the whole result, not just this page
+    total_rows: int
 
 class DatabaseConfig(BaseModel):
     type: str
@@ -30,4 +90,5 @@ class AIConfig(BaseModel):
     api_key: str
     model: Optional[str] = None
     temperature: float = 0
-    max_tokens: int = 1000
\ No newline at end of file
+    max_tokens: int = 1000
+    base_url: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""Load-test per-request AI clients against the shared, pooled clients.
+
+Runs against a local mock provider, so no API key or network is needed:
+
+    cd backend
+    python -m benchmarks.bench_llm_clients --provider claude --requests 500 --concurrency 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from app.core.llm_clients import LLMClientPool, create_ai_client
+from app.core.query_executor import AIConfig, AIQueryExecutor
+
+from .mock_provider import MockProviderServer
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _base_url(server: MockProviderServer, provider: str) -> str:
+    # The OpenAI client expects the version prefix in its base URL
+    return server.base_url if provider == "claude" else f"{server.base_url}/v1"
+
+
+async def _drive(make_executor, requests: int, concurrency: int, shared_client=None) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            executor = make_executor()
+            result = await executor.build_query("top 10 customers by revenue")
+            latencies.append(time.perf_counter() - start)
+            if executor.ai_client is not shared_client:
+                await executor.ai_client.close()
+            assert result.get("success"), result.get("message")
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+def _report(label: str, latencies: List[float], connections: int) -> None:
+    print(
+        f"{label:<22} p50={_percentile(latencies, 50) * 1000:7.2f}ms "
+        f"p99={_percentile(latencies, 99) * 1000:7.2f}ms "
+        f"mean={statistics.mean(latencies) * 1000:7.2f}ms "
+        f"connections={connections}"
+    )
+
+
+async def main(provider: str, requests: int, concurrency: int, latency: float) -> None:
+    server = await MockProviderServer(latency=latency).start()
+    config = AIConfig(provider=provider, api_key="mock", model="mock", base_url=_base_url(server, provider))
+
+    try:
+        # Baseline: a fresh client, and therefore a fresh connection pool, per request
+        def per_request() -> AIQueryExecutor:
+            client = create_ai_client(provider, config.api_key, base_url=config.base_url)
+            return AIQueryExecutor(config, None, ai_client=client)
+
+        baseline = await _drive(per_request, requests, concurrency)
+        baseline_connections = server.connections
+
+        pool = LLMClientPool(http2=False, max_concurrency=concurrency)
+        shared_client = pool.get(provider, config.api_key, base_url=config.base_url)
+
+        def shared() -> AIQueryExecutor:
+            return AIQueryExecutor(config, None, ai_client=shared_client, llm_semaphore=pool.semaphore)
+
+        pooled = await _drive(shared, requests, concurrency, shared_client)
+        pooled_connections = server.connections - baseline_connections
+        await pool.aclose()
+    finally:
+        await server.stop()
+
+    _report("per-request clients", baseline, baseline_connections)
+    _report("shared pooled client", pooled, pooled_connections)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provider", choices=["claude", "openai"], default="claude")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="artificial provider latency in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.provider, args.requests, args.concurrency, args.latency))
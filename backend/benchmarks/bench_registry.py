@@ -0,0 +1,83 @@
+"""Compare /chat request throughput with per-request executors vs the shared registry.
+
+The AI call is stubbed out so the numbers reflect only database setup,
+schema reflection and execution. Point the DB_* environment variables at a
+reachable database before running:
+
+    cd backend
+    python -m benchmarks.bench_registry --requests 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.query_executor import AIQueryExecutor
+from app.core.registry import ExecutorRegistry, ai_config_from_settings, db_config_from_settings
+from app.core.config import settings
+
+
+async def _stub_build_query(natural_language: str):
+    return {"success": True, "sql": "SELECT 1"}
+
+
+def _stub(executor: AIQueryExecutor) -> AIQueryExecutor:
+    executor.build_query = _stub_build_query
+    return executor
+
+
+async def _per_request() -> None:
+    # Mirrors the old route: new executor, new pool, full reflection, dispose
+    executor = _stub(AIQueryExecutor(ai_config_from_settings(), db_config_from_settings()))
+    try:
+        result = await executor.execute_query("benchmark")
+        assert result["success"], result.get("error")
+    finally:
+        executor.disconnect()
+
+
+def _shared(registry: ExecutorRegistry):
+    async def run() -> None:
+        executor = _stub(registry.get_executor(ai_config_from_settings(), db_config_from_settings()))
+        result = await executor.execute_query("benchmark")
+        assert result["success"], result.get("error")
+    return run
+
+
+async def _drive(run, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await run()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int, concurrency: int) -> None:
+    baseline = await _drive(_per_request, requests, concurrency)
+
+    registry = ExecutorRegistry(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE
+    )
+    registry.get_executor(ai_config_from_settings(), db_config_from_settings()).connect()
+    try:
+        shared = await _drive(_shared(registry), requests, concurrency)
+    finally:
+        registry.shutdown()
+
+    print(f"per-request executor: {baseline:8.1f} req/s")
+    print(f"shared registry:      {shared:8.1f} req/s")
+    print(f"speedup:              {shared / baseline:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
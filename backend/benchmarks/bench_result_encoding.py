@@ -0,0 +1,67 @@
+"""Compare payload size and serialization time of the result formats.
+
+The baseline is the original path: DataFrame -> to_dict(orient="records")
+-> JSON. It is compared with the compact ``{columns, rows}`` orjson form and
+an Arrow IPC stream built straight from the fetched rows.
+
+    cd backend
+    python -m benchmarks.bench_result_encoding --rows 10000 100000 1000000
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from app.core.result_encoding import encode_arrow_ipc, encode_compact_json
+
+COLUMNS = ["id", "customer", "region", "revenue", "created_at", "active"]
+
+
+def make_rows(count: int):
+    start = datetime(2024, 1, 1)
+    regions = ["north", "south", "east", "west"]
+    return [
+        (i, f"customer_{i}", regions[i % 4], Decimal(i % 10000) / 100, start + timedelta(minutes=i), i % 3 == 0)
+        for i in range(count)
+    ]
+
+
+def baseline(rows) -> bytes:
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    records = df.to_dict(orient="records")
+    # What FastAPI does with response_model=ChatResponse
+    return json.dumps(jsonable_encoder({"results": records})).encode("utf-8")
+
+
+def compact(rows) -> bytes:
+    return encode_compact_json({"columns": COLUMNS, "rows": rows})
+
+
+def arrow(rows) -> bytes:
+    return encode_arrow_ipc(COLUMNS, rows)
+
+
+def measure(encoder, rows):
+    start = time.perf_counter()
+    body = encoder(rows)
+    return len(body), time.perf_counter() - start
+
+
+def main(sizes) -> None:
+    print(f"{'rows':>9}  {'format':<14}{'bytes':>14}{'seconds':>10}")
+    for size in sizes:
+        rows = make_rows(size)
+        for label, encoder in (("records json", baseline), ("compact json", compact), ("arrow ipc", arrow)):
+            length, elapsed = measure(encoder, rows)
+            print(f"{size:>9}  {label:<14}{length:>14,}{elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    main(args.rows)
@@ -0,0 +1,132 @@
+"""Compare prompt size, build time and end-to-end latency for the full schema vs pruned schemas.
+
+    cd backend
+    python -m benchmarks.bench_schema_pruning --tables 2000
+
+End-to-end requests run through ``execute_query`` against a SQLite fixture
+database with a mock AI provider. The provider's latency grows with the
+prompt (``--prompt-latency`` seconds per 1000 prompt tokens, like a real
+model's prefill), which is where a smaller prompt pays off.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from app.core.query_executor import AIConfig, AIQueryExecutor, DatabaseConfig
+from app.core.schema_cache import SchemaCache
+from app.core.schema_retrieval import SchemaPruningConfig, estimate_tokens
+
+from .fixture_db import build_fixture_database, build_workload
+from .mock_clients import MockProvider, create_mock_client
+
+QUESTIONS = [
+    "top 10 customers by revenue this month",
+    "how many orders shipped late per warehouse",
+    "total refund amount by product category",
+    "which suppliers have the most open invoices",
+    "average ticket resolution time per department",
+]
+
+
+def _measure(executor: AIQueryExecutor, repeats: int):
+    tokens, timings = [], []
+    for question in QUESTIONS:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            prompt = executor._get_system_prompt(question)
+            timings.append(time.perf_counter() - start)
+        tokens.append(estimate_tokens(prompt))
+    return statistics.mean(tokens), statistics.median(timings)
+
+
+async def _measure_end_to_end(executor: AIQueryExecutor, questions, repeats: int) -> float:
+    """Median seconds per answered question, from the question to its rows."""
+    timings = []
+    for question in questions:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = await executor.execute_query(question)
+            timings.append(time.perf_counter() - start)
+            if not result["success"]:
+                raise RuntimeError(f"{question!r} failed: {result['error']}")
+    return statistics.median(timings)
+
+
+def main(
+        table_count: int,
+        top_k: int,
+        budget: int,
+        repeats: int,
+        questions: int,
+        latency: float,
+        prompt_latency: float
+) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "fixture.db")
+        schema = build_fixture_database(db_path, table_count, rows=20)
+        workload = build_workload(schema, questions)
+        sql_for = dict(workload)
+        provider = MockProvider(
+            lambda question: sql_for.get(question, "SELECT 1"),
+            latency=latency,
+            prompt_latency=prompt_latency
+        )
+        config = AIConfig(provider="openai", api_key="unused", model="benchmark")
+        db_config = DatabaseConfig(type="sqlite", host="", port=0, user="", password="", database=db_path)
+        # Both executors share the reflected schema
+        schema_cache = SchemaCache(ttl=3600)
+
+        full = AIQueryExecutor(
+            config, db_config, schema_cache=schema_cache,
+            ai_client=create_mock_client("openai", provider)
+        )
+        full.connect()
+        pruned = AIQueryExecutor(
+            config, db_config, engine=full.engine, schema_cache=schema_cache,
+            ai_client=create_mock_client("openai", provider),
+            schema_pruning=SchemaPruningConfig(top_k=top_k, min_tables=0, token_budget=budget)
+        )
+        pruned.connect()
+        # Index construction happens once per schema version; keep it out of the loop
+        start = time.perf_counter()
+        pruned.get_schema_index()
+        index_time = time.perf_counter() - start
+
+        try:
+            full_tokens, full_time = _measure(full, repeats)
+            pruned_tokens, pruned_time = _measure(pruned, repeats)
+            asked = [question for question, _ in workload]
+            full_latency = asyncio.run(_measure_end_to_end(full, asked, repeats))
+            pruned_latency = asyncio.run(_measure_end_to_end(pruned, asked, repeats))
+        finally:
+            pruned.disconnect()
+            # Disposes the engine both executors use
+            full.disconnect()
+
+    print(f"tables: {table_count}, index build: {index_time * 1000:.1f}ms")
+    print(
+        f"full schema:   {full_tokens:10.0f} prompt tokens  {full_time * 1000:8.2f}ms to build"
+        f"  {full_latency * 1000:8.1f}ms end to end"
+    )
+    print(
+        f"pruned schema: {pruned_tokens:10.0f} prompt tokens  {pruned_time * 1000:8.2f}ms to build"
+        f"  {pruned_latency * 1000:8.1f}ms end to end"
+    )
+    print(f"token reduction: {full_tokens / pruned_tokens:.1f}x, latency reduction: {full_latency / pruned_latency:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--budget", type=int, default=4000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=20, help="distinct questions asked end to end")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock provider base latency in seconds")
+    parser.add_argument("--prompt-latency", type=float, default=0.1,
+                        help="mock provider seconds per 1000 prompt tokens")
+    args = parser.parse_args()
+    main(args.tables, args.top_k, args.budget, args.repeats, args.questions, args.latency, args.prompt_latency)
@@ -0,0 +1,136 @@
+"""Compare the regex validator with the parse-based one on generated queries.
+
+    cd backend
+    python -m benchmarks.bench_sql_validation --tables 500 --queries 2000
+
+Each generated query either references only real tables and columns or
+has exactly one invalid reference planted in it, so both speed and the
+number of wrong verdicts are reported.
+"""
+import argparse
+import random
+import re
+import time
+from typing import Dict, List, Tuple
+
+from app.core.sql_validation import SQLValidator, is_read_only
+
+from .fixtures import make_schema
+
+
+def legacy_validate(schema: Dict, sql: str) -> Dict:
+    """The regex validator this replaced, kept for comparison."""
+    issues = []
+    table_pattern = r"FROM\s+(\w+)|JOIN\s+(\w+)"
+    column_pattern = r"SELECT\s+(.+?)\s+FROM|WHERE\s+(.+?)\s+(?:GROUP|ORDER|LIMIT|$)|GROUP BY\s+(.+?)\s+(?:ORDER|LIMIT|$)|ORDER BY\s+(.+?)\s+(?:LIMIT|$)"
+    for match in re.finditer(table_pattern, sql, re.IGNORECASE):
+        table_name = match.group(1) or match.group(2)
+        if table_name not in schema["tables"]:
+            issues.append(f"Invalid table reference: {table_name}")
+    for match in re.finditer(column_pattern, sql, re.IGNORECASE):
+        columns = match.group(1) or match.group(2) or match.group(3) or match.group(4)
+        if columns and columns != '*':
+            for col in columns.split(','):
+                column_name = col.strip().split('.')[-1]
+                if not any(
+                        any(c["name"] == column_name for c in table_cols)
+                        for table_cols in schema["tables"].values()
+                ):
+                    issues.append(f"Invalid column reference: {column_name}")
+    return {"isValid": len(issues) == 0, "issues": issues}
+
+
+def legacy_is_unsafe(sql: str) -> bool:
+    unsafe_patterns = [
+        r"DROP\s+", r"DELETE\s+WITHOUT\s+WHERE", r"UPDATE\s+WITHOUT\s+WHERE",
+        r"TRUNCATE\s+", r"ALTER\s+", r"GRANT\s+", r"REVOKE\s+"
+    ]
+    return any(re.search(pattern, sql, re.IGNORECASE) for pattern in unsafe_patterns)
+
+
+def _column(rng: random.Random, schema: Dict, table: str) -> str:
+    return rng.choice(schema["tables"][table])["name"]
+
+
+def generate_queries(schema: Dict, count: int, seed: int = 11) -> List[Tuple[str, bool]]:
+    """Return ``(sql, is_valid)`` pairs covering joins, CTEs and subqueries."""
+    rng = random.Random(seed)
+    children = {rel["table1"]: rel for rel in schema["relationships"]}
+    tables = list(children)
+    queries = []
+    for i in range(count):
+        child = rng.choice(tables)
+        rel = children[child]
+        parent = rel["table2"]
+        a, b = _column(rng, schema, child), _column(rng, schema, parent)
+        valid = rng.random() < 0.7
+        bad = "no_such_column" if not valid else None
+        shape = i % 4
+        if shape == 0:
+            sql = (
+                f"SELECT c.{a}, p.{bad or b} FROM {child} c "
+                f"JOIN {parent} p ON c.{rel['keys'][child]} = p.id "
+                f"WHERE c.id > 10 ORDER BY c.id LIMIT 50"
+            )
+        elif shape == 1:
+            sql = (
+                f"WITH recent AS (SELECT id, {a} AS value FROM {child} WHERE id > 100) "
+                f"SELECT r.{'missing' if bad else 'value'}, count(*) AS n FROM recent r "
+                f"GROUP BY r.value ORDER BY n DESC"
+            )
+        elif shape == 2:
+            sql = (
+                f"SELECT id, {a} FROM {child} c "
+                f"WHERE c.{rel['keys'][child]} IN (SELECT id FROM {parent} WHERE {bad or b} IS NOT NULL)"
+            )
+        else:
+            table = "no_such_table" if bad else parent
+            sql = f"SELECT {b}, max(id) AS top FROM {table} GROUP BY {b}"
+        queries.append((sql, valid))
+    return queries
+
+
+UNSAFE_QUERIES = [
+    "DELETE FROM customer",
+    "UPDATE customer SET id = 1",
+    "INSERT INTO customer (id) VALUES (1)",
+    "WITH gone AS (DELETE FROM customer RETURNING *) SELECT * FROM gone",
+    "SELECT * INTO customer_copy FROM customer",
+    "SELECT 1; DROP TABLE customer",
+    "drop table customer",
+]
+
+
+def _run(label: str, validate, queries: List[Tuple[str, bool]]) -> None:
+    wrong = 0
+    start = time.perf_counter()
+    for sql, valid in queries:
+        if validate(sql)["isValid"] != valid:
+            wrong += 1
+    elapsed = time.perf_counter() - start
+    print(f"{label:8} {elapsed / len(queries) * 1e6:8.1f}us/query  {wrong:5d} wrong verdicts of {len(queries)}")
+
+
+def main(table_count: int, query_count: int) -> None:
+    schema = make_schema(table_count)
+    queries = generate_queries(schema, query_count)
+
+    start = time.perf_counter()
+    validator = SQLValidator(schema, "postgres")
+    print(f"tables: {table_count}, index build: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    _run("regex", lambda sql: legacy_validate(schema, sql), queries)
+    _run("sqlglot", validator.validate, queries)
+
+    missed_legacy = sum(not legacy_is_unsafe(sql) for sql in UNSAFE_QUERIES)
+    missed_parsed = sum(is_read_only(sql, "postgres") for sql in UNSAFE_QUERIES)
+    print(f"writes not blocked: regex {missed_legacy}/{len(UNSAFE_QUERIES)}, "
+          f"sqlglot {missed_parsed}/{len(UNSAFE_QUERIES)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.tables, args.queries)
@@ -0,0 +1,183 @@
+"""Measure cold start: import time of the app, and time until a fresh server answers.
+
+    cd backend
+    python -m benchmarks.bench_startup --runs 5 --save-baseline startup.json
+    python -m benchmarks.bench_startup --runs 5 --baseline startup.json
+
+Each run starts a new Python process, so nothing is cached in memory between
+runs. ``import_ms`` is the time to import ``app.main``. The server runs
+under uvicorn against a generated SQLite database and a local mock AI
+provider. ``healthz_ms``, ``readyz_ms`` and ``first_request_ms`` are
+measured from process start to the first successful /healthz, to /readyz
+reporting ready, and to the first /chat response.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from .fixture_db import build_fixture_database
+from .load_test import compare
+from .mock_provider import MockProviderServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported once a request needs them
+LAZY_MODULES = ("anthropic", "openai", "httpx", "pandas", "pyarrow", "redis")
+
+# Metrics compared against a baseline; lower is better for all of them
+_COMPARED = {
+    "import_ms": False,
+    "healthz_ms": False,
+    "readyz_ms": False,
+    "first_request_ms": False,
+}
+
+_IMPORT_PROBE = (
+    "import sys, time, json\n"
+    "start = time.perf_counter()\n"
+    "import app.main\n"
+    "elapsed = time.perf_counter() - start\n"
+    f"print(json.dumps({{'ms': elapsed * 1000, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+)
+
+
+def _environment(db_path: str, provider_url: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "ENVIRONMENT": "development",
+        "DB_TYPE": "sqlite",
+        "DB_HOST": "",
+        "DB_PORT": "0",
+        "DB_USER": "",
+        "DB_PASSWORD": "",
+        "DB_NAME": db_path,
+        "AI_PROVIDER": "claude",
+        "AI_API_KEY": "mock",
+        "AI_MODEL": "mock",
+        "AI_BASE_URL": provider_url,
+        "AI_HTTP2": "false",
+        "WARM_UP_ON_STARTUP": "true",
+    })
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env: Dict[str, str]) -> Dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+async def _poll(client, method: str, url: str, started: float, timeout: float, **kwargs) -> float:
+    """Milliseconds from ``started`` until ``url`` answers 200."""
+    import httpx
+
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code == 200:
+                return (time.perf_counter() - started) * 1000
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.01)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+async def measure_server(env: Dict[str, str], question: str, timeout: float) -> Dict:
+    import httpx
+
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            healthz = await _poll(client, "GET", f"{base}/healthz", started, timeout)
+            readyz = await _poll(client, "GET", f"{base}/readyz", started, timeout)
+            first_request = await _poll(
+                client, "POST", f"{base}/api/v1/chat", started, timeout, json={"message": question}
+            )
+    finally:
+        process.terminate()
+        process.wait()
+    return {"healthz_ms": healthz, "readyz_ms": readyz, "first_request_ms": first_request}
+
+
+async def run(args: argparse.Namespace, db_path: str) -> Dict:
+    build_fixture_database(db_path, args.tables, args.rows)
+    server = await MockProviderServer().start()
+    try:
+        env = _environment(db_path, server.base_url)
+        imports, servers, loaded = [], [], set()
+        for _ in range(args.runs):
+            probe = await asyncio.to_thread(measure_import, env)
+            imports.append(probe["ms"])
+            loaded.update(probe["loaded"])
+            servers.append(await measure_server(env, "How many rows are there?", args.timeout))
+    finally:
+        await server.stop()
+
+    result = {"import_ms": round(statistics.median(imports), 1)}
+    for metric in ("healthz_ms", "readyz_ms", "first_request_ms"):
+        result[metric] = round(statistics.median(run[metric] for run in servers), 1)
+    result["eagerly_loaded"] = sorted(loaded)
+    result["config"] = {"tables": args.tables, "rows": args.rows, "runs": args.runs}
+    return result
+
+
+def main(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        result = asyncio.run(run(args, os.path.join(tmp, "fixture.db")))
+
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            print("warning: baseline was recorded with a different configuration")
+        print(f"compared with {args.baseline}:")
+        if compare(result, baseline, args.tolerance, metrics=_COMPARED):
+            return 1
+    return 0
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=100, help="rows per table")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for each endpoint")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative regression before failing")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(_parse_args()))
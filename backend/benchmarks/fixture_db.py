@@ -0,0 +1,116 @@
+"""Generate a SQLite fixture database and a matching question workload."""
+import random
+import sqlite3
+from typing import Dict, List, Tuple
+
+from .fixtures import make_schema
+
+_SQLITE_TYPES = {
+    "INTEGER": "INTEGER",
+    "VARCHAR(255)": "TEXT",
+    "NUMERIC(12, 2)": "REAL",
+    "TIMESTAMP": "TEXT",
+    "BOOLEAN": "INTEGER",
+    "TEXT": "TEXT",
+}
+
+
+# Fixture table names that are SQL keywords, and what to call them instead
+_RESERVED = {"order": "orders"}
+
+
+def _rename_reserved(schema: Dict) -> Dict:
+    def rename(name: str) -> str:
+        return _RESERVED.get(name, name)
+
+    return {
+        "tables": {rename(name): columns for name, columns in schema["tables"].items()},
+        "relationships": [
+            {
+                **rel,
+                "table1": rename(rel["table1"]),
+                "table2": rename(rel["table2"]),
+                "keys": {rename(table): key for table, key in rel["keys"].items()}
+            }
+            for rel in schema["relationships"]
+        ]
+    }
+
+
+def _value(rng: random.Random, column_type: str, row: int):
+    if column_type == "INTEGER":
+        return rng.randint(0, 10000)
+    if column_type == "NUMERIC(12, 2)":
+        return round(rng.uniform(0, 5000), 2)
+    if column_type == "TIMESTAMP":
+        return f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00"
+    if column_type == "BOOLEAN":
+        return rng.randint(0, 1)
+    return f"value-{row % 97}-{rng.randint(0, 999)}"
+
+
+def build_fixture_database(path: str, tables: int, rows: int, seed: int = 7) -> Dict:
+    """Create ``tables`` tables of ``rows`` rows each at ``path``.
+
+    Returns the schema dict in the ``make_schema`` shape. Every table has an
+    integer primary key ``id`` and a foreign key column to an earlier table.
+    """
+    schema = _rename_reserved(make_schema(tables, seed=seed))
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    try:
+        with conn:
+            for name, columns in schema["tables"].items():
+                definitions = ", ".join(
+                    f"{col['name']} {'INTEGER PRIMARY KEY' if col['name'] == 'id' else _SQLITE_TYPES[col['type']]}"
+                    for col in columns
+                )
+                conn.execute(f"DROP TABLE IF EXISTS {name}")
+                conn.execute(f"CREATE TABLE {name} ({definitions})")
+                placeholders = ", ".join("?" for _ in columns)
+                conn.executemany(
+                    f"INSERT INTO {name} VALUES ({placeholders})",
+                    (
+                        [row + 1 if col["name"] == "id" else _value(rng, col["type"], row) for col in columns]
+                        for row in range(rows)
+                    )
+                )
+    finally:
+        conn.close()
+    return schema
+
+
+def build_workload(schema: Dict, size: int, seed: int = 7) -> List[Tuple[str, str]]:
+    """Return ``size`` distinct ``(question, sql)`` pairs over the fixture tables.
+
+    The mix covers point lookups, top-N scans, aggregates and joins along
+    the foreign keys.
+    """
+    rng = random.Random(seed)
+    relationships = schema["relationships"]
+    workload = []
+    for i in range(size):
+        rel = relationships[rng.randrange(len(relationships))]
+        child, parent = rel["table1"], rel["table2"]
+        column = rng.choice(schema["tables"][child][1:-1])["name"]
+        shape = i % 4
+        if shape == 0:
+            question = f"show {child} number {i}"
+            sql = f"SELECT * FROM {child} WHERE id = {rng.randint(1, 1000)}"
+        elif shape == 1:
+            question = f"top 20 {child} by {column} ({i})"
+            sql = f"SELECT id, {column} FROM {child} ORDER BY {column} DESC LIMIT 20"
+        elif shape == 2:
+            question = f"how many {child} per {parent} ({i})"
+            sql = (
+                f"SELECT {rel['keys'][child]}, COUNT(*) AS n FROM {child} "
+                f"GROUP BY {rel['keys'][child]} ORDER BY n DESC LIMIT 50"
+            )
+        else:
+            question = f"{child} with their {parent} ({i})"
+            sql = (
+                f"SELECT c.id, c.{column}, p.id AS parent_id FROM {child} c "
+                f"JOIN {parent} p ON c.{rel['keys'][child]} = p.id LIMIT 100"
+            )
+        workload.append((question, sql))
+    return workload
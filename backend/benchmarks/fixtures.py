@@ -0,0 +1,39 @@
+"""Synthetic schemas for benchmarks that do not need a live database."""
+import random
+from typing import Dict
+
+_NOUNS = [
+    "customer", "order", "product", "invoice", "payment", "shipment", "supplier",
+    "warehouse", "employee", "department", "region", "store", "campaign", "refund",
+    "subscription", "account", "ticket", "review", "category", "inventory",
+]
+_COLUMN_TYPES = ["INTEGER", "VARCHAR(255)", "NUMERIC(12, 2)", "TIMESTAMP", "BOOLEAN", "TEXT"]
+
+
+def make_schema(table_count: int, columns_per_table: int = 12, seed: int = 7) -> Dict:
+    """Build a schema dict shaped like ``AIQueryExecutor.schema``.
+
+    Every table after the first gets a foreign key to an earlier table, so
+    the relationship graph is connected like a typical warehouse.
+    """
+    rng = random.Random(seed)
+    tables, relationships = {}, []
+    names = []
+    for i in range(table_count):
+        name = f"{_NOUNS[i % len(_NOUNS)]}_{i // len(_NOUNS)}" if i >= len(_NOUNS) else _NOUNS[i]
+        columns = [{"name": "id", "type": "INTEGER"}]
+        for j in range(columns_per_table - 1):
+            noun = rng.choice(_NOUNS)
+            columns.append({"name": f"{noun}_attr_{j}", "type": rng.choice(_COLUMN_TYPES)})
+        if names:
+            parent = rng.choice(names)
+            columns.append({"name": f"{parent}_id", "type": "INTEGER"})
+            relationships.append({
+                "table1": name,
+                "table2": parent,
+                "type": "foreignKey",
+                "keys": {name: f"{parent}_id", parent: "id"}
+            })
+        tables[name] = columns
+        names.append(name)
+    return {"tables": tables, "relationships": relationships}
@@ -0,0 +1,215 @@
+"""Load-test the whole /chat path offline: mock AI provider, SQLite fixture database.
+
+    cd backend
+    python -m benchmarks.load_test --tables 50 --rows 5000 --requests 2000 --concurrency 32
+    python -m benchmarks.load_test --save-baseline baseline.json
+    python -m benchmarks.load_test --baseline baseline.json
+
+Requests go through the FastAPI app in-process (ASGI transport), so the
+numbers include routing, validation, SQL generation, execution and
+serialization but no network. With ``--baseline`` the run is compared
+against an earlier ``--save-baseline`` file and exits non-zero when a
+metric regressed by more than ``--tolerance``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from .fixture_db import build_fixture_database, build_workload
+from .mock_clients import MockProvider, create_mock_client
+
+# Metrics compared against a baseline, and whether higher is better
+_COMPARED = {
+    "throughput": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+
+def _configure_environment(db_path: str, provider: str, caches: bool, shared_cache: str = "none") -> None:
+    """Point the app settings at the fixture; must run before importing the app."""
+    if shared_cache == "sqlite":
+        os.environ["SHARED_CACHE_PATH"] = db_path + ".cache"
+    elif shared_cache == "redis":
+        from .mock_redis import start_in_thread
+        os.environ["SHARED_CACHE_REDIS_URL"] = start_in_thread().url
+    os.environ.update({
+        "ENVIRONMENT": "development",  # skips API key checks
+        "DB_TYPE": "sqlite",
+        "DB_HOST": "",
+        "DB_PORT": "0",
+        "DB_USER": "",
+        "DB_PASSWORD": "",
+        "DB_NAME": db_path,
+        "AI_PROVIDER": provider,
+        "AI_API_KEY": "mock",
+        "AI_MODEL": "mock",
+        "WARM_UP_ON_STARTUP": "true",
+        "SQL_CACHE_ENABLED": str(caches).lower(),
+        "RESULT_CACHE_ENABLED": str(caches).lower(),
+        "COALESCE_REQUESTS": str(caches).lower(),
+        "SHARED_CACHE_BACKEND": shared_cache,
+        # Every request comes from one client, which admission control would throttle
+        "RATE_LIMIT_ENABLED": "false",
+    })
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def _drive(app, questions: List[str], requests: int, concurrency: int) -> Dict:
+    import httpx
+
+    latencies: List[float] = []
+    errors = 0
+    next_request = 0
+
+    async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://bench",
+            timeout=None
+    ) as client:
+        async def worker() -> None:
+            nonlocal errors, next_request
+            while next_request < requests:
+                question = questions[next_request % len(questions)]
+                next_request += 1
+                start = time.perf_counter()
+                response = await client.post("/api/v1/chat", json={"message": question})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput": round(requests / duration, 2),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+    }
+
+
+async def run(args: argparse.Namespace, db_path: str) -> Dict:
+    schema = build_fixture_database(db_path, args.tables, args.rows)
+    workload = build_workload(schema, args.distinct or args.requests)
+    sql_for = dict(workload)
+
+    _configure_environment(db_path, args.provider, args.caches, args.shared_cache)
+    # Imported late: the settings are read from the environment at import time
+    from app.core.registry import create_registry
+    from app.main import app
+
+    provider = MockProvider(
+        lambda question: sql_for.get(question, "SELECT 1"),
+        latency=args.latency,
+        jitter=args.jitter
+    )
+    registry = create_registry()
+    registry.llm_clients.register(args.provider, "mock", create_mock_client(args.provider, provider))
+    app.state.registry = registry
+
+    async with app.router.lifespan_context(app):
+        # Warm-up runs in the background; start measuring once the app is ready
+        while not all(registry.readiness().values()):
+            await asyncio.sleep(0.01)
+        result = await _drive(app, [question for question, _ in workload], args.requests, args.concurrency)
+
+    result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    result["llm_calls"] = provider.calls
+    result["config"] = {
+        "provider": args.provider,
+        "tables": args.tables,
+        "rows": args.rows,
+        "concurrency": args.concurrency,
+        "latency": args.latency,
+        "caches": args.caches,
+        "shared_cache": args.shared_cache,
+        "distinct": args.distinct or args.requests,
+    }
+    return result
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float, metrics: Optional[Dict[str, bool]] = None) -> List[str]:
+    """Print each compared metric against the baseline; return the regressions."""
+    regressions = []
+    for metric, higher_is_better in (metrics or _COMPARED).items():
+        old, new = baseline.get(metric), result.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        print(f"  {metric:<12} {old:>10} -> {new:>10} ({change:+.1%}) {flag}")
+        if flag:
+            regressions.append(metric)
+    return regressions
+
+
+def main(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db_path or os.path.join(tmp, "fixture.db")
+        result = asyncio.run(run(args, db_path))
+
+    print(json.dumps(result, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != result["config"]:
+            print("warning: baseline was recorded with a different configuration")
+        print(f"compared with {args.baseline}:")
+        if compare(result, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+def _parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provider", choices=["claude", "openai"], default="claude")
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=5000, help="rows per table")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="distinct questions to cycle through (default: one per request)")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock provider latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, seeded")
+    parser.add_argument("--caches", action="store_true",
+                        help="enable translation/result caches and request coalescing")
+    parser.add_argument("--shared-cache", choices=["none", "sqlite", "redis"], default="none",
+                        help="cache tier shared by workers; 'redis' starts a local mock server")
+    parser.add_argument("--db-path", help="keep the fixture database at this path")
+    parser.add_argument("--save-baseline")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative regression before failing")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(_parse_args()))
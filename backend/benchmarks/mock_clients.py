@@ -0,0 +1,167 @@
+"""In-process stand-ins for the Anthropic and OpenAI async clients.
+
+They implement the parts of ``AsyncAnthropic`` and ``AsyncOpenAI`` the
+executor uses (``messages.create``/``messages.stream`` and
+``chat.completions.create``, streaming or not) without any network I/O.
+Completions are deterministic: ``responder`` maps the user message to SQL,
+and latency is a fixed delay plus seeded jitter, plus optionally a delay per
+prompt token, so two runs with the same arguments see the same provider
+behavior.
+"""
+import asyncio
+import json
+import random
+from types import SimpleNamespace
+from typing import AsyncIterator, Callable, List
+
+# Characters per streamed chunk, roughly one token
+_CHUNK_SIZE = 4
+
+
+def _text(content) -> str:
+    """Message or system content: a string or a list of text blocks."""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content or [])
+
+
+def _prompt_tokens(messages: List[dict], system=None) -> int:
+    chars = len(_text(system)) + sum(len(_text(message["content"])) for message in messages)
+    return chars // _CHUNK_SIZE
+
+
+class MockProvider:
+    """Shared behavior: completion text, latency and call accounting."""
+
+    def __init__(
+            self,
+            responder: Callable[[str], str],
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            seed: int = 0,
+            prompt_latency: float = 0.0
+    ):
+        self.responder = responder
+        self.latency = latency
+        self.jitter = jitter
+        # Seconds per 1000 prompt tokens, like a provider's prefill time
+        self.prompt_latency = prompt_latency
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def completion(self, messages: List[dict]) -> str:
+        question = messages[-1]["content"]
+        return json.dumps({
+            "sql": self.responder(question),
+            "explanation": f"Answers: {question}",
+            "validation": {"isValid": True, "issues": []}
+        })
+
+    async def wait(self, messages: List[dict], system=None) -> None:
+        self.calls += 1
+        delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+        if self.prompt_latency:
+            delay += self.prompt_latency * _prompt_tokens(messages, system) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def chunks(text: str) -> List[str]:
+        return [text[i:i + _CHUNK_SIZE] for i in range(0, len(text), _CHUNK_SIZE)]
+
+
+class _AnthropicStream:
+    def __init__(self, provider: MockProvider, text: str, messages: List[dict], system=None):
+        self._provider = provider
+        self._text = text
+        self._messages = messages
+        self._system = system
+        self.text_stream = self._stream()
+
+    async def get_final_message(self):
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=self._text)],
+            usage=SimpleNamespace(input_tokens=100, output_tokens=len(self._text) // 4)
+        )
+
+    async def _stream(self) -> AsyncIterator[str]:
+        for chunk in self._provider.chunks(self._text):
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def __aenter__(self) -> "_AnthropicStream":
+        await self._provider.wait(self._messages, self._system)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.text_stream.aclose()
+
+
+class _AnthropicMessages:
+    def __init__(self, provider: MockProvider):
+        self._provider = provider
+
+    async def create(self, *, messages: List[dict], system=None, **kwargs):
+        await self._provider.wait(messages, system)
+        text = self._provider.completion(messages)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text=text)],
+            usage=SimpleNamespace(input_tokens=100, output_tokens=len(text) // 4)
+        )
+
+    def stream(self, *, messages: List[dict], system=None, **kwargs) -> _AnthropicStream:
+        return _AnthropicStream(self._provider, self._provider.completion(messages), messages, system)
+
+
+class MockAnthropicClient:
+    """Implements ``AsyncAnthropic().messages``."""
+
+    def __init__(self, provider: MockProvider):
+        self.messages = _AnthropicMessages(provider)
+
+    async def close(self) -> None:
+        pass
+
+
+class _OpenAICompletions:
+    def __init__(self, provider: MockProvider):
+        self._provider = provider
+
+    async def create(self, *, messages: List[dict], stream: bool = False, **kwargs):
+        await self._provider.wait(messages)
+        text = self._provider.completion(messages)
+        if stream:
+            stream_options = kwargs.get("extra_body", {}).get("stream_options", {})
+            return self._stream(text, stream_options.get("include_usage", False))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=text))],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=len(text) // 4)
+        )
+
+    async def _stream(self, text: str, include_usage: bool):
+        for chunk in self._provider.chunks(text):
+            await asyncio.sleep(0)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))], usage=None)
+        if include_usage:
+            # As with stream_options={"include_usage": True}: a last chunk with only usage
+            yield SimpleNamespace(
+                choices=[],
+                usage={"prompt_tokens": 100, "completion_tokens": len(text) // 4, "total_tokens": 100 + len(text) // 4}
+            )
+
+
+class MockOpenAIClient:
+    """Implements ``AsyncOpenAI().chat.completions``."""
+
+    def __init__(self, provider: MockProvider):
+        self.chat = SimpleNamespace(completions=_OpenAICompletions(provider))
+
+    async def close(self) -> None:
+        pass
+
+
+def create_mock_client(provider_name: str, provider: MockProvider):
+    """Return the mock client for 'claude' or 'openai'."""
+    if provider_name == "claude":
+        return MockAnthropicClient(provider)
+    return MockOpenAIClient(provider)
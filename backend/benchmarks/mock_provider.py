@@ -0,0 +1,117 @@
+"""A tiny keep-alive HTTP server that mimics the Anthropic and OpenAI APIs.
+
+It answers ``POST /v1/messages`` and ``POST /v1/chat/completions`` with a fixed
+SQL completion after an optional artificial delay, so client-side overhead
+can be measured without network access or API keys.
+"""
+import asyncio
+import json
+from typing import Optional, Tuple
+
+DEFAULT_COMPLETION = json.dumps({
+    "sql": "SELECT 1",
+    "explanation": "Mock completion",
+    "validation": {"isValid": True, "issues": []}
+})
+
+
+def _anthropic_body(completion: str) -> dict:
+    return {
+        "id": "msg_mock",
+        "type": "message",
+        "role": "assistant",
+        "model": "mock",
+        "content": [{"type": "text", "text": completion}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 100, "output_tokens": 20}
+    }
+
+
+def _openai_body(completion: str) -> dict:
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "mock",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": completion},
+            "finish_reason": "stop"
+        }],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}
+    }
+
+
+class MockProviderServer:
+    """Serve mock completions on 127.0.0.1 until ``stop`` is awaited."""
+
+    def __init__(self, latency: float = 0.0, completion: str = DEFAULT_COMPLETION):
+        self.latency = latency
+        self.completion = completion
+        self.connections = 0
+        self.requests = 0
+        self._writers = set()
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self) -> "MockProviderServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self) -> None:
+        self._server.close()
+        # wait_closed() also waits for open keep-alive connections
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, bytes]:
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        path = lines[0].split(" ")[1]
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        body = await reader.readexactly(length) if length else b""
+        return path, body
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    path, _ = await self._read_request(reader)
+                except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+                    break
+
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                if path.endswith("/messages"):
+                    payload = _anthropic_body(self.completion)
+                else:
+                    payload = _openai_body(self.completion)
+                body = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Connection: keep-alive\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+                    + body
+                )
+                await writer.drain()
+        finally:
+            self._writers.discard(writer)
+            writer.close()
@@ -0,0 +1,276 @@
+"""A tiny in-memory server speaking enough of the Redis protocol for the shared cache.
+
+It implements the commands the Redis cache backend, invalidation bus and
+conversation store use (strings with expiry, sets, sorted sets, lists,
+SCAN, pub/sub and MULTI/EXEC pipelines), so multi-worker caching can be
+exercised without a Redis installation. Several worker processes can share
+one instance through ``url``.
+"""
+import asyncio
+import fnmatch
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, Exception):
+        return b"-ERR " + str(value).encode("utf-8") + b"\r\n"
+    if isinstance(value, str) and value in ("OK", "QUEUED", "PONG"):
+        return b"+" + value.encode("ascii") + b"\r\n"
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    if isinstance(value, float):
+        value = repr(value)
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return b"$%d\r\n" % len(value) + value + b"\r\n"
+
+
+class MockRedisServer:
+    """Serve one shared keyspace on 127.0.0.1 until ``stop`` is awaited."""
+
+    def __init__(self):
+        self.data: Dict[bytes, object] = {}
+        self.expires: Dict[bytes, float] = {}
+        self.commands = 0
+        self._channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self._writers = set()
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    async def start(self) -> "MockRedisServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self) -> None:
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> List[bytes]:
+        header = await reader.readline()
+        if not header:
+            raise asyncio.IncompleteReadError(b"", None)
+        count = int(header[1:])
+        args = []
+        for _ in range(count):
+            length = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        queued: Optional[List[List[bytes]]] = None
+        try:
+            while True:
+                try:
+                    args = await self._read_command(reader)
+                except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+                    break
+                self.commands += 1
+                name = args[0].upper()
+                if name == b"MULTI":
+                    queued = []
+                    reply = "OK"
+                elif name == b"EXEC":
+                    reply = [self._execute(command) for command in queued or []]
+                    queued = None
+                elif queued is not None:
+                    queued.append(args)
+                    reply = "QUEUED"
+                elif name in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+                    self._subscription(name, args[1:], writer)
+                    await writer.drain()
+                    continue
+                else:
+                    reply = self._execute(args)
+                writer.write(_encode(reply))
+                await writer.drain()
+        finally:
+            for subscribers in self._channels.values():
+                subscribers.discard(writer)
+            self._writers.discard(writer)
+            writer.close()
+
+    def _subscription(self, name: bytes, channels: List[bytes], writer: asyncio.StreamWriter) -> None:
+        for channel in channels:
+            subscribers = self._channels.setdefault(channel, set())
+            if name == b"SUBSCRIBE":
+                subscribers.add(writer)
+            else:
+                subscribers.discard(writer)
+            count = sum(writer in members for members in self._channels.values())
+            writer.write(_encode([name.lower(), channel, count]))
+
+    def _live(self, key: bytes) -> Optional[object]:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _delete(self, key: bytes) -> int:
+        self.expires.pop(key, None)
+        return int(self.data.pop(key, None) is not None)
+
+    def _execute(self, args: List[bytes]):
+        name, args = args[0].upper().decode("ascii"), args[1:]
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            return Exception(f"unknown command '{name}'")
+        try:
+            return handler(*args)
+        except Exception as e:
+            return e
+
+    def _cmd_ping(self, *args):
+        return "PONG"
+
+    def _cmd_client(self, *args):
+        return "OK"
+
+    def _cmd_select(self, *args):
+        return "OK"
+
+    def _cmd_get(self, key):
+        value = self._live(key)
+        return value if isinstance(value, bytes) or value is None else Exception("WRONGTYPE")
+
+    def _cmd_set(self, key, value, *options):
+        self._delete(key)
+        self.data[key] = value
+        options = [option.upper() for option in options]
+        for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+            if unit in options:
+                self.expires[key] = time.time() + int(options[options.index(unit) + 1]) * scale
+        return "OK"
+
+    def _cmd_del(self, *keys):
+        return sum(self._delete(key) for key in keys)
+
+    def _cmd_exists(self, *keys):
+        return sum(self._live(key) is not None for key in keys)
+
+    def _cmd_expire(self, key, seconds):
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = time.time() + int(seconds)
+        return 1
+
+    def _cmd_pexpire(self, key, milliseconds):
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = time.time() + int(milliseconds) / 1000
+        return 1
+
+    def _cmd_sadd(self, key, *members):
+        members_set = self._live(key)
+        if members_set is None:
+            members_set = self.data[key] = set()
+        before = len(members_set)
+        members_set.update(members)
+        return len(members_set) - before
+
+    def _cmd_smembers(self, key):
+        return sorted(self._live(key) or ())
+
+    def _cmd_zadd(self, key, *args):
+        flags = set()
+        while args and args[0].upper() in (b"XX", b"NX", b"CH", b"GT", b"LT"):
+            flags.add(args[0].upper())
+            args = args[1:]
+        scores = self._live(key)
+        if scores is None:
+            if b"XX" in flags:
+                return 0
+            scores = self.data[key] = {}
+        added = 0
+        for score, member in zip(args[::2], args[1::2]):
+            exists = member in scores
+            if (b"XX" in flags and not exists) or (b"NX" in flags and exists):
+                continue
+            added += not exists
+            scores[member] = float(score)
+        return added
+
+    def _cmd_zrem(self, key, *members):
+        scores = self._live(key) or {}
+        removed = sum(scores.pop(member, None) is not None for member in members)
+        if not scores:
+            self._delete(key)
+        return removed
+
+    def _cmd_zcard(self, key):
+        return len(self._live(key) or ())
+
+    def _cmd_zpopmin(self, key, count=b"1"):
+        scores = self._live(key) or {}
+        popped = sorted(scores.items(), key=lambda item: (item[1], item[0]))[:int(count)]
+        reply = []
+        for member, score in popped:
+            del scores[member]
+            reply.extend([member, score])
+        if not scores:
+            self._delete(key)
+        return reply
+
+    def _cmd_rpush(self, key, *values):
+        items = self._live(key)
+        if items is None:
+            items = self.data[key] = []
+        items.extend(values)
+        return len(items)
+
+    def _cmd_lrange(self, key, start, stop):
+        items = self._live(key) or []
+        stop = int(stop)
+        return items[int(start):None if stop == -1 else stop + 1]
+
+    def _cmd_ltrim(self, key, start, stop):
+        items = self._live(key)
+        if items is not None:
+            stop = int(stop)
+            items[:] = items[int(start):None if stop == -1 else stop + 1]
+            if not items:
+                self._delete(key)
+        return "OK"
+
+    def _cmd_scan(self, cursor, *options):
+        options = [option.upper() if index % 2 == 0 else option for index, option in enumerate(options)]
+        pattern = options[options.index(b"MATCH") + 1].decode("utf-8") if b"MATCH" in options else "*"
+        # One pass over the whole keyspace
+        keys = [key for key in list(self.data) if self._live(key) is not None
+                and fnmatch.fnmatchcase(key.decode("utf-8"), pattern)]
+        return [b"0", keys]
+
+    def _cmd_publish(self, channel, message):
+        subscribers = self._channels.get(channel, ())
+        for writer in subscribers:
+            writer.write(_encode([b"message", channel, message]))
+        return len(subscribers)
+
+
+def start_in_thread() -> MockRedisServer:
+    """Start a server on its own event loop thread.
+
+    Redis clients used by the app are synchronous, so the server must not
+    share an event loop with code that calls them.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="mock-redis", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(MockRedisServer().start(), loop).result()
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from app.core.jobs import Job, JobManager
+
+
+class _Executor:
+    def __init__(self, rows, batch_size):
+        self.rows = rows
+        self.batch_size = batch_size
+        self.sql = None
+
+    def sql_dialect(self):
+        return "sqlite"
+
+    async def stream_sql(self, sql, timeout=None, batch_size=None):
+        self.sql = sql
+        yield ["n"]
+        for start in range(0, len(self.rows), self.batch_size):
+            yield self.rows[start:start + self.batch_size]
+
+
+@pytest.mark.parametrize("row_count, fetched, truncated", [
+    (9, 9, False),
+    (10, 10, False),
+    (11, 10, True),
+    (20, 10, True),
+    (25, 10, True),
+])
+def test_spill_marks_truncation_at_max_rows(tmp_path, row_count, fetched, truncated):
+    async def spill():
+        manager = JobManager(str(tmp_path), batch_size=5, max_rows=10)
+        job = Job(id="job", owner="key", question="q", sql="SELECT n FROM t")
+        executor = _Executor([(i,) for i in range(row_count)], batch_size=5)
+        await manager._spill(job, executor)
+        return job, executor.sql
+
+    job, sql = asyncio.run(spill())
+    assert (job.rows_fetched, job.truncated) == (fetched, truncated)
+    assert sql == "SELECT n FROM t LIMIT 11"
+    assert job.sql == "SELECT n FROM t"
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from app.core.json_stream import JSONFieldStream
+
+
+def _stream(text, chunk_size, fields=("sql", "explanation")):
+    stream = JSONFieldStream(fields)
+    events = []
+    for start in range(0, len(text), chunk_size):
+        events.extend(stream.feed(text[start:start + chunk_size]))
+    return events
+
+
+def _results(events):
+    deltas, done = {}, {}
+    for kind, field, text in events:
+        if kind == "delta":
+            deltas[field] = deltas.get(field, "") + text
+        else:
+            done[field] = text
+    return deltas, done
+
+
+VALUES = [
+    "SELECT 'a\\u00e9' x",
+    "SELECT 'a\\\\' AS \"quoted\"",
+    "SELECT 'café' AS name",
+    "SELECT '😀' AS face",
+    "line one\nline two\ttab",
+]
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("value", VALUES)
+@pytest.mark.parametrize("chunk_size", range(1, 16))
+def test_deltas_add_up_to_value(value, chunk_size, ensure_ascii):
+    text = json.dumps({"sql": value, "explanation": value}, ensure_ascii=ensure_ascii)
+    deltas, done = _results(_stream(text, chunk_size))
+    assert done == {"sql": value, "explanation": value}
+    assert deltas == done
+
+
+def test_escaped_backslash_before_u_is_not_held_back():
+    # The raw text ends in \\u00, which is an escaped backslash and "u00"
+    stream = JSONFieldStream(["query"])
+    events = stream.feed('{"query": "a\\\\u00')
+    assert events == [("delta", "query", "a\\u00")]
+
+
+def test_cut_off_escape_waits_for_the_rest():
+    stream = JSONFieldStream(["sql"])
+    assert stream.feed('{"sql": "a\\u00') == [("delta", "sql", "a")]
+    assert stream.feed('e9"') == [("delta", "sql", "é"), ("done", "sql", "aé")]
+
+
+def test_done_arrives_before_the_object_closes():
+    stream = JSONFieldStream(["sql"])
+    events = stream.feed('{"sql": "SELECT 1", "explanation": "unfinish')
+    assert ("done", "sql", "SELECT 1") in events
+
+
+def test_skips_text_before_the_object_and_nested_values():
+    text = '```json\n{"meta": {"sql": "nested"}, "list": ["sql"], "sql": "SELECT 2"}\n```'
+    _, done = _results(_stream(text, 3, fields=["sql"]))
+    assert done == {"sql": "SELECT 2"}
+
+
+def test_ignores_non_string_and_unrequested_fields():
+    text = '{"sql": null, "explanation": "why", "confidence": 0.9}'
+    _, done = _results(_stream(text, 4, fields=["sql", "confidence"]))
+    assert done == {}
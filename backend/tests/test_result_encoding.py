@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+import pyarrow as pa
+
+from app.core.result_encoding import ArrowFileWriter, read_arrow_file
+
+
+def _spill(path, batches, columns=("value",)):
+    writer = ArrowFileWriter(str(path), list(columns), {"sql": "SELECT value FROM t"})
+    for batch in batches:
+        writer.write(batch)
+    writer.close()
+    return read_arrow_file(str(path))
+
+
+def _schema(path):
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).schema
+
+
+def test_numeric_spilled_across_batches(tmp_path):
+    path = tmp_path / "result.arrow"
+    batches = [
+        [(Decimal("1.50"),), (None,)],
+        [(Decimal("123456.789"),)],
+        [(Decimal("-98765432109876.5"),), (Decimal("0.0001"),)],
+        [(7,)],
+    ]
+    columns, rows, total_rows = _spill(path, batches)
+    assert columns == ["value"]
+    assert total_rows == 6
+    assert [row[0] for row in rows] == [
+        Decimal("1.50"), None, Decimal("123456.789"), Decimal("-98765432109876.5"), Decimal("0.0001"), 7
+    ]
+    assert _schema(path).field("value").type == pa.decimal128(38, 4)
+    assert _schema(path).metadata[b"sql"] == b"SELECT value FROM t"
+    assert not (tmp_path / "result.arrow.tmp").exists()
+
+
+def test_integers_widen_to_floats(tmp_path):
+    path = tmp_path / "result.arrow"
+    _, rows, _ = _spill(path, [[(1, "a")], [(2.5, "b")], [(3, None)]], columns=("n", "s"))
+    assert rows == [(1.0, "a"), (2.5, "b"), (3.0, None)]
+    assert _schema(path).field("n").type == pa.float64()
+
+
+def test_decimal_digits_beyond_precision_fall_back_to_text(tmp_path):
+    path = tmp_path / "result.arrow"
+    big = Decimal("1" * 36)
+    _, rows, _ = _spill(path, [[(big,)], [(Decimal("0.125"),)]])
+    assert rows == [(str(big),), ("0.125",)]
+
+
+def test_conflicting_types_become_text(tmp_path):
+    path = tmp_path / "result.arrow"
+    _, rows, _ = _spill(path, [[(True,)], [("maybe",)], [(False,)]])
+    assert rows == [("True",), ("maybe",), ("False",)]
+
+
+def test_no_rows_leaves_readable_file(tmp_path):
+    path = tmp_path / "result.arrow"
+    columns, rows, total_rows = _spill(path, [], columns=("a", "b"))
+    assert (columns, rows, total_rows) == (["a", "b"], [], 0)